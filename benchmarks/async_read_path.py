@@ -0,0 +1,146 @@
+"""This is the script to compare how many student page views the sync and async read paths serve with the same memory.
+
+The sync Flask views hold a worker thread (and its stack) for every page view in flight, including while it waits
+on MySQL, so serving more page views at once costs more threads. The async views of internlinkApp/asgi.py wait on
+MySQL without holding a thread. The script runs the browse, internship details and My Applications pages with the
+cache off and internship details always queried (so every page view waits for MySQL, except sync browsing, which
+the internship catalogue always answers) in two ways:
+- "sync": `threads` worker threads using the Flask test client, with `threads` pooled connections,
+- "async": the ASGI app called directly from one event loop, with `threads` pooled aiomysql connections and 1, 8
+  and 32 times `threads` page views in flight.
+Each run is in a fresh process, so the memory reported (RSS at the end of the run) is comparable. It prints requests
+per second, median and p95 latency and RSS.
+
+It uses the database configured for the app (see config.py), which must contain the student user and some open
+internships. aiomysql and asgiref must be installed (see requirements.txt).
+
+Usage:
+    python benchmarks/async_read_path.py <student_user_id> [threads] [requests]
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from internlinkApp import create_app, db, leak_detector
+
+CONFIG = {'CACHE_BACKEND': 'none', 'CATALOG_DETAILS': False, 'JOB_WORKERS': 0}
+
+# Page views in flight in the async runs, as multiples of `threads`.
+ASYNC_CONCURRENCY = (1, 8, 32)
+
+def open_internship_ids(app):
+    with app.app_context():
+        with db.get_cursor(read_only=True) as cursor:
+            cursor.execute("SELECT internship_id FROM internship WHERE deadline >= CURRENT_DATE() LIMIT 50;")
+            return [row['internship_id'] for row in cursor.fetchall()]
+
+def page_paths(app):
+    internship_ids = open_internship_ids(app)
+    if not internship_ids:
+        raise SystemExit('The database has no open internships.')
+    return ['/internships', '/my_applications'] + [f'/internship/{internship_id}' for internship_id in internship_ids]
+
+def run_sync(app, user_id, paths, threads, requests):
+    timings, errors = [], []
+
+    def worker():
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session.update(loggedin=True, user_id=user_id, username='benchmark', role='student')
+        for number in range(requests // threads):
+            start = time.perf_counter()
+            response = client.get(paths[number % len(paths)])
+            timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, timings, errors
+
+async def asgi_get(asgi_app, path, cookie):
+    """Sends a GET request straight to the ASGI app, returning the status code."""
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+             'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+             'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+             'client': ('127.0.0.1', 0), 'server': ('localhost', 80)}
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await asgi_app(scope, receive, send)
+    return status[0]
+
+async def run_async(app, user_id, paths, concurrency, requests):
+    from internlinkApp import async_db
+    from internlinkApp.asgi import create_asgi_app
+
+    asgi_app = create_asgi_app(app)
+    session = {'loggedin': True, 'user_id': user_id, 'username': 'benchmark', 'role': 'student'}
+    cookie = f"{app.config['SESSION_COOKIE_NAME']}={app.session_interface.get_signing_serializer(app).dumps(session)}"
+    timings, errors = [], []
+
+    async def worker():
+        for number in range(requests // concurrency):
+            start = time.perf_counter()
+            status = await asgi_get(asgi_app, paths[number % len(paths)], cookie)
+            timings.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await async_db.close_pools()
+    return elapsed, timings, errors
+
+def measure(mode, user_id, threads, concurrency, requests):
+    """Runs one mode in this process and prints its result row."""
+    app = create_app({**CONFIG, 'DB_POOL_SIZE': threads, 'ASYNC_DB_POOL_SIZE': threads})
+    paths = page_paths(app)
+    if mode == 'sync':
+        elapsed, timings, errors = run_sync(app, user_id, paths, threads, requests)
+    else:
+        elapsed, timings, errors = asyncio.run(run_async(app, user_id, paths, concurrency, requests))
+    if errors:
+        raise SystemExit(f'{len(errors)} requests failed (HTTP {errors[0]}); check the student user ID.')
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    rss_mb = leak_detector.process_stats()['rss_mb']
+    print(f'{mode:<5} | {threads:>7} | {concurrency:>9} | {len(timings) / elapsed:>10.0f} | '
+          f'{statistics.median(timings) * 1000:>11.2f} | {p95 * 1000:>8.2f} | {rss_mb:>8.1f}', flush=True)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--measure':
+        mode, user_id, threads, concurrency, requests = sys.argv[2], *map(int, sys.argv[3:7])
+        measure(mode, user_id, threads, concurrency, requests)
+        raise SystemExit
+    if len(sys.argv) < 2:
+        raise SystemExit(__doc__)
+    user_id = int(sys.argv[1])
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+
+    print(f'{threads} threads / pooled connections, {requests} requests per run')
+    print('Mode  | Threads | In flight | Requests/s | Median (ms) | p95 (ms) | RSS (MB)')
+    print('------------------------------------------------------------------------------')
+    runs = [('sync', threads)] + [('async', threads * multiple) for multiple in ASYNC_CONCURRENCY]
+    for mode, concurrency in runs:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', mode, str(user_id), str(threads),
+                        str(concurrency), str(requests)], check=True)
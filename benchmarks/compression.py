@@ -0,0 +1,89 @@
+"""This is the script to measure what response compression saves on the large listing pages.
+
+It renders the internship, application and user listing templates with generated rows (no database needed), then
+compresses each page with the levels used by compression.py and a few others, and prints for each one the bytes sent
+over the wire and the CPU time spent compressing (median over several runs).
+
+Usage:
+    python benchmarks/compression.py [rows] [runs]
+"""
+import os
+import statistics
+import sys
+import time
+import zlib
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template, session
+
+from internlinkApp import compression, create_app
+
+def internship_rows(count):
+    return [{'internship_id': i, 'title': f'Software Developer Intern {i}',
+             'description': 'Work with our engineering team on web applications, APIs and internal tools.',
+             'location': ['Christchurch', 'Auckland', 'Wellington'][i % 3], 'duration': f'{3 + i % 4} months',
+             'skills_required': 'Python, Flask, SQL, Git', 'deadline': date.today() + timedelta(days=i % 60),
+             'stipend': f'${500 + 100 * (i % 5)}/week', 'number_of_opening': 1 + i % 3,
+             'company_name': f'Company {i % 40}', 'logo_path': None} for i in range(count)]
+
+def application_rows(count):
+    return [{'student_id': i, 'internship_id': i % 50, 'status': ['Pending', 'Accepted', 'Rejected'][i % 3],
+             'feedback': 'Thank you for applying.' if i % 3 else None,
+             'cover_letter': 'I am a motivated student who is keen to apply my skills in a professional setting. ' * 4,
+             'relevance_score': (i % 100) / 100, 'student_full_name': f'Student {i}',
+             'student_email': f'student{i}@example.com', 'university': 'Lincoln University',
+             'course': 'Bachelor of Software and Information Technology', 'resume_path': f'uploads/resume_{i}.pdf',
+             'internship_title': f'Software Developer Intern {i % 50}', 'internship_location': 'Christchurch'}
+            for i in range(count)]
+
+def user_rows(count):
+    return [{'user_id': i, 'username': f'user{i}', 'full_name': f'User {i}', 'email': f'user{i}@example.com',
+             'role': ['student', 'employer', 'admin'][i % 3], 'status': 'active' if i % 7 else 'inactive',
+             'profile_image': None} for i in range(count)]
+
+def render_pages(app, rows):
+    pages = {}
+    with app.test_request_context('/'):
+        session.update(loggedin=True, user_id=1, username='benchmark', role='student')
+        pages['/internships'] = render_template('browse_internships.html', internships=internship_rows(rows),
+                                                categories=[], locations=[], durations=[], stipends=[])
+        session['role'] = 'employer'
+        pages['/employer/applications'] = render_template('employer_manage_applications.html',
+                                                          applications=application_rows(rows), applicants=[],
+                                                          internship_titles=[])
+        session['role'] = 'admin'
+        pages['/admin/users'] = render_template('admin_user_management.html', users=user_rows(rows))
+    return {name: page.encode('utf-8') for name, page in pages.items()}
+
+def encoders():
+    html_gzip, html_brotli = compression.COMPRESSION_LEVELS['text/html']
+    result = {f'gzip {level}' + (' (used)' if level == html_gzip else ''):
+                (lambda body, level=level: zlib.compress(body, level, 16 + zlib.MAX_WBITS)) for level in (1, 6, 9)}
+    if compression.brotli is not None:
+        for quality in (4, 5, 11):
+            result[f'brotli {quality}' + (' (used)' if quality == html_brotli else '')] = (
+                lambda body, quality=quality: compression.brotli.compress(body, quality=quality))
+    return result
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    pages = render_pages(create_app({'JOB_WORKERS': 0}), rows)
+    if compression.brotli is None:
+        print('brotli is not installed; only gzip is measured.')
+
+    print(f'{rows} rows per page, median of {runs} runs')
+    print('Page                    | Encoding         | Bytes      | Ratio  | CPU (ms)')
+    print('---------------------------------------------------------------------------')
+    for name, body in pages.items():
+        print(f'{name:<23} | {"identity":<16} | {len(body):>10} | {1:>6.2f} | {0:>8.2f}')
+        for encoding, encode in encoders().items():
+            timings = []
+            for _ in range(runs):
+                start = time.process_time()
+                compressed = encode(body)
+                timings.append(time.process_time() - start)
+            print(f'{name:<23} | {encoding:<16} | {len(compressed):>10} | {len(body) / len(compressed):>6.2f} | '
+                  f'{statistics.median(timings) * 1000:>8.2f}')
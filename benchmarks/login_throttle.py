@@ -0,0 +1,104 @@
+"""This is the script to measure how login throttling protects real users from a credential-stuffing burst.
+
+While attacker threads post wrong passwords for the usernames in the database (all from one IP address, at a fixed
+total rate), a real user logs in from another address, and the script prints the real user's login latency:
+- with no attack (baseline),
+- under attack with throttling off (every guess costs a full bcrypt check),
+- under attack with throttling on (the attacker's IP is refused before any hashing once it hits its limit).
+
+It uses the database configured for the app (see config.py), which must contain the real user's account.
+
+Usage:
+    python benchmarks/login_throttle.py <username> <password> [logins] [attacker_threads] [attempts_per_second]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from internlinkApp import create_app, db, login_throttle
+
+USER_ADDRESS = '203.0.113.10'
+ATTACKER_ADDRESS = '198.51.100.66'
+
+def make_app(throttled, throttle_path):
+    limits = {} if throttled else {'LOGIN_MAX_FAILURES_PER_USER': 0, 'LOGIN_MAX_FAILURES_PER_IP': 0}
+    return create_app({'LOGIN_THROTTLE_PATH': throttle_path, 'JOB_WORKERS': 0, **limits})
+
+def attack(app, usernames, interval, stop):
+    client = app.test_client()
+    attempt = 0
+    next_attempt = time.perf_counter()
+    while not stop.is_set():
+        # Paced like requests arriving over the network, rather than spinning as fast as the thread can.
+        next_attempt += interval
+        stop.wait(max(0.0, next_attempt - time.perf_counter()))
+        client.post('/login', data={'username': usernames[attempt % len(usernames)], 'password': f'Guess{attempt}!'},
+                    environ_base={'REMOTE_ADDR': ATTACKER_ADDRESS})
+        attempt += 1
+
+def time_logins(app, username, password, logins):
+    timings = []
+    for _ in range(logins):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post('/login', data={'username': username, 'password': password},
+                               environ_base={'REMOTE_ADDR': USER_ADDRESS})
+        timings.append(time.perf_counter() - start)
+        if response.status_code != 302:
+            raise SystemExit(f'Login as {username} failed (HTTP {response.status_code}); check the credentials.')
+    return timings
+
+def run(scenario, username, password, logins, attacker_threads, attempts_per_second):
+    throttled = scenario != 'attack, throttling off'
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(throttled, os.path.join(directory, 'login_throttle.sqlite3'))
+        with app.app_context():
+            with db.get_cursor(read_only=True) as cursor:
+                cursor.execute("SELECT username FROM users WHERE username <> %s LIMIT 100;", (username,))
+                usernames = [row['username'] for row in cursor.fetchall()] or ['no_such_user']
+
+        stop = threading.Event()
+        attackers = []
+        if scenario != 'no attack':
+            interval = attacker_threads / attempts_per_second
+            attackers = [threading.Thread(target=attack, args=(app, usernames, interval, stop))
+                         for _ in range(attacker_threads)]
+            for attacker in attackers:
+                attacker.start()
+            # Let the attack ramp up before measuring. With throttling on, also wait for the attacker to hit its limit
+            # and for the guesses already being hashed to finish, so only the steady state is measured.
+            time.sleep(2)
+            deadline = time.time() + 60
+            while throttled and time.time() < deadline and f'ip:{ATTACKER_ADDRESS}' not in [
+                    row['key'] for row in login_throttle.throttle_stats()['blocked']]:
+                time.sleep(0.5)
+            if throttled:
+                time.sleep(2)
+        try:
+            return time_logins(app, username, password, logins)
+        finally:
+            stop.set()
+            for attacker in attackers:
+                attacker.join()
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        raise SystemExit(__doc__)
+    username, password = sys.argv[1], sys.argv[2]
+    logins = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    attacker_threads = int(sys.argv[4]) if len(sys.argv) > 4 else (os.cpu_count() or 2) * 2
+    attempts_per_second = float(sys.argv[5]) if len(sys.argv) > 5 else 100
+
+    print(f'{logins} logins, {attacker_threads} attacker threads, {attempts_per_second:g} attempts/s')
+    print('Scenario                | Median (ms) | p95 (ms) | Max (ms)')
+    print('-----------------------------------------------------------')
+    for scenario in ('no attack', 'attack, throttling off', 'attack, throttling on'):
+        timings = sorted(run(scenario, username, password, logins, attacker_threads, attempts_per_second))
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f'{scenario:<23} | {statistics.median(timings) * 1000:>11.1f} | {p95 * 1000:>8.1f} | '
+              f'{timings[-1] * 1000:>8.1f}')
@@ -0,0 +1,90 @@
+"""This is the script to measure how many student page views a fixed number of worker threads can serve.
+
+Every worker thread blocked on a MySQL query is a thread that can't serve anyone else, so at a fixed thread count
+(and so a fixed amount of memory) throughput depends on how often the read path waits for the database. The script
+runs the same load against the browse, internship details and My Applications pages twice:
+- "queries": the cache is off and internship details are always queried, so every page view waits for MySQL
+  (browsing has no query path left; it is always served from the internship catalogue),
+- "in-memory": the defaults, where details come from the internship catalogue and the application summary and
+  unread notifications from the cache.
+It prints requests per second, median and p95 latency, and the peak memory (RSS) of the process so far.
+
+It uses the database configured for the app (see config.py), which must contain the student user and some open
+internships.
+
+Usage:
+    python benchmarks/read_path.py <student_user_id> [threads] [requests_per_thread]
+"""
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from internlinkApp import create_app, db
+
+SCENARIOS = {
+    'queries': {'CACHE_BACKEND': 'none', 'CATALOG_DETAILS': False},
+    'in-memory': {},
+}
+
+def open_internship_ids(app):
+    with app.app_context():
+        with db.get_cursor(read_only=True) as cursor:
+            cursor.execute("SELECT internship_id FROM internship WHERE deadline >= CURRENT_DATE() LIMIT 50;")
+            return [row['internship_id'] for row in cursor.fetchall()]
+
+def worker(app, user_id, paths, requests, timings, errors):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(loggedin=True, user_id=user_id, username='benchmark', role='student')
+    for number in range(requests):
+        start = time.perf_counter()
+        response = client.get(paths[number % len(paths)])
+        timings.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+def run(app, user_id, paths, threads, requests):
+    timings, errors = [], []
+    workers = [threading.Thread(target=worker, args=(app, user_id, paths, requests, timings, errors))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise SystemExit(f'{len(errors)} requests failed (HTTP {errors[0]}); check the student user ID.')
+    return len(timings) / elapsed, sorted(timings)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        raise SystemExit(__doc__)
+    user_id = int(sys.argv[1])
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    print(f'{threads} worker threads, {requests} requests each')
+    print('Page               | Read path | Requests/s | Median (ms) | p95 (ms) | Peak RSS (MB)')
+    print('-------------------------------------------------------------------------------------')
+    for scenario, config in SCENARIOS.items():
+        app = create_app({'JOB_WORKERS': 0, **config})
+        internship_ids = open_internship_ids(app)
+        if not internship_ids:
+            raise SystemExit('The database has no open internships.')
+        pages = {'/internships': ['/internships'],
+                 '/internship/<id>': [f'/internship/{internship_id}' for internship_id in internship_ids],
+                 '/my_applications': ['/my_applications']}
+        for page, paths in pages.items():
+            # One pass first, so the in-memory read path is measured warm.
+            run(app, user_id, paths, 1, len(paths))
+            throughput, timings = run(app, user_id, paths, threads, requests)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f'{page:<18} | {scenario:<9} | {throughput:>10.0f} | {statistics.median(timings) * 1000:>11.2f} | '
+                  f'{p95 * 1000:>8.2f} | {peak_rss:>13.1f}')
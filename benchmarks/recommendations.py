@@ -0,0 +1,102 @@
+"""This is the script to measure how fast internship recommendations are scored.
+
+It indexes generated internships (no database needed) and prints how long building the index took, then the latency
+of `top_matches()` for generated student profiles (median, 95th percentile and maximum over all queries), which is
+what the student home page waits for once the index is loaded. It also compares the total similarity of the
+recommendations with that of the best ones found by scoring every internship, which only visiting the champion lists
+of common words can lower (ties make comparing internship IDs meaningless with generated data).
+
+Usage:
+    python benchmarks/recommendations.py [internships] [queries]
+"""
+import heapq
+import itertools
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from internlinkApp import recommendations
+
+ROLES = ['Software Developer', 'Data Analyst', 'Marketing Assistant', 'Research Assistant', 'UX Designer',
+         'Mechanical Engineer', 'Business Analyst', 'Network Engineer', 'Content Writer', 'Machine Learning Engineer',
+         'Accountant', 'Civil Engineer', 'Product Manager', 'QA Tester', 'Graphic Designer', 'Sales Associate']
+FIELDS = ['Web', 'Mobile', 'Cloud', 'Finance', 'Health', 'Agriculture', 'Energy', 'Education', 'Retail', 'Security',
+          'Games', 'Logistics', 'Media', 'Government', 'Tourism', 'Construction']
+SKILLS = ['python', 'java', 'c++', 'c#', 'javascript', 'typescript', 'react', 'node.js', 'sql', 'excel', 'tableau',
+          'figma', 'photoshop', 'autocad', 'solidworks', 'matlab', 'docker', 'kubernetes', 'aws', 'azure', 'git',
+          'linux', 'seo', 'copywriting', 'statistics', 'pandas', 'tensorflow', 'communication', 'teamwork', 'xero']
+COURSES = ['Software Engineering', 'Computer Science', 'Data Science', 'Commerce', 'Marketing', 'Design',
+           'Mechanical Engineering', 'Civil Engineering', 'Accounting', 'Information Technology']
+
+def generate_internships(count, rng):
+    # A Zipf-like vocabulary, so descriptions share common words and have a long tail of rare ones.
+    vocabulary = [f'word{number}' for number in range(20000)]
+    cumulative_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    today = date.today()
+    updated_at = datetime.now()
+    for internship_id in range(1, count + 1):
+        yield {'internship_id': internship_id,
+               'title': f'{rng.choice(FIELDS)} {rng.choice(ROLES)}',
+               'skills_required': ', '.join(rng.sample(SKILLS, rng.randint(3, 6))),
+               'description': ' '.join(rng.choices(vocabulary, cum_weights=cumulative_weights, k=40)),
+               'deadline': today + timedelta(days=rng.randint(1, 90)), 'updated_at': updated_at}
+
+def generate_profile(rng):
+    applied = [(f'{rng.choice(FIELDS)} {rng.choice(ROLES)}', ', '.join(rng.sample(SKILLS, 4)))
+               for _ in range(rng.randint(0, 5))]
+    return recommendations.term_frequencies({
+        'title': ' '.join([rng.choice(COURSES)] + [title for title, _ in applied]),
+        'skills_required': ' '.join(skills for _, skills in applied),
+        'description': 'Lincoln University'})
+
+def best_scores(query_terms, limit):
+    """The best scores found by scoring every internship that shares a word with the query."""
+    index = recommendations._index
+    query_weights = {term: weight * index.idfs[term] for term, weight in query_terms.items() if term in index.postings}
+    query_norm = math.sqrt(sum(weight ** 2 for weight in query_weights.values())) or 1.0
+    scores = {}
+    for term, query_weight in query_weights.items():
+        for internship_id, weight in index.postings[term].items():
+            scores[internship_id] = scores.get(internship_id, 0.0) + query_weight / query_norm * weight
+    return heapq.nlargest(limit, scores.values())
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(1)
+
+    start = time.perf_counter()
+    documents = {internship['internship_id']: recommendations._document(internship)
+                 for internship in generate_internships(count, rng)}
+    tokenized = time.perf_counter()
+    recommendations._index = recommendations._reweighted(documents)
+    built = time.perf_counter()
+    print(f'{count} internships: tokenized in {tokenized - start:.2f} s, weighted in {built - tokenized:.2f} s '
+          f'(in the background sync thread)')
+
+    changed = {internship['internship_id'] + count: recommendations._document(internship)
+               for internship in generate_internships(100, rng)}
+    start = time.perf_counter()
+    recommendations._updated(recommendations._index, changed, set())
+    print(f'Re-indexing 100 changed internships (an incremental sync): {(time.perf_counter() - start) * 1000:.0f} ms')
+
+    timings = []
+    quality = []
+    for _ in range(queries):
+        profile = generate_profile(rng)
+        start = time.perf_counter()
+        matches = recommendations.top_matches(profile, limit=5)
+        timings.append((time.perf_counter() - start) * 1000)
+        best = best_scores(profile, 5)
+        quality.append(sum(score for _, score in matches) / sum(best) if best else 1.0)
+    timings.sort()
+    print(f'top_matches() over {queries} profiles: median {statistics.median(timings):.2f} ms, '
+          f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, max {timings[-1]:.2f} ms')
+    print(f'Recommendations score {statistics.mean(quality):.1%} of the best possible on average '
+          f'(worst {min(quality):.1%}), compared with scoring every internship')
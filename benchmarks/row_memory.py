@@ -0,0 +1,57 @@
+"""This is the script to measure how much memory each row of a large result set takes.
+
+It generates rows shaped like the employer's application list (no database needed) and holds them the two ways the
+app can: as the dictionaries `DictCursor` returns, and as the row objects of repositories/ (named tuples built from
+the plain tuples of a tuple cursor). The values are created first and shared by both, so the difference is only the
+per-row overhead. It prints the memory held per row and in total, the time taken to build the rows, and the size of
+each row once pickled (which is what the shared cache tier stores).
+
+Usage:
+    python benchmarks/row_memory.py [rows]
+"""
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from internlinkApp.repositories.application import ListedApplication
+
+def value_tuples(count):
+    """The rows as a tuple cursor returns them, in the order of `ListedApplication`'s columns."""
+    return [(i, i % 50, f'Software Developer Intern {i % 50}', 'Christchurch', f'Student {i}',
+             f'student{i}@example.com', 'Lincoln University', 'Bachelor of Software and Information Technology',
+             f'uploads/resume_{i}.pdf', ['Pending', 'Accepted', 'Rejected'][i % 3],
+             'Thank you for applying.' if i % 3 else None,
+             'I am a motivated student who is keen to apply my skills in a professional setting. ' * 4,
+             (i % 100) / 100) for i in range(count)]
+
+FORMS = {
+    'dict (DictCursor)': lambda values: [dict(zip(ListedApplication._fields, row)) for row in values],
+    'named tuple (repositories)': lambda values: list(map(ListedApplication._make, values)),
+}
+
+def measure(build, values):
+    """Returns the bytes held by the rows `build` makes from `values`, and the seconds it took."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = build(values)
+    elapsed = time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    pickled = len(pickle.dumps(rows, pickle.HIGHEST_PROTOCOL))
+    return held, elapsed, pickled
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    values = value_tuples(count)
+
+    print(f'{count} application rows, {len(ListedApplication._fields)} columns each')
+    print('Row form                   | Bytes/row | Total (MB) | Build (ms) | Pickled bytes/row')
+    print('-------------------------------------------------------------------------------------')
+    for form, build in FORMS.items():
+        held, elapsed, pickled = measure(build, values)
+        print(f'{form:<26} | {held / count:>9.0f} | {held / 2 ** 20:>10.1f} | {elapsed * 1000:>10.1f} | '
+              f'{pickled / count:>17.0f}')
@@ -0,0 +1,129 @@
+"""This is the script to check that serving requests for a long time doesn't leak connections, files or memory.
+
+A leak of one cursor, connection or file handle per request doesn't show in a quick test, but takes a worker process
+down after a few days. The script runs the app with leak detection on (see internlinkApp/leak_detector.py) and keeps
+worker threads requesting the GET pages of every role (student, employer, admin and signed out), including a static
+file and the streamed application export. Every `SAMPLE_SECONDS` it lets the workers finish, collects garbage and
+records the open MySQL connections, open file descriptors and memory (RSS) of the process.
+
+The first `WARMUP_SAMPLES` samples are skipped, while caches and the username filter fill. The run fails (exit code 1)
+if any leak was reported, if the connections or file descriptors open at the end are more than at any point early in
+the run, or if memory over the last third of the run is more than `RSS_GROWTH_LIMIT_MB` above the first third.
+
+It uses the database configured for the app (see config.py), which must contain the three users and some open
+internships.
+
+Usage:
+    python benchmarks/soak_test.py <student_user_id> <employer_user_id> <admin_user_id> [minutes] [threads]
+"""
+import gc
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from internlinkApp import create_app, db, leak_detector
+
+SAMPLE_SECONDS = 10
+WARMUP_SAMPLES = 3
+RSS_GROWTH_LIMIT_MB = 10
+
+def open_internship_ids(app):
+    with app.app_context():
+        with db.get_cursor(read_only=True) as cursor:
+            cursor.execute("SELECT internship_id FROM internship WHERE deadline >= CURRENT_DATE() LIMIT 20;")
+            return [row['internship_id'] for row in cursor.fetchall()]
+
+def role_paths(internship_ids):
+    """The pages requested for each role (`None` is signed out)."""
+    student = ['/student/home', '/internships', '/my_applications', '/my_applications?history=1', '/profile']
+    for internship_id in internship_ids:
+        student += [f'/internship/{internship_id}', f'/internship/{internship_id}/apply']
+    return {
+        'student': student,
+        'employer': ['/employer/home', '/employer/internships', '/employer/applications',
+                     '/employer/applications/export', '/employer/applications/export?format=jsonl', '/profile'],
+        'admin': ['/admin/home', '/admin/users', '/admin/jobs', '/admin/cache', '/profile'],
+        None: ['/login', '/signup', '/signup/username_available?username=soak_test_user',
+               '/static/uploads/logo_alpha.png'],
+    }
+
+def worker(app, role, user_id, paths, deadline, counts, errors):
+    client = app.test_client()
+    if role:
+        with client.session_transaction() as session:
+            session.update(loggedin=True, user_id=user_id, username='soak_test', role=role)
+    number = 0
+    while time.monotonic() < deadline:
+        path = paths[number % len(paths)]
+        # Buffered, so the response is read and closed like a real server would.
+        response = client.get(path, buffered=True)
+        if response.status_code >= 400:
+            errors.append((path, response.status_code))
+        number += 1
+    counts.append(number)
+
+def run_interval(app, users, paths, threads, counts, errors):
+    deadline = time.monotonic() + SAMPLE_SECONDS
+    roles = [list(paths)[number % len(paths)] for number in range(threads)]
+    workers = [threading.Thread(target=worker, args=(app, role, users.get(role), paths[role], deadline, counts, errors))
+               for role in roles]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+def check(samples):
+    """Returns why the run failed, or an empty list if nothing grew."""
+    failures = []
+    if samples[-1]['leaks']:
+        failures.append(f"{samples[-1]['leaks']} leak(s) reported (printed above with their stacks)")
+    measured = samples[WARMUP_SAMPLES:]
+    third = max(1, len(measured) // 3)
+    early, late = measured[:third], measured[-third:]
+    for gauge in ('connections', 'file_descriptors'):
+        if measured[-1][gauge] is None:
+            continue
+        early_peak = max(sample[gauge] for sample in early)
+        if measured[-1][gauge] > early_peak:
+            failures.append(f'{gauge} grew from at most {early_peak} to {measured[-1][gauge]}')
+    early_rss = statistics.median(sample['rss_mb'] for sample in early)
+    late_rss = statistics.median(sample['rss_mb'] for sample in late)
+    if late_rss - early_rss > RSS_GROWTH_LIMIT_MB:
+        failures.append(f'RSS grew from {early_rss:.1f} MB to {late_rss:.1f} MB')
+    return failures
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4:
+        raise SystemExit(__doc__)
+    users = {'student': int(sys.argv[1]), 'employer': int(sys.argv[2]), 'admin': int(sys.argv[3])}
+    minutes = float(sys.argv[4]) if len(sys.argv) > 4 else 30
+    threads = int(sys.argv[5]) if len(sys.argv) > 5 else 8
+
+    app = create_app({'LEAK_DETECTION': True, 'JOB_WORKERS': 0})
+    paths = role_paths(open_internship_ids(app))
+    intervals = max(WARMUP_SAMPLES + 3, int(minutes * 60 / SAMPLE_SECONDS))
+
+    print(f'{threads} worker threads, {intervals} samples {SAMPLE_SECONDS}s apart')
+    print('Sample | Requests | Connections | File descriptors | RSS (MB) | Leaks')
+    print('---------------------------------------------------------------------')
+    samples, errors = [], []
+    for number in range(intervals):
+        counts = []
+        run_interval(app, users, paths, threads, counts, errors)
+        gc.collect()
+        sample = leak_detector.process_stats()
+        samples.append(sample)
+        file_descriptors = '-' if sample['file_descriptors'] is None else sample['file_descriptors']
+        print(f"{number + 1:>6} | {sum(counts):>8} | {sample['connections']:>11} | {file_descriptors:>16} | "
+              f"{sample['rss_mb']:>8.1f} | {sample['leaks']:>5}")
+
+    if errors:
+        print(f'{len(errors)} requests failed, e.g. {errors[0][0]} (HTTP {errors[0][1]}); check the user IDs.')
+    failures = check(samples)
+    if failures:
+        raise SystemExit('Soak test failed: ' + '; '.join(failures) + '.')
+    print('No leaks, and connections, file descriptors and memory stayed flat.')
@@ -0,0 +1,46 @@
+"""This is the script to measure how long InternLink takes to start up.
+
+It runs each step in a fresh Python process (so nothing is already imported or
+cached) and prints the median time over several runs:
+- `import internlinkApp`: the import-time cost paid by every tool, test and
+  worker that touches the package.
+- `create_app()`: the full application setup (config, database, blueprints).
+
+Usage:
+    python benchmarks/startup_time.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STEPS = {
+    'import internlinkApp': 'import internlinkApp',
+    'create_app()': 'from internlinkApp import create_app; create_app()',
+}
+
+TIMER = '''
+import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+'''
+
+def time_step(code, runs):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', TIMER.format(code=code)],
+                                cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return timings
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    print('Step                  | Median (ms) | Min (ms) | Runs')
+    print('------------------------------------------------------')
+    for name, code in STEPS.items():
+        timings = time_step(code, runs)
+        print(f'{name:<21} | {statistics.median(timings) * 1000:>11.1f} | {min(timings) * 1000:>8.1f} | {runs}')
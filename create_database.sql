@@ -1,7 +1,15 @@
 -- Adding this command to ensure that there is no error occuring chances while creating new tables
+DROP TABLE IF EXISTS `application_daily`;
+DROP TABLE IF EXISTS `user_daily`;
+DROP TABLE IF EXISTS `application_archive`;
+DROP TABLE IF EXISTS `internship_archive`;
+DROP TABLE IF EXISTS `notification`;
+DROP TABLE IF EXISTS `application_event`;
 DROP TABLE IF EXISTS `application`;
 DROP TABLE IF EXISTS `internship`;
 DROP TABLE IF EXISTS `student`;
+DROP TABLE IF EXISTS `resume_term`;
+DROP TABLE IF EXISTS `resume_text`;
 DROP TABLE IF EXISTS `employer`;
 DROP TABLE IF EXISTS `users`;
 
@@ -15,9 +23,29 @@ CREATE TABLE `users` (
   `profile_image` varchar(255) DEFAULT NULL,
   `role` enum('student','employer','admin') NOT NULL,
   `status` enum('active','inactive') NOT NULL DEFAULT 'active',
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `last_login_at` TIMESTAMP NULL DEFAULT NULL COMMENT 'Only updated on the first login of each day (see rollups.py)',
   PRIMARY KEY (`user_id`)
 );
 
+-- Creating resume_text table (text extracted from uploaded resumes by internlinkApp/resume_index.py, keyed by file hash)
+CREATE TABLE `resume_text` (
+  `file_hash` char(64) NOT NULL COMMENT 'SHA-256 of the PDF file',
+  `content` MEDIUMTEXT NOT NULL COMMENT 'Normalised text',
+  `extracted_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`file_hash`)
+);
+
+-- Creating resume_term table (inverted index: term -> resumes containing it)
+CREATE TABLE `resume_term` (
+  `term` varchar(64) NOT NULL,
+  `file_hash` char(64) NOT NULL,
+  `weight` FLOAT NOT NULL,
+  PRIMARY KEY (`term`, `file_hash`),
+  KEY `resume_terms` (`file_hash`),
+  FOREIGN KEY (`file_hash`) REFERENCES `resume_text` (`file_hash`) ON DELETE CASCADE
+);
+
 -- Creating student table
 CREATE TABLE `student` (
   `student_id` int NOT NULL AUTO_INCREMENT,
@@ -25,7 +53,9 @@ CREATE TABLE `student` (
   `university` varchar(100) DEFAULT NULL,
   `course` varchar(100) DEFAULT NULL,
   `resume_path` varchar(255) DEFAULT NULL,
+  `resume_hash` char(64) DEFAULT NULL COMMENT 'Set once the resume has been indexed (see resume_index.py)',
   PRIMARY KEY (`student_id`),
+  KEY `resume_hash` (`resume_hash`),
   FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE ON UPDATE CASCADE
 );
 
@@ -37,6 +67,7 @@ CREATE TABLE `employer` (
   `company_description` TEXT DEFAULT NULL,
   `website` varchar(100) DEFAULT NULL,
   `logo_path` varchar(255) DEFAULT NULL,
+  `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT 'Row version, used for page ETags',
   PRIMARY KEY (`emp_id`),
   FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE ON UPDATE CASCADE
 );
@@ -54,6 +85,10 @@ CREATE TABLE `internship` (
   `stipend` varchar(50) DEFAULT NULL,
   `number_of_opening` int DEFAULT NULL,
   `additional_req` TEXT DEFAULT NULL,
+  `pending_count` int NOT NULL DEFAULT 0 COMMENT 'Maintained by application_counts.py',
+  `accepted_count` int NOT NULL DEFAULT 0,
+  `rejected_count` int NOT NULL DEFAULT 0,
+  `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT 'Row version, used for page ETags',
   PRIMARY KEY (`internship_id`),
   FOREIGN KEY (`company_id`) REFERENCES `employer` (`emp_id`) ON DELETE CASCADE ON UPDATE CASCADE
 );
@@ -65,7 +100,98 @@ CREATE TABLE `application` (
   `status` enum('Pending','Accepted','Rejected') NOT NULL DEFAULT 'Pending',
   `cover_letter` TEXT DEFAULT NULL,
   `feedback` TEXT DEFAULT NULL,
+  `relevance_score` FLOAT DEFAULT NULL COMMENT 'Applicant match (0-1), maintained by candidate_ranking.py',
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `decided_at` TIMESTAMP NULL DEFAULT NULL COMMENT 'When it was first accepted or rejected; cleared if set back to Pending',
   PRIMARY KEY (`student_id`, `internship_id`),
+  KEY `internship_relevance` (`internship_id`, `relevance_score`),
   FOREIGN KEY (`student_id`) REFERENCES `student` (`student_id`) ON DELETE CASCADE ON UPDATE CASCADE,
   FOREIGN KEY (`internship_id`) REFERENCES `internship` (`internship_id`) ON DELETE CASCADE ON UPDATE CASCADE
-);
\ No newline at end of file
+);
+
+-- Creating application_event table (outbox of status changes, delivered by internlinkApp/notifications.py)
+CREATE TABLE `application_event` (
+  `event_id` bigint NOT NULL AUTO_INCREMENT,
+  `student_id` int NOT NULL,
+  `internship_id` int NOT NULL,
+  `old_status` enum('Pending','Accepted','Rejected') DEFAULT NULL,
+  `new_status` enum('Pending','Accepted','Rejected') NOT NULL,
+  `feedback` TEXT DEFAULT NULL,
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `dispatched_at` TIMESTAMP NULL DEFAULT NULL,
+  PRIMARY KEY (`event_id`),
+  KEY `pending_events` (`dispatched_at`, `event_id`),
+  FOREIGN KEY (`student_id`, `internship_id`) REFERENCES `application` (`student_id`, `internship_id`) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Creating notification table (in-app notifications shown to users)
+CREATE TABLE `notification` (
+  `notification_id` bigint NOT NULL AUTO_INCREMENT,
+  `user_id` int NOT NULL,
+  `message` TEXT NOT NULL,
+  `created_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `read_at` TIMESTAMP NULL DEFAULT NULL,
+  PRIMARY KEY (`notification_id`),
+  KEY `user_unread` (`user_id`, `read_at`),
+  FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Creating archive tables (finished internships and their applications, moved here by internlinkApp/archive.py)
+CREATE TABLE `internship_archive` (
+  `internship_id` int NOT NULL,
+  `company_id` int NOT NULL,
+  `title` varchar(100) NOT NULL,
+  `description` TEXT DEFAULT NULL,
+  `location` varchar(100) DEFAULT NULL,
+  `duration` varchar(50) DEFAULT NULL,
+  `skills_required` TEXT DEFAULT NULL,
+  `deadline` DATE NOT NULL,
+  `stipend` varchar(50) DEFAULT NULL,
+  `number_of_opening` int DEFAULT NULL,
+  `additional_req` TEXT DEFAULT NULL,
+  `pending_count` int NOT NULL DEFAULT 0,
+  `accepted_count` int NOT NULL DEFAULT 0,
+  `rejected_count` int NOT NULL DEFAULT 0,
+  `updated_at` TIMESTAMP NULL DEFAULT NULL,
+  `archived_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`internship_id`),
+  KEY `company_deadline` (`company_id`, `deadline`),
+  FOREIGN KEY (`company_id`) REFERENCES `employer` (`emp_id`) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE TABLE `application_archive` (
+  `student_id` int NOT NULL,
+  `internship_id` int NOT NULL,
+  `status` enum('Pending','Accepted','Rejected') NOT NULL,
+  `cover_letter` TEXT DEFAULT NULL,
+  `feedback` TEXT DEFAULT NULL,
+  `relevance_score` FLOAT DEFAULT NULL,
+  `created_at` TIMESTAMP NULL DEFAULT NULL,
+  `decided_at` TIMESTAMP NULL DEFAULT NULL,
+  `archived_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`student_id`, `internship_id`),
+  KEY `internship_id` (`internship_id`),
+  FOREIGN KEY (`student_id`) REFERENCES `student` (`student_id`) ON DELETE CASCADE ON UPDATE CASCADE,
+  FOREIGN KEY (`internship_id`) REFERENCES `internship_archive` (`internship_id`) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Creating daily rollup tables (dashboard statistics, maintained by internlinkApp/rollups.py)
+CREATE TABLE `application_daily` (
+  `emp_id` int NOT NULL,
+  `day` DATE NOT NULL,
+  `applications` int NOT NULL DEFAULT 0 COMMENT 'Applications received that day',
+  `accepted` int NOT NULL DEFAULT 0 COMMENT 'Applications accepted that day',
+  `rejected` int NOT NULL DEFAULT 0 COMMENT 'Applications rejected that day',
+  `decision_seconds` bigint NOT NULL DEFAULT 0 COMMENT 'Total time from application to decision of those accepted or rejected',
+  PRIMARY KEY (`emp_id`, `day`),
+  KEY `day` (`day`),
+  FOREIGN KEY (`emp_id`) REFERENCES `employer` (`emp_id`) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE TABLE `user_daily` (
+  `day` DATE NOT NULL,
+  `role` enum('student','employer','admin') NOT NULL,
+  `signups` int NOT NULL DEFAULT 0,
+  `active_users` int NOT NULL DEFAULT 0 COMMENT 'Distinct users who logged in that day',
+  PRIMARY KEY (`day`, `role`)
+);
@@ -1,25 +1,100 @@
+# When our "internLinkApp" is loaded this script only defines the `create_app()` factory. Nothing else is set up
+# at import time, so tools and scripts that only need a module from this package don't pay for the whole app setup.
 
-# When our "internLinkApp" is loaded firstly then this script will run automatically and all the flask app setup will be handled by this script.
 
-
-# Firstly, it will initialze the flask application then set up our session secret key 
-# then establish the connection of the database and in last it will import all the modules that are defining the routes of application
+# `create_app()` will initialze the flask application, load the configuration from the environment, set up our
+# session secret key and the database connection, and in last it will register all the blueprints that are defining
+# the routes of application.
 
 from flask import Flask
 
-app = Flask(__name__)
+def create_app(config=None):
+    """Creates and configures the InternLink Flask application.
+
+    Args:
+        config (dict): Optional configuration values that override the ones
+            read from the environment (handy for tests and scripts).
+
+    Returns:
+        Flask: The configured application.
+    """
+    app = Flask(__name__)
+
+    # Loading the configuration from the environment (see config.py). SECRET_KEY is used in signing session cookies.
+    from internlinkApp.config import load_config
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
+
+    # Behind reverse proxies, taking the client address and scheme from the headers they add (see config.py).
+    if app.config.get('TRUSTED_PROXY_COUNT'):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'],
+                                x_proto=app.config['TRUSTED_PROXY_COUNT'])
+
+    # Setting up the database connection.
+    from internlinkApp import db
+    db.init_db(app, app.config['DB_USER'], app.config['DB_PASSWORD'], app.config['DB_HOST'],
+               app.config['DB_NAME'], app.config['DB_PORT'], pool_size=app.config['DB_POOL_SIZE'],
+               replicas=app.config['DB_REPLICAS'],
+               replica_sticky_seconds=app.config['DB_REPLICA_STICKY_SECONDS'])
+
+    from internlinkApp import leak_detector
+    leak_detector.init_leak_detector(app)
+
+    from internlinkApp import cache
+    cache.init_cache(app)
+
+    from internlinkApp import jobs
+    jobs.init_jobs(app)
+
+    from internlinkApp import notifications
+    notifications.init_notifications(app)
+
+    from internlinkApp import live_updates
+    live_updates.init_live_updates(app)
+
+    from internlinkApp import login_throttle
+    login_throttle.init_login_throttle(app)
+
+    from internlinkApp import username_filter
+    username_filter.init_username_filter(app)
+
+    from internlinkApp import recommendations
+    recommendations.init_recommendations(app)
+
+    from internlinkApp import compression
+    compression.init_compression(app)
+
+    from internlinkApp import templating
+    templating.init_templating(app)
+
+    # Including all the necessary modules that are defining our Flask route-handling blueprints.
+    from internlinkApp import user
+    from internlinkApp import student
+    from internlinkApp import employer
+    from internlinkApp import admin
+
+    user.flask_bcrypt.init_app(app)
+
+    app.register_blueprint(user.bp)
+    app.register_blueprint(student.bp)
+    app.register_blueprint(employer.bp)
+    app.register_blueprint(admin.bp)
 
-# Setting up the secret key which is used in signing session cookies
-app.secret_key = 'SECRET_KEY_FOR_RAGHAV_INTERNLINK_PROJECT_iT_IS_SECURE'
+    # Compiling every template now (if enabled) rather than on the first request that uses it.
+    templating.warm_up(app)
 
-# Setting up the database connection.
-from internlinkApp import connect
-from internlinkApp import db
-db.init_db(app, connect.dbuser, connect.dbpass, connect.dbhost, connect.dbname,
-           connect.dbport)
+    # Maintenance jobs, run with `flask --app run <command>`.
+    from internlinkApp import application_counts, archive, candidate_ranking, resume_index, rollups
+    app.cli.add_command(application_counts.reconcile_application_counts_command)
+    app.cli.add_command(archive.archive_expired_command)
+    app.cli.add_command(candidate_ranking.score_applications_command)
+    app.cli.add_command(resume_index.index_resumes_command)
+    app.cli.add_command(rollups.rebuild_rollups_command)
+    app.cli.add_command(admin.bulk_user_status_command)
+    app.cli.add_command(admin.import_students_command)
+    app.cli.add_command(jobs.run_jobs_command)
+    app.cli.add_command(notifications.dispatch_notifications_command)
 
-# Including all the necessary modules that are defining our Flask route-handling functions.
-from internlinkApp import user
-from internlinkApp import student
-from internlinkApp import employer
-from internlinkApp import admin
\ No newline at end of file
+    return app
@@ -4,27 +4,161 @@ It specifies how to view the admin homepage, among other things.
 Overseeing every user in the system, including account status changes, filtering, and searching.
 """
 
-from internlinkApp import app, db
-from flask import redirect, render_template, session, url_for, request, flash
+import csv
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import Blueprint, current_app, redirect, render_template, session, url_for, request, flash
+from flask.cli import with_appcontext
+
+from internlinkApp import cache, db, jobs, login_throttle, repositories, rollups, templating, username_filter
+from internlinkApp.user import DEFAULT_USER_ROLE, flask_bcrypt, validate_email, validate_password, validate_username
+
+bp = Blueprint('admin', __name__)
 
 # Admin Home ROute
-@app.route('/admin/home')
+@bp.route('/admin/home')
 def admin_home():
      """ This is the admin homepage's endpoint.
 
     takes people who aren't logged in to the login page.
     prevents users who are not administrators from gaining access.
+    shows site-wide application and user statistics for the last 30 days, read from the daily rollups (see rollups.py).
     """
      
      if 'loggedin' not in session:
-          return redirect(url_for('login'))
+          return redirect(url_for('user.login'))
      elif session['role']!='admin':
           return render_template('access_denied.html'), 403
 
-     return render_template('admin_home.html')
+     dashboard = None
+     try:
+          dashboard = get_admin_dashboard()
+     except Exception as e:
+          print(f"Error fetching admin dashboard statistics: {e}")
+
+     return render_template('admin_home.html', dashboard=dashboard, roles=rollups.ROLES)
+
+@cache.cached('admin_dashboard', ttl=60)
+def get_admin_dashboard():
+    """
+    Gets the site-wide dashboard statistics (see `rollups.admin_dashboard`). They change with every application
+    and login, so they are only cached for a minute.
+
+    Returns: dict: The dashboard.
+    """
+    return rollups.admin_dashboard()
+
+# Number of users updated per transaction by bulk status changes, and rows inserted per batch by CSV imports.
+BULK_STATUS_CHUNK_SIZE = 1000
+IMPORT_BATCH_SIZE = 500
+
+# Columns that a student import CSV file must have.
+IMPORT_CSV_COLUMNS = ('username', 'full_name', 'email', 'password', 'university', 'course')
+
+# Skipped rows listed on the import status page (the `import-students` command lists them all).
+IMPORT_ERRORS_SHOWN = 100
+
+@cache.cached('users', tags=lambda *filters: [cache.USERS_TAG])
+def get_users(search_name, filter_role, filter_status):
+    """
+    Gets the accounts shown on the user management page, cached until an account is created or changed.
+
+    Args: search_name (str): Part of the full name to search for.
+        filter_role (str): Role to keep, or 'all'.
+        filter_status (str): Account status to keep, or 'all'.
+
+    Returns: list: `repositories.users.ListedUser` rows, ordered by role and full name.
+    """
+    return repositories.users.search(search_name, filter_role, filter_status)
+
+# Admin Background Jobs Route
+@bp.route('/admin/jobs', methods=['GET'])
+def admin_job_queue():
+    """ Endpoint showing the background job queue: depth, latency and recent failures for each kind of job.
+
+    Returns: str: The rendered job queue page.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'admin':
+        return render_template('access_denied.html'), 403
+
+    stats = {'jobs': [], 'recent_failures': []}
+    error_message = None
+    try:
+        stats = jobs.queue_stats()
+    except Exception as e:
+        print(f"Error reading job queue statistics: {e}")
+        error_message = "Could not load the job queue statistics."
+
+    return render_template('admin_jobs.html', jobs=stats['jobs'], recent_failures=stats['recent_failures'],
+                           worker_count=jobs.worker_count, error_message=error_message)
+
+# Admin Login Throttling Route
+@bp.route('/admin/login_throttle', methods=['GET'])
+def admin_login_throttle():
+    """ Endpoint showing the login throttling counters and the usernames and IP addresses with recent failed logins.
+
+    Returns: str: The rendered login throttling page.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'admin':
+        return render_template('access_denied.html'), 403
+
+    stats = {'counters': {}, 'blocked': [], 'watched': []}
+    error_message = None
+    try:
+        stats = login_throttle.throttle_stats()
+    except Exception as e:
+        print(f"Error reading login throttling statistics: {e}")
+        error_message = "Could not load the login throttling statistics."
+
+    return render_template('admin_login_throttle.html', counters=stats['counters'], blocked=stats['blocked'],
+                           watched=stats['watched'], window_seconds=login_throttle.window_seconds,
+                           max_failures_per_user=login_throttle.max_failures_per_user,
+                           max_failures_per_ip=login_throttle.max_failures_per_ip, error_message=error_message)
+
+# Admin Render Profile Route
+@bp.route('/admin/render_profile', methods=['GET'])
+def admin_render_profile():
+    """ Endpoint showing how much of each page's response time this worker process spent rendering templates,
+    and which templates and blocks took longest.
+
+    Returns: str: The rendered render profile page.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'admin':
+        return render_template('access_denied.html'), 403
+
+    stats = templating.render_stats()
+    return render_template('admin_render_profile.html', profiling=templating.profiling,
+                           endpoints=stats['endpoints'], templates=stats['templates'], blocks=stats['blocks'][:30])
+
+# Admin Cache Route
+@bp.route('/admin/cache', methods=['GET'])
+def admin_cache():
+    """ Endpoint showing this worker process's cache: hits and misses for each cached query, and evictions,
+    expirations and invalidations.
+
+    Returns: str: The rendered cache page.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'admin':
+        return render_template('access_denied.html'), 403
+
+    stats = cache.cache_stats()
+    return render_template('admin_cache.html', names=stats['names'], events=stats['events'], entries=stats['entries'],
+                           max_entries=stats['max_entries'], backend=stats['backend'],
+                           shared_entries=stats['shared_entries'], default_ttl=cache.default_ttl)
 
 # Admin User Management Route
-@app.route('/admin/users', methods=['GET'])
+@bp.route('/admin/users', methods=['GET'])
 def admin_user_management():
     """
     endpoint for managing admin users.
@@ -34,7 +168,7 @@ def admin_user_management():
     Returns: str: The user management page that was rendered.
     """
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role'] != 'admin':
         return render_template('access_denied.html'), 403
 
@@ -46,25 +180,7 @@ def admin_user_management():
     filter_status = request.args.get('status')
 
     try:
-        with db.get_cursor() as cursor:
-            # Fetching all users from database
-            query = "SELECT user_id, username, full_name, email, role, status FROM users WHERE 1=1"
-            params = []
-
-            if search_name:
-                query += " AND full_name LIKE %s"
-                params.append(f"%{search_name}%")
-            if filter_role and filter_role != 'all':
-                query += " AND role = %s"
-                params.append(filter_role)
-            if filter_status and filter_status != 'all':
-                query += " AND status = %s"
-                params.append(filter_status)
-
-            query += " ORDER BY role ASC, full_name ASC;"
-            cursor.execute(query, tuple(params))
-            users_data = cursor.fetchall()
-
+        users_data = get_users(search_name, filter_role, filter_status)
     except Exception as e:
         print(f"Error fetching users for admin: {e}")
         error_message = "Could not load user data."
@@ -77,7 +193,7 @@ def admin_user_management():
                            error_message=error_message)
 
 # Route for Admin User Management
-@app.route('/admin/users/<int:user_id>/change_status', methods=['POST'])
+@bp.route('/admin/users/<int:user_id>/change_status', methods=['POST'])
 def admin_change_user_status(user_id):
     """ Endpoint for modifying the active/inactive status of a user's account.
 
@@ -86,7 +202,7 @@ def admin_change_user_status(user_id):
     Returns: str: A flash message directing the user to the management page [
     """
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role'] != 'admin':
         return render_template('access_denied.html'), 403
 
@@ -95,15 +211,313 @@ def admin_change_user_status(user_id):
     # Disabling the admin nto to deactivate their own user account
     if user_id == session['user_id'] and new_status == 'inactive':
         flash("You cannot deactivate your own admin account.", 'danger')
-        return redirect(url_for('admin_user_management'))
+        return redirect(url_for('admin.admin_user_management'))
 
     try:
         with db.get_cursor() as cursor:
             cursor.execute("UPDATE users SET status = %s WHERE user_id = %s;",
                            (new_status, user_id))
-            flash(f"User ID {user_id} status updated to '{new_status}' successfully!", 'success')
+        cache.invalidate_tags(cache.USERS_TAG, cache.user_tag(user_id))
+        flash(f"User ID {user_id} status updated to '{new_status}' successfully!", 'success')
     except Exception as e:
         print(f"Error changing user status: {e}")
         flash("An error occurred while updating user status. Please try again.", 'danger')
 
-    return redirect(url_for('admin_user_management'))
\ No newline at end of file
+    return redirect(url_for('admin.admin_user_management'))
+
+@bp.route('/admin/users/bulk_change_status', methods=['POST'])
+def admin_bulk_change_user_status():
+    """ Endpoint for changing the status of many user accounts at once.
+
+    The accounts are either the ticked `user_ids`, or (when `apply_to` is "filtered") every account matching the
+    name/role/status filters currently shown on the user management page.
+
+    Returns: str: A flash message directing the user to the management page
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'admin':
+        return render_template('access_denied.html'), 403
+
+    new_status = request.form.get('new_status')
+    if new_status not in ('active', 'inactive'):
+        flash("Please choose a valid account status.", 'danger')
+        return redirect(url_for('admin.admin_user_management'))
+
+    filters = {'name': request.form.get('name'), 'role': request.form.get('role'), 'status': request.form.get('status')}
+    user_ids = None
+    if request.form.get('apply_to') != 'filtered':
+        user_ids = [int(user_id) for user_id in request.form.getlist('user_ids') if user_id.isdigit()]
+        if not user_ids:
+            flash("Please select at least one user.", 'warning')
+            return redirect(url_for('admin.admin_user_management', **filters))
+
+    try:
+        changed, total = bulk_change_user_status(new_status, user_ids=user_ids, filters=filters,
+                                                 protected_user_id=session['user_id'])
+        flash(f"{changed} of {total} matching account(s) changed to '{new_status}'.", 'success')
+    except Exception as e:
+        print(f"Error bulk changing user status: {e}")
+        flash("An error occurred while updating user statuses. Some chunks may not have been saved.", 'danger')
+
+    return redirect(url_for('admin.admin_user_management', **filters))
+
+def bulk_change_user_status(new_status, user_ids=None, filters=None, protected_user_id=None,
+                            chunk_size=BULK_STATUS_CHUNK_SIZE, progress=None):
+    """ Changes the status of many accounts, committing one chunk of accounts at a time.
+
+    Short transactions keep row locks brief, so logins and the rest of the site keep working while a cohort of
+    thousands of accounts is being (de)activated.
+
+    Args: new_status (str): 'active' or 'inactive'.
+        user_ids (list): The accounts to change. If None, every account matching `filters` is changed.
+        filters (dict): Optional 'name', 'role' and 'status' filters (as on the user management page).
+        protected_user_id (int): An account that must never be deactivated (the admin doing the change).
+        chunk_size (int): How many accounts are updated per transaction.
+        progress (callable): Called as progress(done, total) after every chunk.
+
+    Returns: tuple: (number of accounts actually changed, number of accounts matched).
+    """
+    filters = filters or {}
+    if user_ids is None:
+        user_ids = repositories.users.matching_ids(filters.get('name'), filters.get('role'), filters.get('status'))
+
+    if new_status == 'inactive' and protected_user_id is not None:
+        user_ids = [user_id for user_id in user_ids if user_id != protected_user_id]
+
+    changed = 0
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        with db.transaction() as cursor:
+            changed += repositories.users.set_status(cursor, new_status, chunk)
+        cache.invalidate_tags(cache.USERS_TAG)
+        if progress:
+            progress(start + len(chunk), len(user_ids))
+
+    return changed, len(user_ids)
+
+@bp.route('/admin/users/import', methods=['POST'])
+def admin_import_students():
+    """ Endpoint for creating student accounts from an uploaded CSV file.
+
+    Hashing every password takes too long for a request, so the file is saved under the instance folder and imported
+    by an 'import_students' background job. The admin is sent to a page showing how far the import has got.
+
+    Returns: str: A redirect to the import status page, or to the management page with a flash message.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'admin':
+        return render_template('access_denied.html'), 403
+
+    csv_file = request.files.get('csv_file')
+    if not csv_file or not csv_file.filename.lower().endswith('.csv'):
+        flash("Please choose a CSV file to import.", 'danger')
+        return redirect(url_for('admin.admin_user_management'))
+
+    path = os.path.join(current_app.instance_path, 'imports', f"{uuid.uuid4().hex}.csv")
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        csv_file.save(path)
+        job_id = jobs.enqueue('import_students', path=path)
+    except Exception as e:
+        print(f"Error queueing student import: {e}")
+        flash("An error occurred while uploading the file. No students were imported.", 'danger')
+        if os.path.exists(path):
+            os.remove(path)
+        return redirect(url_for('admin.admin_user_management'))
+
+    return redirect(url_for('admin.admin_import_status', job_id=job_id))
+
+@bp.route('/admin/users/import/<int:job_id>', methods=['GET'])
+def admin_import_status(job_id):
+    """ Endpoint showing the progress of a student import, and the rows it skipped once it is finished.
+
+    Returns: str: The rendered import status page, which reloads itself until the import is finished.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'admin':
+        return render_template('access_denied.html'), 403
+
+    try:
+        status = jobs.job_status(job_id)
+    except Exception as e:
+        print(f"Error reading student import status: {e}")
+        status = None
+    if status is None or status['name'] != 'import_students':
+        flash("That import could not be found. Finished imports are only kept for a day.", 'danger')
+        return redirect(url_for('admin.admin_user_management'))
+
+    return render_template('admin_import_status.html', job=status, progress=status['progress'],
+                           max_errors_shown=IMPORT_ERRORS_SHOWN)
+
+@jobs.job('import_students', max_attempts=1)
+def import_students_job(path):
+    """ Imports an uploaded CSV file (see `import_students`), reporting its progress, then deletes the file.
+
+    It is only tried once: batches are committed as they go, so a retry would report every row already imported as
+    taken.
+    """
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as csv_file:
+            total_rows = max(sum(1 for _ in csv.reader(csv_file)) - 1, 0)
+            csv_file.seek(0)
+            jobs.report_progress(total_rows=total_rows, rows_read=0, created=0)
+            try:
+                created, errors = import_students(
+                    csv_file, progress=lambda rows_read, created: jobs.report_progress(
+                        total_rows=total_rows, rows_read=rows_read, created=created))
+            except ValueError as e:
+                jobs.report_progress(total_rows=total_rows, rows_read=0, created=0, error=str(e))
+                return
+        jobs.report_progress(total_rows=total_rows, rows_read=total_rows, created=created, skipped=len(errors),
+                             errors=errors[:IMPORT_ERRORS_SHOWN])
+    finally:
+        os.remove(path)
+
+def import_students(csv_stream, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """ Creates student accounts from a CSV stream, one batch of rows per transaction.
+
+    Invalid rows and usernames that are already taken are skipped and reported, the rest are inserted.
+
+    Args: csv_stream: A text stream with a header row containing IMPORT_CSV_COLUMNS.
+        batch_size (int): How many rows are hashed and inserted together.
+        progress (callable): Called as progress(rows_read, created) after every batch.
+
+    Returns: tuple: (number of accounts created, list of error messages).
+
+    Raises: ValueError: If the header row is missing any of the required columns.
+    """
+    reader = csv.DictReader(csv_stream)
+    missing_columns = [column for column in IMPORT_CSV_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing_columns:
+        raise ValueError(f"The CSV file is missing these columns: {', '.join(missing_columns)}.")
+
+    created = 0
+    errors = []
+    rows_read = 0
+    batch = []
+    # bcrypt releases the GIL while hashing, so threads hash a batch of passwords in parallel.
+    with ThreadPoolExecutor() as executor:
+        for line_number, row in enumerate(reader, start=2):
+            rows_read += 1
+            error = validate_import_row(row)
+            if error:
+                errors.append(f"line {line_number}: {error}")
+            else:
+                batch.append((line_number, row))
+
+            if len(batch) >= batch_size:
+                created += insert_student_batch(batch, executor, errors)
+                batch = []
+                if progress:
+                    progress(rows_read, created)
+
+        if batch:
+            created += insert_student_batch(batch, executor, errors)
+        if progress:
+            progress(rows_read, created)
+
+    return created, errors
+
+def validate_import_row(row):
+    """ Checks one CSV row using the same rules as the signup page.
+
+    Args: row (dict): The CSV row.
+
+    Returns: str: An error message, or None if the row is valid.
+    """
+    for column in ('full_name', 'university', 'course'):
+        value = row.get(column)
+        if not value:
+            return f"{column} is required."
+        if len(value) > 100:
+            return f"{column} cannot exceed 100 characters."
+    return validate_username(row.get('username')) or validate_email(row.get('email')) or validate_password(row.get('password'))
+
+def insert_student_batch(batch, executor, errors):
+    """ Inserts one batch of validated rows into `users` and `student` in a single transaction.
+
+    Args: batch (list): (line_number, row) pairs.
+        executor (ThreadPoolExecutor): Used to hash the passwords in parallel.
+        errors (list): Messages about skipped rows are appended to this list.
+
+    Returns: int: The number of accounts created.
+    """
+    # Dropping usernames repeated inside the batch, then the ones that already exist. Usernames are compared
+    # case-insensitively, like the database's collation does.
+    rows_by_username = {}
+    for line_number, row in batch:
+        if row['username'].lower() in rows_by_username:
+            errors.append(f"line {line_number}: username '{row['username']}' appears more than once.")
+        else:
+            rows_by_username[row['username'].lower()] = (line_number, row)
+
+    usernames = [row['username'] for _, row in rows_by_username.values()]
+    with db.get_cursor() as cursor:
+        cursor.execute("SELECT username FROM users WHERE username IN (" + ", ".join(["%s"] * len(usernames)) + ");",
+                       tuple(usernames))
+        for existing in cursor.fetchall():
+            skipped = rows_by_username.pop(existing['username'].lower(), None)
+            if skipped:
+                line_number, row = skipped
+                errors.append(f"line {line_number}: an account already exists with username '{existing['username']}'.")
+
+    if not rows_by_username:
+        return 0
+
+    rows = [row for _, row in rows_by_username.values()]
+    password_hashes = list(executor.map(lambda row: flask_bcrypt.generate_password_hash(row['password']), rows))
+
+    with db.transaction() as cursor:
+        cursor.executemany("""
+            INSERT INTO users (username, full_name, email, password_hash, profile_image, role, status)
+            VALUES (%s, %s, %s, %s, NULL, %s, 'active');
+        """, [(row['username'], row['full_name'], row['email'], password_hash, DEFAULT_USER_ROLE)
+              for row, password_hash in zip(rows, password_hashes)])
+        rollups.record_signups(cursor, DEFAULT_USER_ROLE, len(rows))
+
+        usernames = [row['username'] for row in rows]
+        cursor.execute("SELECT user_id, username FROM users WHERE username IN (" + ", ".join(["%s"] * len(usernames)) + ");",
+                       tuple(usernames))
+        user_ids = {row['username'].lower(): row['user_id'] for row in cursor.fetchall()}
+
+        cursor.executemany("""
+            INSERT INTO student (user_id, university, course, resume_path)
+            VALUES (%s, %s, %s, NULL);
+        """, [(user_ids[row['username'].lower()], row['university'], row['course']) for row in rows])
+
+    cache.invalidate_tags(cache.USERS_TAG)
+    username_filter.add(*usernames)
+    return len(rows)
+
+@click.command('bulk-user-status')
+@click.argument('new_status', type=click.Choice(['active', 'inactive']))
+@click.option('--name', help='Only accounts whose full name contains this text.')
+@click.option('--role', type=click.Choice(['student', 'employer', 'admin']), help='Only accounts with this role.')
+@click.option('--status', type=click.Choice(['active', 'inactive']), help='Only accounts with this status.')
+@click.option('--chunk-size', default=BULK_STATUS_CHUNK_SIZE, show_default=True, help='Accounts per transaction.')
+@with_appcontext
+def bulk_user_status_command(new_status, name, role, status, chunk_size):
+    """Changes the status of every account matching the filters."""
+    with click.progressbar(length=0, label='Updating accounts') as bar:
+        def progress(done, total):
+            bar.length = total
+            bar.update(done - bar.pos)
+        changed, total = bulk_change_user_status(new_status, filters={'name': name, 'role': role, 'status': status},
+                                                 chunk_size=chunk_size, progress=progress)
+    click.echo(f"{changed} of {total} matching account(s) changed to '{new_status}'.")
+
+@click.command('import-students')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, help='Rows inserted per transaction.')
+@with_appcontext
+def import_students_command(csv_file, batch_size):
+    """Creates student accounts from a CSV file."""
+    created, errors = import_students(csv_file, batch_size=batch_size,
+                                      progress=lambda rows_read, created: click.echo(
+                                          f"{rows_read} row(s) read, {created} account(s) created...", err=True))
+    for error in errors:
+        click.echo(f"Skipped {error}", err=True)
+    click.echo(f"{created} student account(s) created, {len(errors)} row(s) skipped.")
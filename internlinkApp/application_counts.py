@@ -0,0 +1,140 @@
+"""Maintains the per-status application counters stored on each internship.
+
+Every internship row keeps `pending_count`, `accepted_count` and
+`rejected_count` columns, so the employer dashboard can show how many
+applications each posting has without counting the `application` table on every
+page view.
+
+The counters are updated in the same transaction as the application write that
+changes them (see `record_new_application()` and `record_status_change()`).
+Those updates keep the internship's `updated_at` as it was: it is the row
+version of the posting itself (page ETags, the internship catalogue and the
+recommendation index sync on it), which a new application doesn't change. If
+they ever drift (e.g. after rows are edited by hand), run the reconciliation
+job to rebuild them from the `application` table:
+
+    flask --app run reconcile-application-counts
+"""
+import click
+from flask.cli import with_appcontext
+
+from internlinkApp import db
+
+# Counter column for each application status.
+STATUS_COUNT_COLUMNS = {
+    'Pending': 'pending_count',
+    'Accepted': 'accepted_count',
+    'Rejected': 'rejected_count',
+}
+
+def record_new_application(cursor, internship_id, status='Pending'):
+    """Adds a newly inserted application to its internship's counters.
+
+    Call this inside the transaction that inserts the application.
+
+    Args:
+        cursor: A cursor belonging to the open transaction.
+        internship_id (int): The internship that was applied for.
+        status (str): Status of the new application.
+    """
+    column = STATUS_COUNT_COLUMNS[status]
+    cursor.execute(f"UPDATE internship SET {column} = {column} + 1, updated_at = updated_at WHERE internship_id = %s;",
+                   (internship_id,))
+
+def record_status_change(cursor, internship_id, old_status, new_status):
+    """Moves an application from the `old_status` counter to the `new_status` one.
+
+    Call this inside the transaction that updates the application.
+
+    Args:
+        cursor: A cursor belonging to the open transaction.
+        internship_id (int): The internship the application belongs to.
+        old_status (str): Status before the update.
+        new_status (str): Status after the update.
+    """
+    if old_status == new_status:
+        return
+    old_column = STATUS_COUNT_COLUMNS[old_status]
+    new_column = STATUS_COUNT_COLUMNS[new_status]
+    cursor.execute(f"""
+        UPDATE internship
+        SET {old_column} = GREATEST({old_column} - 1, 0), {new_column} = {new_column} + 1,
+            updated_at = updated_at
+        WHERE internship_id = %s;
+    """, (internship_id,))
+
+def record_status_changes(cursor, changes):
+    """Applies many status changes to the counters at once.
+
+    The changes are summed per internship first, so each internship's row is
+    updated only once however many of its applications changed.
+
+    Args:
+        cursor: A cursor belonging to the open transaction.
+        changes (list): `(internship_id, old_status, new_status)` tuples.
+    """
+    deltas = {}
+    for internship_id, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        delta = deltas.setdefault(internship_id, dict.fromkeys(STATUS_COUNT_COLUMNS, 0))
+        delta[old_status] -= 1
+        delta[new_status] += 1
+
+    if not deltas:
+        return
+    cursor.executemany("""
+        UPDATE internship
+        SET pending_count = GREATEST(pending_count + %s, 0),
+            accepted_count = GREATEST(accepted_count + %s, 0),
+            rejected_count = GREATEST(rejected_count + %s, 0),
+            updated_at = updated_at
+        WHERE internship_id = %s;
+    """, [(delta['Pending'], delta['Accepted'], delta['Rejected'], internship_id)
+          for internship_id, delta in deltas.items()])
+
+def reconcile_application_counts(cursor, internship_ids=None):
+    """Rebuilds the counters from the `application` table, fixing any drift.
+
+    Only rows whose counters are actually wrong get written.
+
+    Args:
+        cursor: The cursor to run the queries with.
+        internship_ids (list): Only check these internships (default: all).
+
+    Returns:
+        int: Number of internships whose counters were repaired.
+    """
+    query = """
+        UPDATE internship i
+        LEFT JOIN (
+            SELECT internship_id,
+                   SUM(status = 'Pending') AS pending,
+                   SUM(status = 'Accepted') AS accepted,
+                   SUM(status = 'Rejected') AS rejected
+            FROM application
+            GROUP BY internship_id
+        ) c ON c.internship_id = i.internship_id
+        SET i.pending_count = COALESCE(c.pending, 0),
+            i.accepted_count = COALESCE(c.accepted, 0),
+            i.rejected_count = COALESCE(c.rejected, 0),
+            i.updated_at = i.updated_at
+        WHERE (i.pending_count <> COALESCE(c.pending, 0)
+               OR i.accepted_count <> COALESCE(c.accepted, 0)
+               OR i.rejected_count <> COALESCE(c.rejected, 0))
+    """
+    params = []
+    if internship_ids:
+        query += " AND i.internship_id IN (" + ", ".join(["%s"] * len(internship_ids)) + ")"
+        params.extend(internship_ids)
+
+    cursor.execute(query + ";", tuple(params))
+    return cursor.rowcount
+
+@click.command('reconcile-application-counts')
+@with_appcontext
+def reconcile_application_counts_command():
+    """Repairs the application counters stored on internships."""
+    with db.transaction() as cursor:
+        repaired = reconcile_application_counts(cursor)
+    click.echo(f"Repaired application counts for {repaired} internship(s).")
@@ -0,0 +1,170 @@
+"""Moves finished internships and their applications into archive tables.
+
+The `internship` and `application` tables would otherwise keep every posting
+ever made, and every page listing them would keep paying for that history. An
+internship is archived, together with all of its applications, once:
+- its deadline is more than `ARCHIVE_RETENTION_DAYS` days in the past,
+- none of its applications is still Pending (employers may still decide
+  those), and
+- no status change of its applications is waiting to be delivered to the
+  student (see notifications.py).
+
+Archived rows are copied to `internship_archive` and `application_archive`
+and deleted from the live tables in the same transaction. Only history views
+(e.g. "My Applications" with `?history=1`) query the archive.
+
+The work is done in batches of `ARCHIVE_BATCH_SIZE` internships, one
+transaction each, so locks are held briefly. Between batches the job pauses
+for `ARCHIVE_BATCH_PAUSE_MS` milliseconds, or as long as the last batch took if
+that was longer, so it never keeps the database busy more than half the time.
+
+Schedule it to run daily (e.g. from cron or a PythonAnywhere scheduled task):
+
+    flask --app run archive-expired
+"""
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from internlinkApp import cache, db
+
+# Columns copied to the archive tables.
+INTERNSHIP_COLUMNS = ('internship_id', 'company_id', 'title', 'description', 'location', 'duration',
+                      'skills_required', 'deadline', 'stipend', 'number_of_opening', 'additional_req',
+                      'pending_count', 'accepted_count', 'rejected_count', 'updated_at')
+APPLICATION_COLUMNS = ('student_id', 'internship_id', 'status', 'cover_letter', 'feedback', 'relevance_score',
+                       'created_at', 'decided_at')
+
+def archive_batch(cursor, retention_days, batch_size):
+    """Archives up to `batch_size` finished internships with their applications.
+
+    Args:
+        cursor: A cursor belonging to an open transaction.
+        retention_days (int): Days after its deadline an internship stays live.
+        batch_size (int): Maximum number of internships to archive.
+
+    Returns:
+        dict: 'internships' and 'applications' (numbers archived),
+        'internship_ids' (the internships archived), 'emp_ids' (their
+        companies) and 'student_ids' (students whose applications were
+        archived).
+    """
+    # SKIP LOCKED leaves internships that are being changed right now for the next run.
+    cursor.execute("""
+        SELECT i.internship_id, i.company_id
+        FROM internship i
+        WHERE i.deadline < CURRENT_DATE() - INTERVAL %s DAY
+          AND NOT EXISTS (SELECT 1 FROM application a
+                          WHERE a.internship_id = i.internship_id AND a.status = 'Pending')
+          AND NOT EXISTS (SELECT 1 FROM application_event ev
+                          WHERE ev.dispatched_at IS NULL AND ev.internship_id = i.internship_id)
+        ORDER BY i.deadline, i.internship_id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED;
+    """, (retention_days, batch_size))
+    internships = cursor.fetchall()
+    internship_ids = tuple(row['internship_id'] for row in internships)
+    if not internship_ids:
+        return {'internships': 0, 'applications': 0, 'student_ids': [], 'internship_ids': [], 'emp_ids': []}
+
+    id_list = "(" + ", ".join(["%s"] * len(internship_ids)) + ")"
+    internship_columns = ", ".join(INTERNSHIP_COLUMNS)
+    application_columns = ", ".join(APPLICATION_COLUMNS)
+
+    cursor.execute(f"SELECT DISTINCT student_id FROM application WHERE internship_id IN {id_list} FOR UPDATE;",
+                   internship_ids)
+    student_ids = [row['student_id'] for row in cursor.fetchall()]
+
+    cursor.execute(f"""
+        INSERT INTO internship_archive ({internship_columns})
+        SELECT {internship_columns} FROM internship WHERE internship_id IN {id_list};
+    """, internship_ids)
+    cursor.execute(f"""
+        INSERT INTO application_archive ({application_columns})
+        SELECT {application_columns} FROM application WHERE internship_id IN {id_list};
+    """, internship_ids)
+    applications = cursor.rowcount
+
+    # Deleting the internships also deletes their applications and delivered events (ON DELETE CASCADE), but
+    # deleting the applications explicitly first keeps the cascade small and the row counts visible.
+    cursor.execute(f"DELETE FROM application WHERE internship_id IN {id_list};", internship_ids)
+    cursor.execute(f"DELETE FROM internship WHERE internship_id IN {id_list};", internship_ids)
+
+    return {'internships': len(internship_ids), 'applications': applications, 'student_ids': student_ids,
+            'internship_ids': list(internship_ids), 'emp_ids': list({row['company_id'] for row in internships})}
+
+def archive_expired(retention_days, batch_size, pause_seconds, max_batches=None):
+    """Archives every finished internship, one batch at a time (see the module docs).
+
+    Args:
+        retention_days (int): Days after its deadline an internship stays live.
+        batch_size (int): Internships archived per transaction.
+        pause_seconds (float): Minimum pause between batches.
+        max_batches (int): Stop after this many batches (default: no limit).
+
+    Returns:
+        dict: Total 'internships' and 'applications' archived, and 'batches'.
+    """
+    totals = {'internships': 0, 'applications': 0, 'batches': 0}
+    while max_batches is None or totals['batches'] < max_batches:
+        started = time.perf_counter()
+        with db.transaction() as cursor:
+            archived = archive_batch(cursor, retention_days, batch_size)
+        if not archived['internships']:
+            break
+
+        cache.invalidate_tags(*[cache.student_tag(student_id) for student_id in archived['student_ids']],
+                              *[cache.internship_tag(internship_id) for internship_id in archived['internship_ids']],
+                              *[cache.employer_tag(emp_id) for emp_id in archived['emp_ids']])
+        totals['internships'] += archived['internships']
+        totals['applications'] += archived['applications']
+        totals['batches'] += 1
+
+        if archived['internships'] < batch_size:
+            break
+        time.sleep(max(pause_seconds, time.perf_counter() - started))
+    return totals
+
+# A student's archived applications, newest deadline first.
+ARCHIVED_APPLICATIONS_QUERY = """
+    SELECT a.status, a.feedback, a.cover_letter,
+           i.title AS internship_title, i.location AS internship_location, i.deadline,
+           e.company_name AS company_name,
+           i.internship_id
+    FROM application_archive a
+    JOIN internship_archive i ON a.internship_id = i.internship_id
+    JOIN employer e ON i.company_id = e.emp_id
+    WHERE a.student_id = %s
+    ORDER BY i.deadline DESC;
+"""
+
+def get_archived_applications(student_id):
+    """Gets a student's archived applications, newest deadline first.
+
+    Args:
+        student_id (int): The student whose application history is wanted.
+
+    Returns:
+        list: Application rows shaped like the ones on "My Applications", plus
+        the internship's `deadline`.
+    """
+    with db.get_cursor(read_only=True) as cursor:
+        cursor.execute(ARCHIVED_APPLICATIONS_QUERY, (student_id,))
+        return cursor.fetchall()
+
+@click.command('archive-expired')
+@click.option('--retention-days', type=int, help='Days after the deadline an internship stays live '
+                                                 '(default: ARCHIVE_RETENTION_DAYS).')
+@click.option('--batch-size', type=int, help='Internships archived per transaction (default: ARCHIVE_BATCH_SIZE).')
+@click.option('--max-batches', type=int, help='Stop after this many batches (default: no limit).')
+@with_appcontext
+def archive_expired_command(retention_days, batch_size, max_batches):
+    """Moves finished internships and their applications to the archive tables."""
+    config = current_app.config
+    totals = archive_expired(config['ARCHIVE_RETENTION_DAYS'] if retention_days is None else retention_days,
+                             batch_size or config['ARCHIVE_BATCH_SIZE'],
+                             config['ARCHIVE_BATCH_PAUSE_MS'] / 1000, max_batches)
+    click.echo(f"Archived {totals['internships']} internship(s) and {totals['applications']} application(s) "
+               f"in {totals['batches']} batch(es).")
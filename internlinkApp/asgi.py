@@ -0,0 +1,338 @@
+"""Serves the student read pages asynchronously, next to the Flask app.
+
+The Flask app is a WSGI app: every request holds a worker thread until its
+response is ready, including while it waits on MySQL, so a process serves at
+most as many page loads at once as it has threads. `create_asgi_app()` wraps
+the app in an ASGI [1] app, run by an ASGI server such as uvicorn (see
+run_asgi.py), where the busiest read pages don't hold a thread:
+- GET /internships (student.browse_internships),
+- GET /internship/<id> (student.view_internship_details),
+- GET /my_applications (student.my_applications).
+Their async views await their queries with async_db.py, and run the ones that
+don't depend on each other concurrently. They render the same templates, use
+the same cache entries (see `cache.cached()`) and run inside a normal Flask
+request context, so sessions, `before_request`/`after_request` hooks and error
+handlers work as usual. Every other request (and any request for these pages
+that isn't a GET) goes to the sync Flask views through asgiref's WsgiToAsgi
+adapter, which runs them in a thread pool. The sync app keeps working on its
+own under a WSGI server too. The async views get the request as the ASGI
+server passed it, without the app's WSGI middleware (`TRUSTED_PROXY_COUNT`):
+behind a reverse proxy, use the server's own option for it instead (e.g.
+uvicorn's --forwarded-allow-ips).
+
+Nothing that blocks runs on the event loop, where it would stall every
+request in flight: the request hooks (`before_request`, `after_request` and
+the teardown that releases the MySQL connection) and cache lookups and writes
+(which read and write the SQLite shared tier with `CACHE_BACKEND=sqlite`) run
+in the default thread pool with `asyncio.to_thread()`. Only the views, which
+wait on async queries, and most template rendering run on the loop. For the
+same reason the async views read internships from MySQL rather than the
+in-memory catalogue (internship_catalog.py), whose refresh is a blocking
+query. benchmarks/async_read_path.py compares the two paths.
+
+References:
+-----------
+    [1] https://asgi.readthedocs.io/
+"""
+import asyncio
+import contextvars
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import Flask, flash, redirect, render_template, request, request_started, session, url_for
+from werkzeug.exceptions import HTTPException
+
+from internlinkApp import archive, async_db, cache, internship_catalog, repositories, student
+
+# Async views by the endpoint of the sync view they replace.
+ASYNC_VIEWS = {}
+
+def create_asgi_app(app: Flask):
+    """Wraps the specified Flask app (see `create_app()`) in an ASGI app.
+
+    Returns:
+        The ASGI application callable.
+    """
+    async_db.init_async_db(app)
+    wsgi = WsgiToAsgi(app)
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await _lifespan(receive, send)
+            return
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            environ = _environ(scope)
+            try:
+                endpoint, view_args = app.url_map.bind_to_environ(environ).match()
+            except HTTPException:
+                # Not found, redirects and so on are answered by Flask.
+                endpoint = None
+            view = ASYNC_VIEWS.get(endpoint)
+            if view is not None:
+                await _serve(app, environ, view, view_args, send)
+                return
+        await wsgi(scope, receive, send)
+
+    return application
+
+def _environ(scope):
+    """Builds the WSGI environ of a GET or HEAD request (which has no body to read) from its ASGI scope."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin-1')
+        # Repeated headers are joined, as a WSGI server would (e.g. several Cookie headers).
+        environ[name] = f"{environ[name]}{'; ' if name == 'HTTP_COOKIE' else ','}{value}" if name in environ else value
+    return environ
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_db.close_pools()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def _serve(app, environ, view, view_args, send):
+    """Handles a request with an async view, the way `Flask.wsgi_app()` does
+    with a sync one.
+
+    The request context is pushed in a context (see `contextvars`) of its own,
+    so the blocking steps can run in a worker thread inside it, and the view
+    in a task that copies it.
+    """
+    ctx = app.request_context(environ)
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+
+    def in_thread(function, *args):
+        return loop.run_in_executor(None, context.run, function, *args)
+
+    def preprocess_request():
+        request_started.send(app, _async_wrapper=app.ensure_sync)
+        return app.preprocess_request()
+
+    error = None
+    try:
+        try:
+            context.run(ctx.push)
+            try:
+                response = await in_thread(preprocess_request)
+                if response is None:
+                    response = await context.run(asyncio.ensure_future, view(**view_args))
+            except Exception as e:
+                # Error handlers re-raise unhandled exceptions, so they run while this one is being handled.
+                response = context.run(app.handle_user_exception, e)
+            response = await in_thread(app.finalize_request, response)
+        except Exception as e:
+            error = e
+            response = context.run(app.handle_exception, e)
+        await _send_response(response, environ, send)
+    finally:
+        await in_thread(ctx.pop, error)
+
+async def _send_response(response, environ, send):
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [int(status.split(' ', 1)[0]), headers]
+
+    # Calling the response like a WSGI app handles HEAD requests and closes it (running `call_on_close()` callbacks).
+    body = response(environ, start_response)
+    try:
+        chunks = iter(body)
+        first_chunk = next(chunks, b'')
+        status, headers = started
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]})
+        await send({'type': 'http.response.body', 'body': first_chunk, 'more_body': True})
+        for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+def async_view(endpoint):
+    """Registers the decorated coroutine as the async version of `endpoint`."""
+    def decorate(view):
+        ASYNC_VIEWS[endpoint] = view
+        return view
+    return decorate
+
+def _student_only():
+    """The response for users who may not see student pages, or None."""
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'student':
+        return render_template('access_denied.html'), 403
+    return None
+
+async def _cached(function, compute, *args):
+    """Gets the cache entry of a `cache.cached()` function, computing it with an
+    async query on a miss.
+
+    Args:
+        function: The cached sync function, giving the entry's key, tags and TTL.
+        compute: Coroutine function building the value, called with whether to
+            read from the primary server (when one of the tags was invalidated
+            so recently that a replica may not have the change yet).
+        args: The arguments of `function`.
+    """
+    key = function.cache_key(*args)
+    tags = function.cache_tags(*args)
+    value = await asyncio.to_thread(cache.get, key)
+    if value is None:
+        since = await asyncio.to_thread(cache.generation)
+        value = await compute(bool(tags) and cache.recently_invalidated(tags))
+        await asyncio.to_thread(cache.put, key, value, ttl=function.cache_ttl, tags=tags, since=since)
+    return value
+
+def _sorted_values(rows, column):
+    """The distinct values of `column`, sorted like the catalogue sorts them."""
+    return sorted({row[column] for row in rows}, key=lambda value: (value is not None, value))
+
+@async_view('student.browse_internships')
+async def browse_internships():
+    """Async version of `student.browse_internships()`."""
+    denied = _student_only()
+    if denied is not None:
+        return denied
+
+    category_filter = request.args.get('category')
+    location_filter = request.args.get('location')
+    duration_filter = request.args.get('duration')
+    stipend_filter = request.args.get('stipend')
+
+    query, params = repositories.internship.open_internships_query(category_filter, location_filter,
+                                                                   duration_filter, stipend_filter)
+    try:
+        internships, filter_values = await asyncio.gather(
+            async_db.fetch_all(repositories.internship.OpenInternship, query, params),
+            async_db.fetch_all(None, repositories.internship.OPEN_FILTER_VALUES_QUERY))
+    except Exception as e:
+        print(f"Error fetching internships or filter options: {e}")
+        flash("An error occurred while loading the internships. Please try again later.", "danger")
+        return redirect(url_for('student.student_home'))
+
+    return render_template('browse_internships.html',
+                           internships=internships,
+                           categories=internship_catalog.CATEGORIES,
+                           locations=_sorted_values(filter_values, 'location'),
+                           durations=_sorted_values(filter_values, 'duration'),
+                           stipends=_sorted_values(filter_values, 'stipend'),
+                           selected_category=category_filter,
+                           selected_location=location_filter,
+                           selected_duration=duration_filter,
+                           selected_stipend=stipend_filter)
+
+@async_view('student.view_internship_details')
+async def view_internship_details(internship_id):
+    """Async version of `student.view_internship_details()`."""
+    denied = _student_only()
+    if denied is not None:
+        return denied
+
+    # A page rendered while flash messages are waiting would show them to every later visitor, so skip the cache.
+    use_cache = '_flashes' not in session
+    cached_page = await asyncio.to_thread(cache.get, cache.internship_page_key(internship_id)) if use_cache else None
+
+    if cached_page is not None:
+        etag, page = cached_page
+    else:
+        since = await asyncio.to_thread(cache.generation)
+        try:
+            primary = cache.recently_invalidated([cache.internship_tag(internship_id)])
+            internship_details = await async_db.fetch_one(None, student.INTERNSHIP_DETAILS_QUERY, (internship_id,),
+                                                          primary=primary)
+            # The company tag is only known once the row is read.
+            if internship_details and not primary and student.details_changed_recently(internship_details):
+                internship_details = await async_db.fetch_one(None, student.INTERNSHIP_DETAILS_QUERY,
+                                                              (internship_id,), primary=True)
+            if not internship_details:
+                return render_template('error.html', error_message="Internship not found."), 404
+
+        except Exception as e:
+            print(f"Error fetching internship details: {e}")
+            return render_template('error.html', error_message="Could not load internship details."), 500
+
+        # Caching the page writes to the shared tier.
+        etag, page = await asyncio.to_thread(student.render_internship_details, internship_details,
+                                             since if use_cache else None)
+
+    return student.internship_details_response(etag, page)
+
+@async_view('student.my_applications')
+async def my_applications():
+    """Async version of `student.my_applications()`."""
+    denied = _student_only()
+    if denied is not None:
+        return denied
+
+    user_id = session['user_id']
+    show_history = request.args.get('history') == '1'
+    applications = []
+    archived_applications = []
+    unread_notifications = []
+
+    async def student_id_for_user(primary):
+        return await async_db.fetch_value(repositories.student.ID_FOR_USER_QUERY, (user_id,), primary=primary)
+
+    async def application_summary(primary):
+        # From the primary, like `student.get_application_summary()`.
+        return student.summarise_applications(await async_db.fetch_all(
+            repositories.application.StudentApplication, repositories.application.STUDENT_APPLICATIONS_QUERY,
+            (student_id,), primary=True))
+
+    async def notifications(primary):
+        return await async_db.fetch_all(None, student.UNREAD_NOTIFICATIONS_QUERY, (user_id,), primary=primary)
+
+    try:
+        student_id = await _cached(student.get_student_id, student_id_for_user, user_id)
+        if not student_id:
+            flash("Student profile not found. Please ensure your student details are complete.", "warning")
+            return redirect(url_for('user.profile'))
+
+        lookups = [_cached(student.get_application_summary, application_summary, student_id),
+                   _cached(student.get_unread_notifications, notifications, user_id)]
+        if show_history:
+            lookups.append(async_db.fetch_all(None, archive.ARCHIVED_APPLICATIONS_QUERY, (student_id,)))
+        summary, unread_notifications, *archived = await asyncio.gather(*lookups)
+        applications = summary['applications']
+        if archived:
+            archived_applications = archived[0]
+
+    except Exception as e:
+        print(f"Error fetching applications: {e}")
+        flash("Could not load your applications. Please try again.", "danger")
+        applications = []
+
+    return render_template('my_applications.html', applications=applications, notifications=unread_notifications,
+                           show_history=show_history, archived_applications=archived_applications)
@@ -0,0 +1,92 @@
+"""Runs read-only queries without tying up a thread, for the async pages of asgi.py.
+
+`db` holds a thread (and so a WSGI worker) for the whole time a query is
+waiting on MySQL. The async views instead await their queries on an aiomysql
+[1] connection, so one process can keep many page loads waiting on the
+database at once, and run a page's independent queries concurrently.
+
+Connections come from one pool per server, created on first use with up to
+`ASYNC_DB_POOL_SIZE` connections (the server is picked like `db` does, see
+`db.read_server()`, so replicas and read-your-writes work the same way). Rows
+are returned like the `repositories` helpers return them: as instances of a
+row class, or as dictionaries when no row class is given.
+
+References:
+-----------
+    [1] https://aiomysql.readthedocs.io/
+"""
+import asyncio
+
+import aiomysql
+from flask import Flask
+
+from internlinkApp import db
+
+# Maximum connections per server.
+pool_size = 10
+
+# aiomysql pools by (host, port), created on first use.
+_pools = {}
+_pools_lock = None
+
+def init_async_db(app: Flask):
+    """Sets up async queries for the specified Flask app (after `db.init_db()`)."""
+    global pool_size
+    pool_size = app.config.get('ASYNC_DB_POOL_SIZE', pool_size)
+
+async def _pool(server):
+    global _pools_lock
+    if _pools_lock is None:
+        _pools_lock = asyncio.Lock()
+    async with _pools_lock:
+        if server not in _pools:
+            host, port = server
+            _pools[server] = await aiomysql.create_pool(
+                host=host, port=port, user=db.connection_params['user'],
+                password=db.connection_params['password'], db=db.connection_params['database'],
+                autocommit=True, charset='utf8mb4', minsize=0, maxsize=pool_size)
+        return _pools[server]
+
+async def _execute(query, params, as_dict, primary, fetch):
+    pool = await _pool(db.read_server(primary))
+    async with pool.acquire() as connection:
+        async with connection.cursor(aiomysql.DictCursor if as_dict else aiomysql.Cursor) as cursor:
+            await cursor.execute(query, params)
+            return await fetch(cursor)
+
+async def fetch_all(row_class, query, params=(), primary=False):
+    """Runs a read-only query and returns all of its rows.
+
+    Args:
+        row_class: The row class of the query (see `repositories.rows`), or
+            `None` for dictionary rows.
+        query (str): The SELECT query.
+        params (tuple): Its parameters.
+        primary (bool): Pass `True` to read from the primary server even when
+            the request could use a replica.
+
+    Returns:
+        list: The rows.
+    """
+    rows = await _execute(query, params, row_class is None, primary, lambda cursor: cursor.fetchall())
+    return list(rows) if row_class is None else list(map(row_class._make, rows))
+
+async def fetch_one(row_class, query, params=(), primary=False):
+    """Runs a read-only query and returns its first row, or `None` if it has no
+    rows (see `fetch_all()`)."""
+    row = await _execute(query, params, row_class is None, primary, lambda cursor: cursor.fetchone())
+    return row if row is None or row_class is None else row_class._make(row)
+
+async def fetch_value(query, params=(), primary=False):
+    """Runs a read-only query selecting a single column, and returns the value in
+    its first row, or `None` if it has no rows."""
+    row = await _execute(query, params, False, primary, lambda cursor: cursor.fetchone())
+    return None if row is None else row[0]
+
+async def close_pools():
+    """Closes every pool, waiting for their connections to be released."""
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        pool.close()
+        await pool.wait_closed()
@@ -0,0 +1,507 @@
+"""Implements the cache for InternLink.
+
+There are two tiers:
+- An in-process tier per worker process: a least-recently-used (LRU) map
+  holding at most `CACHE_MAX_ENTRIES` entries, each with a time-to-live (TTL,
+  default `CACHE_DEFAULT_TTL` seconds).
+- With `CACHE_BACKEND` set to `"sqlite"`, a shared tier in a SQLite file
+  (`CACHE_SHARED_PATH`, default: instance/cache.sqlite3) that all the worker
+  processes on the server (and the CLI commands) use. A value computed by one
+  process is then found by the others, and invalidations reach them too: every
+  deleted key or tag is logged in the file, and each process replays the log
+  every `SYNC_INTERVAL` seconds to drop its own copies.
+Setting `CACHE_BACKEND` to `"none"` turns the cache off: `get()` always misses
+and `put()` does nothing.
+
+Entries can carry tags, such as `company:{emp_id}` or `internship:{id}`
+(see the `*_tag()` helpers below). Writes that change cached data call
+`invalidate_tags()` with the tags they affect, so every entry built from that
+data is dropped at once without the writer knowing the keys.
+
+When a missing value is computed with `get_or_compute()` (or a `@cached`
+function), only one thread per process computes it. Other threads asking for
+the same key meanwhile wait for that result instead of all running the same
+query at once (a "cache stampede").
+
+Two things keep a refill from bringing back data that was just invalidated:
+- Every key and tag has a generation, bumped when it is invalidated here or
+  (after the log replay) in another process. `get_or_compute()` notes the
+  generations before computing and drops the result if its key or tags were
+  invalidated meanwhile, as it may have been read before the write. Code
+  filling entries with `put()` does the same by passing the `generation()` it
+  took before reading.
+- For `recent_window` seconds after a tag is invalidated (the replica sticky
+  time when read replicas are configured), `get_or_compute()` computes entries
+  carrying it with `db.primary_reads()`, so a lagging replica can't serve the
+  data from before the write.
+
+Usage:
+------
+```
+>>> cache.init_cache(app)
+>>> @cache.cached('application_summary', tags=lambda student_id: [cache.student_tag(student_id)])
+>>> def get_application_summary(student_id):
+>>>     ...
+>>> cache.invalidate_tags(cache.student_tag(student_id))
+```
+`get()`, `put()` and `delete()` work on single keys. Hits and misses are counted
+per cache name (the part of the key before the first ':'), see `cache_stats()`.
+"""
+import contextlib
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Flask
+
+from internlinkApp import db
+
+# Seconds between replays of the shared tier's invalidation log.
+SYNC_INTERVAL = 1.0
+
+# Seconds invalidations stay in the shared log (longer than any TTL in use).
+INVALIDATION_RETENTION = 3600
+
+# Seconds between removals of expired entries and old invalidations from the shared file.
+CLEANUP_INTERVAL = 60
+
+# Number of generation counters. Keys and tags are hashed onto them, so two
+# names sharing a counter only cost the occasional dropped refill.
+GENERATION_SLOTS = 4096
+
+_MISSING = object()
+
+# key -> (expiry time, value, tags), least recently used first
+_entries = OrderedDict()
+# tag -> keys of the in-process entries carrying it
+_tag_keys = {}
+_lock = threading.Lock()
+
+# key -> [lock held while computing it, number of threads using the lock]
+_computing = {}
+
+# Per hashed key or tag: times it was invalidated, and when it last was.
+_generations = [0] * GENERATION_SLOTS
+_invalidated_at = [0.0] * GENERATION_SLOTS
+
+# cache name -> {'hits', 'shared_hits', 'misses', 'coalesced'}, and other events -> count
+_counters = {}
+_events = {'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+# Set by `init_cache()`.
+enabled = True
+default_ttl = 300
+max_entries = 10000
+shared_path = None
+recent_window = 0
+_last_sync = 0.0
+_last_cleanup = 0.0
+_last_sequence = 0
+
+def init_cache(app: Flask):
+    """Sets up the cache for the specified Flask app.
+
+    Args:
+        app: The `Flask` application whose configuration (`CACHE_BACKEND`,
+            `CACHE_DEFAULT_TTL`, `CACHE_MAX_ENTRIES` and `CACHE_SHARED_PATH`)
+            should be used.
+    """
+    global enabled, default_ttl, max_entries, shared_path, recent_window, _last_sequence
+    backend = app.config.get('CACHE_BACKEND', 'memory')
+    enabled = backend != 'none'
+    default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+    max_entries = app.config.get('CACHE_MAX_ENTRIES', 10000)
+    recent_window = app.config.get('DB_REPLICA_STICKY_SECONDS', 5) if app.config.get('DB_REPLICAS') else 0
+    shared_path = None
+    clear()
+    _counters.clear()
+    _events.update(dict.fromkeys(_events, 0))
+
+    if backend == 'sqlite':
+        shared_path = app.config.get('CACHE_SHARED_PATH') or os.path.join(app.instance_path, 'cache.sqlite3')
+        os.makedirs(os.path.dirname(shared_path), exist_ok=True)
+        with _shared() as shared:
+            shared.execute('PRAGMA journal_mode=WAL')
+            shared.execute('''
+                CREATE TABLE IF NOT EXISTS entry (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                )''')
+            shared.execute('CREATE TABLE IF NOT EXISTS entry_tag (tag TEXT NOT NULL, key TEXT NOT NULL, '
+                           'PRIMARY KEY (tag, key))')
+            shared.execute('CREATE INDEX IF NOT EXISTS entry_tag_key ON entry_tag (key)')
+            shared.execute('''
+                CREATE TABLE IF NOT EXISTS invalidation (
+                    sequence INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    invalidated_at REAL NOT NULL
+                )''')
+            # Only invalidations logged from now on concern this process, as its own tier starts empty.
+            _last_sequence = shared.execute('SELECT COALESCE(MAX(sequence), 0) FROM invalidation').fetchone()[0]
+
+def _shared():
+    """Opens a connection to the shared SQLite file (closed when the `with`
+    block ends)."""
+    connection = sqlite3.connect(shared_path, timeout=5, isolation_level=None)
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return contextlib.closing(connection)
+
+def _slot(kind, name):
+    return hash((kind, name)) % GENERATION_SLOTS
+
+def _bump(kind, name, invalidated_at):
+    """Records that a key or tag was invalidated (call with `_lock` held)."""
+    slot = _slot(kind, name)
+    _generations[slot] += 1
+    _invalidated_at[slot] = max(_invalidated_at[slot], invalidated_at)
+
+def generation():
+    """Notes the current generation of every key and tag, to pass to `put()`.
+
+    Take it before reading the data an entry is built from: `put()` then drops
+    the entry if its key or any of its tags was invalidated in between.
+    """
+    _sync_shared()
+    with _lock:
+        local = tuple(_generations)
+    return local, _shared_sequence()
+
+def _shared_sequence():
+    if shared_path is None:
+        return None
+    try:
+        with _shared() as shared:
+            return shared.execute('SELECT COALESCE(MAX(sequence), 0) FROM invalidation').fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"Error reading the shared cache: {e}")
+        return None
+
+def _changed_since(local, key, tags):
+    """Checks whether `key` or `tags` were invalidated in this process since
+    the generations `local` were noted (call with `_lock` held)."""
+    slots = [_slot('key', key)] + [_slot('tag', tag) for tag in tags]
+    return any(_generations[slot] != local[slot] for slot in slots)
+
+def recently_invalidated(tags, within=None):
+    """Checks whether any of `tags` was invalidated in the last `within`
+    seconds (default `recent_window`)."""
+    since = time.time() - (recent_window if within is None else within)
+    with _lock:
+        return any(_invalidated_at[_slot('tag', tag)] >= since for tag in tags)
+
+def _count(key, counter):
+    name = key.split(':', 1)[0]
+    with _lock:
+        counters = _counters.setdefault(name, {'hits': 0, 'shared_hits': 0, 'misses': 0, 'coalesced': 0})
+        counters[counter] += 1
+
+def _remove(key):
+    """Drops `key` from the in-process tier (call with `_lock` held)."""
+    entry = _entries.pop(key, None)
+    if entry is not None:
+        for tag in entry[2]:
+            keys = _tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del _tag_keys[tag]
+
+def _store_local(key, value, expires_at, tags, since=None):
+    with _lock:
+        if since is not None and _changed_since(since, key, tags):
+            return
+        _remove(key)
+        _entries[key] = (expires_at, value, tuple(tags))
+        for tag in tags:
+            _tag_keys.setdefault(tag, set()).add(key)
+        while len(_entries) > max_entries:
+            _remove(next(iter(_entries)))
+            _events['evictions'] += 1
+
+def _lookup(key):
+    """Finds `key` in the in-process tier, then in the shared tier.
+
+    Returns:
+        tuple: (value or `_MISSING`, 'hits', 'shared_hits' or 'misses')
+    """
+    _sync_shared()
+    now = time.time()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            if entry[0] >= now:
+                _entries.move_to_end(key)
+                return entry[1], 'hits'
+            _remove(key)
+            _events['expirations'] += 1
+
+    if shared_path is not None:
+        try:
+            with _shared() as shared:
+                row = shared.execute('SELECT value, expires_at FROM entry WHERE key = ? AND expires_at >= ?',
+                                     (key, now)).fetchone()
+                if row is not None:
+                    tags = [tag for tag, in shared.execute('SELECT tag FROM entry_tag WHERE key = ?', (key,))]
+                    value = pickle.loads(row[0])
+                    _store_local(key, value, row[1], tags)
+                    return value, 'shared_hits'
+        except Exception as e:
+            # A broken or unreadable entry is treated as a miss, and replaced when the value is computed again.
+            print(f"Error reading the shared cache: {e}")
+    return _MISSING, 'misses'
+
+def get(key):
+    """Gets the cached value for `key`, or `None` if it is missing or expired."""
+    if not enabled:
+        return None
+    value, counter = _lookup(key)
+    _count(key, counter)
+    return None if value is _MISSING else value
+
+def put(key, value, ttl=None, tags=(), since=None):
+    """Stores `value` under `key` for `ttl` seconds (default `CACHE_DEFAULT_TTL`).
+
+    Args:
+        key (str): The cache key, starting with the cache name (e.g.
+            'application_summary:12').
+        value: Any value that can be pickled (`None` can't be cached).
+        ttl (int): Seconds to keep the value.
+        tags (list): Tags to invalidate the entry with (see `invalidate_tags()`).
+        since: The `generation()` taken before reading the data `value` was
+            built from. If `key` or any of `tags` was invalidated since, the
+            value may be stale and isn't stored.
+    """
+    if not enabled or value is None:
+        return
+    local, sequence = since if since is not None else (None, None)
+    with _lock:
+        if local is not None and _changed_since(local, key, tags):
+            return
+    expires_at = time.time() + (default_ttl if ttl is None else ttl)
+    if shared_path is not None:
+        try:
+            with _shared() as shared:
+                shared.execute('BEGIN IMMEDIATE')
+                tag_list = ", ".join(["?"] * len(tags)) or "NULL"
+                if sequence is not None and shared.execute(f'''
+                        SELECT 1 FROM invalidation
+                        WHERE sequence > ? AND ((kind = 'key' AND name = ?) OR (kind = 'tag' AND name IN ({tag_list})))
+                        LIMIT 1''', (sequence, key, *tags)).fetchone():
+                    # Invalidated by another process since.
+                    shared.execute('ROLLBACK')
+                    return
+                shared.execute('INSERT OR REPLACE INTO entry (key, value, expires_at) VALUES (?, ?, ?)',
+                               (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires_at))
+                shared.execute('DELETE FROM entry_tag WHERE key = ?', (key,))
+                shared.executemany('INSERT OR IGNORE INTO entry_tag (tag, key) VALUES (?, ?)',
+                                   [(tag, key) for tag in tags])
+                shared.execute('COMMIT')
+        except (sqlite3.Error, pickle.PickleError) as e:
+            print(f"Error writing to the shared cache: {e}")
+    _store_local(key, value, expires_at, tags, since=local)
+
+def get_or_compute(key, compute, ttl=None, tags=()):
+    """Gets the cached value for `key`, or computes, caches and returns it.
+
+    Only one thread per process runs `compute()` for a given key at a time;
+    the others wait for it and use its result.
+
+    Args:
+        key (str): The cache key.
+        compute: Function called with no arguments to build the value. `None`
+            results are returned but not cached.
+        ttl (int): Seconds to keep the value (default `CACHE_DEFAULT_TTL`).
+        tags (list): Tags to invalidate the entry with.
+    """
+    if not enabled:
+        return compute()
+    value, counter = _lookup(key)
+    _count(key, counter)
+    if value is not _MISSING:
+        return value
+
+    with _lock:
+        computing = _computing.setdefault(key, [threading.Lock(), 0])
+        computing[1] += 1
+    try:
+        with computing[0]:
+            # Another thread may have computed it while this one was waiting.
+            value, counter = _lookup(key)
+            if value is not _MISSING:
+                _count(key, 'coalesced')
+                return value
+            since = generation()
+            if tags and recently_invalidated(tags):
+                with db.primary_reads():
+                    value = compute()
+            else:
+                value = compute()
+            put(key, value, ttl=ttl, tags=tags, since=since)
+            return value
+    finally:
+        with _lock:
+            computing[1] -= 1
+            if not computing[1]:
+                del _computing[key]
+
+def cached(name, tags=None, ttl=None):
+    """Caches the results of the decorated function with `get_or_compute()`.
+
+    The key is `name` followed by the arguments, separated by ':' (e.g.
+    'application_summary:12'), so the arguments must be simple values. Code
+    computing the same entries another way (e.g. asynchronously, see asgi.py)
+    gets their key, tags and TTL from the wrapper's `cache_key()`,
+    `cache_tags()` and `cache_ttl`.
+
+    Args:
+        name (str): The cache name, used as the key prefix and in the counters.
+        tags: Function called with the same arguments, returning the tags of
+            the entry (default: no tags).
+        ttl (int): Seconds to keep each result (default `CACHE_DEFAULT_TTL`).
+    """
+    def cache_key(*args, **kwargs):
+        return ':'.join([name, *map(str, args), *(f'{arg}={value}' for arg, value in sorted(kwargs.items()))])
+
+    def cache_tags(*args, **kwargs):
+        return tags(*args, **kwargs) if tags else ()
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return get_or_compute(cache_key(*args, **kwargs), lambda: function(*args, **kwargs), ttl=ttl,
+                                  tags=cache_tags(*args, **kwargs))
+        wrapper.cache_key, wrapper.cache_tags, wrapper.cache_ttl = cache_key, cache_tags, ttl
+        return wrapper
+    return decorate
+
+def delete(*keys):
+    """Removes every one of `keys` from the cache (missing keys are ignored)."""
+    _invalidate('key', keys)
+
+def invalidate_tags(*tags):
+    """Removes every entry carrying any of `tags`, in every process."""
+    _invalidate('tag', tags)
+
+def _invalidate(kind, names):
+    if not names:
+        return
+    now = time.time()
+    with _lock:
+        for name in names:
+            _bump(kind, name, now)
+            for key in ([name] if kind == 'key' else list(_tag_keys.get(name, ()))):
+                _remove(key)
+        _events['invalidations'] += len(names)
+
+    if shared_path is not None:
+        try:
+            with _shared() as shared:
+                shared.execute('BEGIN IMMEDIATE')
+                for name in names:
+                    keys = [name] if kind == 'key' else [key for key, in shared.execute(
+                        'SELECT key FROM entry_tag WHERE tag = ?', (name,))]
+                    shared.executemany('DELETE FROM entry WHERE key = ?', [(key,) for key in keys])
+                    shared.executemany('DELETE FROM entry_tag WHERE key = ?', [(key,) for key in keys])
+                shared.executemany('INSERT INTO invalidation (kind, name, invalidated_at) VALUES (?, ?, ?)',
+                                   [(kind, name, now) for name in names])
+                shared.execute('COMMIT')
+        except sqlite3.Error as e:
+            print(f"Error invalidating the shared cache: {e}")
+
+def _sync_shared():
+    """Replays the invalidations other processes logged since the last sync (at
+    most every `SYNC_INTERVAL` seconds), and cleans up the shared file."""
+    global _last_sync, _last_cleanup, _last_sequence
+    if shared_path is None or time.time() - _last_sync < SYNC_INTERVAL:
+        return
+    _last_sync = now = time.time()
+    try:
+        with _shared() as shared:
+            invalidations = shared.execute('SELECT sequence, kind, name, invalidated_at FROM invalidation '
+                                           'WHERE sequence > ? ORDER BY sequence', (_last_sequence,)).fetchall()
+            if now - _last_cleanup >= CLEANUP_INTERVAL:
+                _last_cleanup = now
+                shared.execute('DELETE FROM invalidation WHERE invalidated_at < ?', (now - INVALIDATION_RETENTION,))
+                shared.execute('DELETE FROM entry_tag WHERE key IN (SELECT key FROM entry WHERE expires_at < ?)', (now,))
+                shared.execute('DELETE FROM entry WHERE expires_at < ?', (now,))
+    except sqlite3.Error as e:
+        print(f"Error syncing with the shared cache: {e}")
+        return
+
+    with _lock:
+        for sequence, kind, name, invalidated_at in invalidations:
+            _bump(kind, name, invalidated_at)
+            for key in ([name] if kind == 'key' else list(_tag_keys.get(name, ()))):
+                _remove(key)
+            _last_sequence = sequence
+
+def clear():
+    """Removes everything from this process's cache (the shared tier is kept)."""
+    with _lock:
+        _entries.clear()
+        _tag_keys.clear()
+
+def cache_stats():
+    """Summarises this process's cache.
+
+    Returns:
+        dict: 'names' (cache name -> 'hits', 'shared_hits', 'misses',
+        'coalesced' (misses that got another thread's result) and
+        'hit_rate'), 'events' ('evictions', 'expirations', 'invalidations'),
+        'entries', 'max_entries', 'backend' and 'shared_entries' (None without
+        a shared tier).
+    """
+    with _lock:
+        names = {name: dict(counters) for name, counters in sorted(_counters.items())}
+        events = dict(_events)
+        entries = len(_entries)
+    for counters in names.values():
+        lookups = counters['hits'] + counters['shared_hits'] + counters['misses']
+        # Coalesced misses waited for another thread's result rather than computing it themselves.
+        served = counters['hits'] + counters['shared_hits'] + counters['coalesced']
+        counters['hit_rate'] = served / lookups if lookups else None
+
+    shared_entries = None
+    if shared_path is not None:
+        try:
+            with _shared() as shared:
+                shared_entries = shared.execute('SELECT COUNT(*) FROM entry WHERE expires_at >= ?',
+                                                (time.time(),)).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error reading the shared cache: {e}")
+    backend = 'none' if not enabled else ('sqlite' if shared_path else 'memory')
+    return {'names': names, 'events': events, 'entries': entries, 'max_entries': max_entries, 'backend': backend,
+            'shared_entries': shared_entries}
+
+def internship_page_key(internship_id):
+    """Cache key of the rendered internship details page."""
+    return f'internship_page:{internship_id}'
+
+def employer_tag(emp_id):
+    """Tag of the entries built from an employer's internships or applications."""
+    return f'employer:{emp_id}'
+
+def company_tag(emp_id):
+    """Tag of the entries showing an employer's company details (name, description, website and logo)."""
+    return f'company:{emp_id}'
+
+def internship_tag(internship_id):
+    """Tag of the entries built from an internship."""
+    return f'internship:{internship_id}'
+
+def student_tag(student_id):
+    """Tag of the entries built from a student's applications."""
+    return f'student:{student_id}'
+
+def user_tag(user_id):
+    """Tag of the entries built from a user's account or notifications."""
+    return f'user:{user_id}'
+
+# Tag of the entries listing user accounts (e.g. the admin user list).
+USERS_TAG = 'users'
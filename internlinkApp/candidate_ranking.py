@@ -0,0 +1,117 @@
+"""Ranks the applicants to an internship by how well they match it.
+
+Each application stores a `relevance_score` between 0 and 1: the cosine
+similarity between the internship's title and required skills and the
+applicant's course, university and resume text (see
+`recommendations.term_frequencies()` for how text becomes a vector). Employers
+can then sort their applications by relevance with a plain `ORDER BY`, at no
+extra cost per page view.
+
+Scores are computed per internship in one batch (the internship's vector is
+built once and compared with every applicant), and kept up to date
+incrementally:
+- A new application is scored in the transaction that inserts it.
+- When a student changes their profile, or their new resume has been indexed
+  (resume_index.py), the `score_student_applications` job rescores their
+  applications.
+
+Applications without a score (e.g. created before this existed) can be scored
+with:
+
+    flask --app run score-applications
+"""
+import math
+
+import click
+from flask.cli import with_appcontext
+
+from internlinkApp import db, jobs
+from internlinkApp.recommendations import term_frequencies
+
+def internship_terms(internship):
+    """Term vector of an internship row (title and skills_required)."""
+    return term_frequencies({'title': internship['title'], 'skills_required': internship['skills_required']})
+
+def applicant_terms(applicant):
+    """Term vector of an applicant row (course, university and, once indexed, resume_text)."""
+    return term_frequencies({'course': applicant['course'], 'university': applicant['university'],
+                             'resume': applicant.get('resume_text')})
+
+def similarity(terms, other_terms):
+    """Cosine similarity of two term vectors (0 when either is empty)."""
+    if len(other_terms) < len(terms):
+        terms, other_terms = other_terms, terms
+    dot = sum(weight * other_terms.get(term, 0.0) for term, weight in terms.items())
+    if not dot:
+        return 0.0
+    return dot / (math.sqrt(sum(w * w for w in terms.values())) * math.sqrt(sum(w * w for w in other_terms.values())))
+
+def score_applications(cursor, internship_id, student_ids=None, only_missing=False):
+    """Computes and stores the relevance scores of an internship's applications.
+
+    Args:
+        cursor: The cursor to run the queries with (use one in the open
+            transaction when scoring a new application).
+        internship_id (int): The internship whose applications are scored.
+        student_ids (list): Only score these students' applications (default: all).
+        only_missing (bool): Only score applications that have no score yet.
+
+    Returns:
+        int: Number of applications scored.
+    """
+    cursor.execute("SELECT title, skills_required FROM internship WHERE internship_id = %s;", (internship_id,))
+    internship = cursor.fetchone()
+    if not internship:
+        return 0
+
+    query = """
+        SELECT a.student_id, s.course, s.university, rt.content AS resume_text
+        FROM application a
+        JOIN student s ON a.student_id = s.student_id
+        LEFT JOIN resume_text rt ON s.resume_hash = rt.file_hash
+        WHERE a.internship_id = %s
+    """
+    params = [internship_id]
+    if student_ids:
+        query += " AND a.student_id IN (" + ", ".join(["%s"] * len(student_ids)) + ")"
+        params.extend(student_ids)
+    if only_missing:
+        query += " AND a.relevance_score IS NULL"
+    cursor.execute(query + ";", tuple(params))
+    applicants = cursor.fetchall()
+    if not applicants:
+        return 0
+
+    wanted = internship_terms(internship)
+    cursor.executemany("""
+        UPDATE application SET relevance_score = %s WHERE student_id = %s AND internship_id = %s;
+    """, [(round(similarity(wanted, applicant_terms(applicant)), 4), applicant['student_id'], internship_id)
+          for applicant in applicants])
+    return len(applicants)
+
+@jobs.job('score_student_applications', max_attempts=3)
+def score_student_applications(student_id):
+    """Rescores every application of a student (after their profile changed)."""
+    with db.transaction() as cursor:
+        cursor.execute("SELECT internship_id FROM application WHERE student_id = %s;", (student_id,))
+        for row in cursor.fetchall():
+            score_applications(cursor, row['internship_id'], student_ids=[student_id])
+
+@click.command('score-applications')
+@click.option('--all', 'rescore_all', is_flag=True, help='Rescore every application, not only unscored ones.')
+@with_appcontext
+def score_applications_command(rescore_all):
+    """Computes the relevance scores used to rank applicants."""
+    with db.get_cursor(read_only=True) as cursor:
+        if rescore_all:
+            cursor.execute("SELECT DISTINCT internship_id FROM application;")
+        else:
+            cursor.execute("SELECT DISTINCT internship_id FROM application WHERE relevance_score IS NULL;")
+        internship_ids = [row['internship_id'] for row in cursor.fetchall()]
+
+    scored = 0
+    for internship_id in internship_ids:
+        # One transaction per internship keeps locks short on large applicant pools.
+        with db.transaction() as cursor:
+            scored += score_applications(cursor, internship_id, only_missing=not rescore_all)
+    click.echo(f"Scored {scored} application(s) across {len(internship_ids)} internship(s).")
@@ -0,0 +1,145 @@
+"""Compresses responses (gzip, or brotli when it is installed).
+
+The listing pages (internships, applications, users) are large, repetitive HTML
+tables that shrink to a fraction of their size when compressed. After every
+request, the response is compressed when:
+- the browser accepts an encoding we support (brotli is preferred over gzip,
+  and `q=0` in `Accept-Encoding` is respected),
+- its content type is listed in `COMPRESSION_LEVELS`,
+- it is at least `COMPRESSION_MIN_SIZE` bytes long (smaller bodies gain
+  little and cost CPU), and
+- it isn't a file sent as-is, already encoded, or marked `no-transform`.
+
+Streamed responses (e.g. the application exports) are compressed as they are
+produced. The compressor is flushed after every `STREAM_FLUSH_SIZE` bytes of
+input, so the client keeps receiving data without each small chunk (one CSV
+line) being compressed on its own. Server-Sent Event streams are left alone,
+as every event must reach the browser immediately.
+
+Compressed responses carry `Vary: Accept-Encoding`, and their ETag is marked
+weak, as the compressed body is not byte-for-byte the one it was computed for
+(conditional requests keep working).
+"""
+import zlib
+
+from flask import Flask, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compression levels per content type: (gzip level 1-9, brotli quality 0-11). Pages are compressed on every request,
+# so they use mid levels, which get most of the size reduction for a fraction of the CPU time of the maximum ones.
+# Streamed exports are large and produced incrementally, so they use cheaper levels.
+COMPRESSION_LEVELS = {
+    'text/html': (6, 5),
+    'application/json': (6, 5),
+    'text/csv': (5, 4),
+    'application/x-ndjson': (5, 4),
+    'text/plain': (6, 5),
+    'text/css': (9, 11),
+    'text/javascript': (9, 11),
+    'application/javascript': (9, 11),
+}
+
+# Uncompressed bytes of a streamed response after which the compressed data so far is sent.
+STREAM_FLUSH_SIZE = 64 * 1024
+
+# Set by `init_compression()`.
+min_size = 1024
+
+def init_compression(app: Flask):
+    """Turns on response compression for the specified Flask app, unless
+    `COMPRESSION` is off. Reads `COMPRESSION_MIN_SIZE` from its configuration."""
+    global min_size
+    if not app.config.get('COMPRESSION', True):
+        return
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+    app.after_request(compress_response)
+
+def choose_encoding(accept_encoding):
+    """Picks the best supported encoding from an `Accept-Encoding` header.
+
+    Returns:
+        str: 'br', 'gzip', or None to leave the response uncompressed.
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    for encoding in candidates:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+def compress_response(response):
+    """`after_request` hook compressing the response when worthwhile (see the module docs)."""
+    levels = COMPRESSION_LEVELS.get(response.mimetype)
+    if (levels is None
+            or request.method == 'HEAD'
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding, levels)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        response.set_data(_compress(body, encoding, levels))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def _compressor(encoding, levels):
+    if encoding == 'br':
+        return brotli.Compressor(quality=levels[1])
+    return zlib.compressobj(levels[0], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+def _compress(body, encoding, levels):
+    if encoding == 'br':
+        return brotli.compress(body, quality=levels[1])
+    compressor = _compressor(encoding, levels)
+    return compressor.compress(body) + compressor.flush()
+
+def _compress_stream(chunks, encoding, levels):
+    """Compresses an iterable of chunks, flushing every `STREAM_FLUSH_SIZE` bytes."""
+    compressor = _compressor(encoding, levels)
+    unflushed = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.process(chunk) if encoding == 'br' else compressor.compress(chunk)
+            unflushed += len(chunk)
+            if unflushed >= STREAM_FLUSH_SIZE:
+                data += compressor.flush() if encoding == 'br' else compressor.flush(zlib.Z_SYNC_FLUSH)
+                unflushed = 0
+            if data:
+                yield data
+        yield compressor.finish() if encoding == 'br' else compressor.flush()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
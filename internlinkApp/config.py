@@ -0,0 +1,147 @@
+"""Reads the InternLink runtime configuration from environment variables.
+
+Every setting has a sensible default so the app still runs locally without any
+environment set up. The database defaults come from connect.py, which means an
+existing local setup keeps working unchanged, while a deployment can override
+any value (e.g. `INTERNLINK_DB_POOL_SIZE=10`) without editing the code.
+
+The settings are read when `load_config()` is called (i.e. inside
+`create_app()`), not when this module is imported.
+"""
+import os
+
+from internlinkApp import connect
+
+# Prefix shared by every environment variable that this module reads.
+ENV_PREFIX = 'INTERNLINK_'
+
+def env_str(name, default=None):
+    """Returns the value of the environment variable `INTERNLINK_<name>`, or
+    `default` if it is not set."""
+    return os.environ.get(ENV_PREFIX + name, default)
+
+def env_int(name, default):
+    """Returns the environment variable `INTERNLINK_<name>` as an integer, or
+    `default` if it is not set or is not a valid integer."""
+    value = env_str(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Ignoring invalid integer for {ENV_PREFIX + name}: {value!r}")
+        return default
+
+def env_bool(name, default):
+    """Returns the environment variable `INTERNLINK_<name>` as a boolean, or
+    `default` if it is not set."""
+    value = env_str(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def load_config():
+    """Builds the Flask configuration dictionary from the environment.
+
+    Returns:
+        dict: Configuration values to pass to `app.config.update()`.
+    """
+    return {
+        # Used for signing session cookies.
+        'SECRET_KEY': env_str('SECRET_KEY', 'SECRET_KEY_FOR_RAGHAV_INTERNLINK_PROJECT_iT_IS_SECURE'),
+
+        # MySQL connection details.
+        'DB_USER': env_str('DB_USER', connect.dbuser),
+        'DB_PASSWORD': env_str('DB_PASSWORD', connect.dbpass),
+        'DB_HOST': env_str('DB_HOST', connect.dbhost),
+        'DB_NAME': env_str('DB_NAME', connect.dbname),
+        'DB_PORT': env_int('DB_PORT', connect.dbport),
+        # Number of idle connections kept open per worker process between
+        # requests. `0` turns pooling off (a new connection for every request).
+        'DB_POOL_SIZE': env_int('DB_POOL_SIZE', 0),
+        # Comma-separated read replicas ("host" or "host:port") for read-only
+        # queries in GET requests, and how long a session sticks to the primary
+        # after it writes something.
+        'DB_REPLICAS': [host for host in env_str('DB_REPLICAS', '').split(',') if host.strip()],
+        'DB_REPLICA_STICKY_SECONDS': env_int('DB_REPLICA_STICKY_SECONDS', 5),
+        # Maximum aiomysql connections per server for the async views served
+        # by the ASGI app (see asgi.py and async_db.py), per worker process.
+        'ASYNC_DB_POOL_SIZE': env_int('ASYNC_DB_POOL_SIZE', 10),
+
+        # Which cache backend to use: "memory" (per process), "sqlite" (per process, plus a tier shared by all the
+        # processes on the server, in CACHE_SHARED_PATH; default: instance/cache.sqlite3) or "none".
+        'CACHE_BACKEND': env_str('CACHE_BACKEND', 'memory'),
+        'CACHE_DEFAULT_TTL': env_int('CACHE_DEFAULT_TTL', 300),
+        # Entries kept per process before the least recently used are evicted.
+        'CACHE_MAX_ENTRIES': env_int('CACHE_MAX_ENTRIES', 10000),
+        'CACHE_SHARED_PATH': env_str('CACHE_SHARED_PATH'),
+
+        # Serve the details page of open internships from the in-memory
+        # internship catalogue rather than querying the database.
+        'CATALOG_DETAILS': env_bool('CATALOG_DETAILS', True),
+
+        # Archival: days after its deadline an internship (with its decided
+        # applications) stays in the live tables, internships archived per
+        # transaction, and the minimum pause between batches (milliseconds).
+        'ARCHIVE_RETENTION_DAYS': env_int('ARCHIVE_RETENTION_DAYS', 180),
+        'ARCHIVE_BATCH_SIZE': env_int('ARCHIVE_BATCH_SIZE', 200),
+        'ARCHIVE_BATCH_PAUSE_MS': env_int('ARCHIVE_BATCH_PAUSE_MS', 500),
+
+        # Background job queue: worker threads per process (0 = only queue jobs
+        # here) and the SQLite journal file (default: instance/jobs.sqlite3).
+        'JOB_WORKERS': env_int('JOB_WORKERS', 2),
+        'JOB_JOURNAL_PATH': env_str('JOB_JOURNAL_PATH'),
+
+        # Application status notifications: email sink ("file" or "none"), the
+        # folder the "file" sink writes to (default: instance/outbox), and how
+        # long (seconds) to wait so close-together changes share one digest.
+        'EMAIL_SINK': env_str('EMAIL_SINK', 'file'),
+        'EMAIL_OUTBOX_DIR': env_str('EMAIL_OUTBOX_DIR'),
+        'NOTIFICATION_DIGEST_DELAY': env_int('NOTIFICATION_DIGEST_DELAY', 30),
+
+        # Server-Sent Events: seconds between heartbeats on idle streams, and
+        # the most live streams one worker process serves at once.
+        'SSE_HEARTBEAT_SECONDS': env_int('SSE_HEARTBEAT_SECONDS', 15),
+        'SSE_MAX_CONNECTIONS': env_int('SSE_MAX_CONNECTIONS', 100),
+
+        # Response compression (gzip, or brotli when installed), and the
+        # smallest response body (bytes) worth compressing.
+        'COMPRESSION': env_bool('COMPRESSION', True),
+        'COMPRESSION_MIN_SIZE': env_int('COMPRESSION_MIN_SIZE', 1024),
+
+        # Login throttling: failed logins allowed per username and per client
+        # IP within the sliding window (seconds) before further attempts are
+        # refused (0 = no limit), and the SQLite file the worker processes
+        # share the counts through (default: instance/login_throttle.sqlite3).
+        'LOGIN_THROTTLE_WINDOW': env_int('LOGIN_THROTTLE_WINDOW', 900),
+        'LOGIN_MAX_FAILURES_PER_USER': env_int('LOGIN_MAX_FAILURES_PER_USER', 5),
+        'LOGIN_MAX_FAILURES_PER_IP': env_int('LOGIN_MAX_FAILURES_PER_IP', 50),
+        'LOGIN_THROTTLE_PATH': env_str('LOGIN_THROTTLE_PATH'),
+        # Number of reverse proxies in front of the app whose X-Forwarded-For
+        # (and -Proto) headers are trusted for the client address and scheme,
+        # e.g. for the per-IP login limit. Leave it at 0 when clients can reach
+        # the app directly, as they could then forge these headers.
+        'TRUSTED_PROXY_COUNT': env_int('TRUSTED_PROXY_COUNT', 0),
+
+        # Check usernames typed on the signup form against an in-memory filter
+        # of all usernames (see username_filter.py), sized for at least this
+        # many accounts.
+        'USERNAME_FILTER': env_bool('USERNAME_FILTER', True),
+        'USERNAME_FILTER_CAPACITY': env_int('USERNAME_FILTER_CAPACITY', 1000000),
+
+        # Templates: cache compiled templates on disk, shared by the worker
+        # processes (default: instance/jinja_cache), compile them all at
+        # startup, and measure rendering time per template, block and endpoint.
+        'TEMPLATE_BYTECODE_CACHE': env_bool('TEMPLATE_BYTECODE_CACHE', True),
+        'TEMPLATE_CACHE_DIR': env_str('TEMPLATE_CACHE_DIR'),
+        'TEMPLATE_WARMUP': env_bool('TEMPLATE_WARMUP', False),
+        'TEMPLATE_PROFILING': env_bool('TEMPLATE_PROFILING', False),
+
+        # Report database cursors, connections and files left open by a
+        # request, with the stack that opened them (see leak_detector.py).
+        # For development and soak tests only: it slows every query down.
+        'LEAK_DETECTION': env_bool('LEAK_DETECTION', False),
+
+        # Bcrypt work factor, read by Flask-Bcrypt. Lower it in tests for speed.
+        'BCRYPT_LOG_ROUNDS': env_int('BCRYPT_LOG_ROUNDS', 12),
+    }
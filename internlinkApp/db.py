@@ -20,6 +20,28 @@ When initialising your Flask application, call `init_db` passing in your
 >>> db.init_db(app, 'username', 'password', 'host', 'database', port)
 ```
 
+If you pass a `pool_size` greater than zero, connections are not closed at the
+end of each request. Up to `pool_size` idle connections are kept per process and
+handed out again to later requests, which saves a TCP + authentication round
+trip on every request.
+
+Read replicas:
+--------------
+You can also pass a list of read replica servers to `init_db` (as `"host"` or
+`"host:port"` strings). Read-only queries can then be sent to a replica with:
+```
+>>> with get_cursor(read_only=True) as cursor:
+>>>     # Your SELECT query here...
+```
+
+Each request picks one replica (round robin) and keeps it for all of its
+read-only cursors. Writes always go to the primary server, and so does every
+read-only cursor in a request that isn't a GET, or in any request made by the
+same session shortly after it sent a POST (see `sticky_seconds`), so users
+always see their own writes even if the replicas are lagging slightly behind.
+Read-only cursors opened inside a `with primary_reads():` block go to the
+primary too.
+
 Then, while handling a Flask request you can get a database connection
 specific to that request by calling:
 ```
@@ -45,21 +67,49 @@ Note that you don't have to close the database connection returned by
 `get_db()` as it will be closed automatically at the end of the Flask request.
 However, you should ensure that you close all cursors: this includes any
 created by the `get_cursor()` function, and any you create manually using the
-database connection.
+database connection. With `LEAK_DETECTION` on, cursors and connections from
+this module that are still open after a request are reported (see
+leak_detector.py).
 
 References:
 -----------
     [1] https://flask.palletsprojects.com/en/stable/tutorial/database/
     [2] https://pypi.org/project/mysqlclient/
 """
-from flask import Flask, g
+import contextlib
+import itertools
+import queue
+import threading
+import time
+
+from flask import Flask, g, has_app_context, has_request_context, request, session
 import MySQLdb
+import MySQLdb.cursors
+
+from internlinkApp import leak_detector
 
 # Database connection parameters (set when calling `init_db`).
 connection_params = {}
 
+# (host, port) of each read replica, and a round-robin iterator over them.
+replica_servers = []
+_replica_cycle = None
+_replica_lock = threading.Lock()
+
+# How long (in seconds) a session keeps reading from the primary after a write.
+sticky_seconds = 5
+
+# Session key holding the time until which the session reads from the primary.
+STICKY_SESSION_KEY = '_db_primary_until'
+
+# Idle connections waiting to be reused, one pool per (host, port) server (only
+# used when `pool_size` > 0).
+connection_pools = {}
+_pool_size = 0
+
 def init_db(app: Flask, user: str, password: str, host: str, database: str,
-            port: int = 3306, autocommit: bool = True):
+            port: int = 3306, autocommit: bool = True, pool_size: int = 0,
+            replicas: list = None, replica_sticky_seconds: int = 5):
     """Sets up MySQL connectivity for the specified Flask app.
 
     This must be called once while initialising your Flask web app, before any
@@ -73,7 +123,15 @@ def init_db(app: Flask, user: str, password: str, host: str, database: str,
         database: Name of the database to connect to on the MySQL server.
         port: Port used to connect to the MySQL server (default `3306`).
         autocommit: Whether or not to enable auto-commit (default `True`) .
+        pool_size: Maximum number of idle connections to keep for reuse
+            between requests, per server (default `0`, which disables pooling).
+        replicas: Read replica servers as `"host"` or `"host:port"` strings
+            (default `None`, meaning all queries go to the primary server).
+        replica_sticky_seconds: How long a session keeps reading from the
+            primary server after it sends a POST (default `5`).
     """
+    global _replica_cycle, _pool_size, sticky_seconds
+
     # Save connection details.
     connection_params['user'] = user
     connection_params['password'] = password
@@ -82,6 +140,17 @@ def init_db(app: Flask, user: str, password: str, host: str, database: str,
     connection_params['port'] = port
     connection_params['autocommit'] = autocommit
 
+    replica_servers.clear()
+    for replica in replicas or []:
+        replica_host, _, replica_port = replica.strip().partition(':')
+        if replica_host:
+            replica_servers.append((replica_host, int(replica_port) if replica_port else port))
+    _replica_cycle = itertools.cycle(replica_servers) if replica_servers else None
+    sticky_seconds = replica_sticky_seconds
+
+    _pool_size = pool_size
+    connection_pools.clear()
+
     # Register `close_db()` to run every time the application context is torn
     # down at the end of a Flask request, ensuring that any database connection
     # using during that request gets closed.
@@ -105,14 +174,127 @@ def get_db():
     by the `get_cursor()` function.
 
     Returns:
-        A `Connection` instance.
+        A `Connection` instance connected to the primary server.
     """
     if 'db' not in g:
-        g.db = MySQLdb.connect(**connection_params)
+        g.db = _acquire_connection(_primary_server())
+
+    if has_request_context() and request.method not in ('GET', 'HEAD') and replica_servers:
+        # Keep this session on the primary until the replicas have caught up.
+        session[STICKY_SESSION_KEY] = time.time() + sticky_seconds
 
     return g.db
 
-def get_cursor():
+def get_read_db():
+    """Gets a MySQL database connection for read-only queries while serving the
+    current Flask request.
+
+    This is a replica connection for GET requests when replicas are configured
+    and the session hasn't written anything recently. Otherwise it is the same
+    connection returned by `get_db()`. Never write through this connection.
+
+    Returns:
+        A `Connection` instance.
+    """
+    if not _can_use_replica():
+        return get_db()
+
+    if 'read_db' in g:
+        return g.read_db
+
+    g.read_db = _acquire_connection(read_server())
+    return g.read_db
+
+def read_server(primary: bool = False):
+    """Picks the server for read-only queries in the current request: the next
+    replica (round robin) if the request may use one, otherwise the primary.
+
+    Args:
+        primary: Pass `True` to always get the primary server.
+
+    Returns:
+        tuple: (host, port)
+    """
+    if primary or not _can_use_replica():
+        return _primary_server()
+    with _replica_lock:
+        return next(_replica_cycle)
+
+def _can_use_replica():
+    """Checks whether read-only queries in the current request may go to a
+    replica."""
+    if not replica_servers or not has_request_context():
+        return False
+    if request.method not in ('GET', 'HEAD') or g.get('primary_reads'):
+        return False
+    return session.get(STICKY_SESSION_KEY, 0) < time.time()
+
+@contextlib.contextmanager
+def primary_reads():
+    """Sends the read-only queries run inside the `with` block to the primary
+    server, e.g. when refilling a cache entry that was just invalidated, which a
+    lagging replica could still give the old data for."""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('primary_reads', False)
+    g.primary_reads = True
+    try:
+        yield
+    finally:
+        g.primary_reads = previous
+
+def _primary_server():
+    return (connection_params['host'], connection_params['port'])
+
+def _acquire_connection(server):
+    """Takes a live connection to `server` from the pool, or opens a new one if
+    the pool is empty (or disabled)."""
+    pool = connection_pools.get(server)
+    while pool is not None:
+        try:
+            connection = pool.get_nowait()
+        except queue.Empty:
+            break
+        try:
+            # The server may have dropped an idle connection (wait_timeout).
+            connection.ping()
+            leak_detector.track_connection(connection)
+            return connection
+        except MySQLdb.Error:
+            _close_quietly(connection)
+
+    params = dict(connection_params, host=server[0], port=server[1])
+    connection = MySQLdb.connect(**params)
+    connection._internlink_server = server
+    leak_detector.track_connection(connection)
+    return connection
+
+def _release_connection(connection):
+    """Returns a connection to its server's pool, or closes it if the pool is
+    full (or disabled)."""
+    leak_detector.release_connection(connection)
+    if _pool_size > 0:
+        server = getattr(connection, '_internlink_server', _primary_server())
+        pool = connection_pools.setdefault(server, queue.LifoQueue(maxsize=_pool_size))
+        try:
+            if not connection_params.get('autocommit', True):
+                # Never hand an open transaction on to the next request.
+                connection.rollback()
+            pool.put_nowait(connection)
+            return
+        except (queue.Full, MySQLdb.Error):
+            pass
+
+    _close_quietly(connection)
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except MySQLdb.Error:
+        pass
+
+def get_cursor(read_only: bool = False, as_dict: bool = True):
     """Gets a new MySQL dictionary cursor to use while serving the current
     Flask request.
     
@@ -121,15 +303,77 @@ def get_cursor():
     at any time during the request by calling `get_db()`.
     
     Ensure that you close all cursors before the end of the Flask request.
+
+    Args:
+        read_only: Pass `True` if you will only run SELECT queries with this
+            cursor, so they can be served by a read replica (default `False`).
+        as_dict: Pass `False` to get each row as a plain tuple instead of a
+            dictionary, which takes far less memory (see repositories/).
     
     Returns:
+        A new `MySQLdb.cursors.DictCursor` instance (or `MySQLdb.cursors.Cursor`
+        if `as_dict` is `False`).
+    """
+    connection = get_read_db() if read_only else get_db()
+    cursor = connection.cursor(cursorclass=MySQLdb.cursors.DictCursor if as_dict else MySQLdb.cursors.Cursor)
+    leak_detector.track_cursor(cursor)
+    return cursor
+
+def get_streaming_cursor(read_only: bool = True, as_dict: bool = True):
+    """Gets a new unbuffered (server-side) MySQL dictionary cursor.
+
+    Rows are sent by the server as you fetch them instead of all being loaded
+    into memory when the query runs, so even huge result sets use a small,
+    constant amount of memory. Fetch them with `fetchmany()` or by iterating.
+
+    While this cursor has unread rows, no other query can be run on the same
+    connection, so run any other queries you need first and close this cursor
+    as soon as you have read all the rows.
+
+    Args:
+        read_only: Whether the query may be served by a read replica (default
+            `True`).
+        as_dict: Pass `False` to get each row as a plain tuple.
+
+    Returns:
+        A new `MySQLdb.cursors.SSDictCursor` instance (or
+        `MySQLdb.cursors.SSCursor` if `as_dict` is `False`).
+    """
+    connection = get_read_db() if read_only else get_db()
+    cursor = connection.cursor(cursorclass=MySQLdb.cursors.SSDictCursor if as_dict else MySQLdb.cursors.SSCursor)
+    leak_detector.track_cursor(cursor)
+    return cursor
+
+@contextlib.contextmanager
+def transaction():
+    """Runs a group of statements as a single transaction on the primary server.
+
+    Use it in a `with` block. Everything executed through the cursor it gives
+    you is committed together at the end of the block, or rolled back if the
+    block raises an exception:
+    ```
+    >>> with db.transaction() as cursor:
+    >>>     cursor.execute("INSERT ...")
+    >>>     cursor.execute("UPDATE ...")
+    ```
+
+    Yields:
         A new `MySQLdb.cursors.DictCursor` instance.
     """
-    return get_db().cursor(cursorclass=MySQLdb.cursors.DictCursor)
+    connection = get_db()
+    connection.begin()
+    try:
+        with connection.cursor(cursorclass=MySQLdb.cursors.DictCursor) as cursor:
+            leak_detector.track_cursor(cursor)
+            yield cursor
+    except BaseException:
+        connection.rollback()
+        raise
+    connection.commit()
 
 def close_db(exception = None):
-    """Closes the MySQL database connection associated with the current Flask
-    request (if any).
+    """Closes the MySQL database connections associated with the current Flask
+    request (if any), or returns them to the pool when pooling is enabled.
     
     There should be no need to call this manually: this function is called
     automatically when the application context is torn down at the end of each
@@ -139,9 +383,10 @@ def close_db(exception = None):
         exception: The exception that terminated the Flask request, or `None`
             if the request terminated successfully.
     """
-    # Get the database connection from the current application context (the one
-    # that's being torn down), or `None` if there is no connection.
-    db = g.pop('db', None)
+    # Get the database connections from the current application context (the
+    # one that's being torn down), or `None` if there is no connection.
+    for key in ('db', 'read_db'):
+        db = g.pop(key, None)
     
-    if db is not None:
-        db.close()
\ No newline at end of file
+        if db is not None:
+            _release_connection(db)
@@ -5,27 +5,43 @@ It specifies features for: - Accessing the homepage of the employer.
 - Filtering and updating the status of their internship applications. 
 """
 
-from internlinkApp import app, db
-from flask import redirect, render_template, session, url_for, request, flash
+import csv
+import io
+import json
+from datetime import datetime
+
+from internlinkApp import application_counts, cache, db, live_updates, notifications, repositories, rollups
+from flask import Blueprint, Response, redirect, render_template, session, stream_with_context, url_for, request, flash
+
+bp = Blueprint('employer', __name__)
 
 # Employer Home Route
-@app.route('/employer/home')
+@bp.route('/employer/home')
 def employer_home():
      """
     The employer homepage's endpoint.
 
     takes people who aren't logged in to the login page.
     prevents individuals who are not employers from accessing the site.
+    shows the company's application statistics for the last 30 days, read from the daily rollups (see rollups.py).
     """
 
      if 'loggedin' not in session:
-          return redirect(url_for('login'))
+          return redirect(url_for('user.login'))
      elif session['role']!='employer':
           return render_template('access_denied.html'), 403
 
-     return render_template('employer_home.html')
+     dashboard = None
+     try:
+          emp_id = get_emp_id(session['user_id'])
+          if emp_id is not None:
+               dashboard = get_employer_dashboard(emp_id)
+     except Exception as e:
+          print(f"Error fetching employer dashboard statistics: {e}")
 
-@app.route('/employer/internships', methods=['GET'])
+     return render_template('employer_home.html', dashboard=dashboard)
+
+@bp.route('/employer/internships', methods=['GET'])
 def employer_posted_internships():
     """ endpoint where employers may see the internships they have posted.
 
@@ -34,7 +50,7 @@ def employer_posted_internships():
     Returns: str: The page that is displayed and shows the list of internships that have been posted.
     """
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role'] != 'employer':
         return render_template('access_denied.html'), 403
 
@@ -43,27 +59,13 @@ def employer_posted_internships():
     error_message = None
 
     try:
-        with db.get_cursor() as cursor:
-            cursor.execute("SELECT emp_id, company_name FROM employer WHERE user_id = %s;", (user_id,))
-            employer_data = cursor.fetchone()
-            if not employer_data:
-                flash("Your employer profile is incomplete. Please update your profile before viewing posted internships.", "warning")
-                return redirect(url_for('profile'))
-            
-            emp_id = employer_data['emp_id']
-            company_name = employer_data['company_name']
-
-            query = """
-                SELECT i.internship_id, i.title, i.location, i.duration, i.deadline, i.stipend, i.number_of_opening,
-                       COUNT(a.internship_id) AS application_count
-                FROM internship i
-                LEFT JOIN application a ON i.internship_id = a.internship_id
-                WHERE i.company_id = %s
-                GROUP BY i.internship_id
-                ORDER BY i.deadline DESC;
-            """
-            cursor.execute(query, (emp_id,))
-            posted_internships = cursor.fetchall()
+        company = repositories.employer.company_for_user(user_id)
+        if not company:
+            flash("Your employer profile is incomplete. Please update your profile before viewing posted internships.", "warning")
+            return redirect(url_for('user.profile'))
+
+        company_name = company.company_name
+        posted_internships = repositories.internship.posted_by(company.emp_id)
 
     except Exception as e:
         print(f"Error fetching employer's internships: {e}")
@@ -75,7 +77,7 @@ def employer_posted_internships():
                            error_message=error_message)
 
 
-@app.route('/employer/applications', methods=['GET'])
+@bp.route('/employer/applications', methods=['GET'])
 def employer_manage_applications():
     """ 
     endpoint for managing applications for employers.
@@ -86,7 +88,7 @@ def employer_manage_applications():
     """
 
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role'] != 'employer':
         return render_template('access_denied.html'), 403
 
@@ -97,65 +99,24 @@ def employer_manage_applications():
     search_applicant = request.args.get('applicant_name')
     search_internship_title = request.args.get('internship_title')
     filter_status = request.args.get('status')
+    search_skills = request.args.get('skills')
+    sort_by = request.args.get('sort')
 
     applicants = []
     internship_titles = []
 
     try:
-        with db.get_cursor() as cursor:
-            cursor.execute("SELECT emp_id FROM employer WHERE user_id = %s;", (user_id,))
-            employer_data = cursor.fetchone()
-            if not employer_data:
-                flash("Your employer profile is incomplete. Please update your profile before managing applications.", "warning")
-                return redirect(url_for('profile'))
-            
-            emp_id = employer_data['emp_id']
+        emp_id = get_emp_id(user_id)
+        if emp_id is None:
+            flash("Your employer profile is incomplete. Please update your profile before managing applications.", "warning")
+            return redirect(url_for('user.profile'))
 
-            cursor.execute("""
-                SELECT DISTINCT u.full_name AS applicant
-                FROM application a
-                JOIN student s ON a.student_id = s.student_id
-                JOIN users u ON s.user_id = u.user_id
-                JOIN internship i ON a.internship_id = i.internship_id
-                WHERE i.company_id = %s
-                ORDER BY applicant;
-            """, (emp_id,))
-            applicants = [app['applicant'] for app in cursor.fetchall()]
+        filter_options = get_application_filter_options(emp_id)
+        applicants = filter_options['applicants']
+        internship_titles = filter_options['internship_titles']
 
-            cursor.execute("""
-                SELECT DISTINCT i.title
-                FROM internship i
-                WHERE i.company_id = %s
-                ORDER BY i.title;
-            """, (emp_id,))
-            internship_titles = [title['title'] for title in cursor.fetchall()]
-
-            query = """
-                SELECT a.student_id, a.internship_id, a.status, a.feedback, a.cover_letter,
-                       u.full_name AS student_full_name, u.email AS student_email,
-                       s.university, s.course, s.resume_path,
-                       i.title AS internship_title, i.location AS internship_location
-                FROM application a
-                JOIN student s ON a.student_id = s.student_id
-                JOIN users u ON s.user_id = u.user_id
-                JOIN internship i ON a.internship_id = i.internship_id
-                WHERE i.company_id = %s
-            """
-            params = [emp_id]
-
-            if search_applicant and search_applicant != 'all':
-                query += " AND u.full_name = %s"
-                params.append(search_applicant)
-            if search_internship_title and search_internship_title != 'all':
-                query += " AND i.title = %s"
-                params.append(search_internship_title)
-            if filter_status and filter_status != 'all':
-                query += " AND a.status = %s"
-                params.append(filter_status)
-
-            query += " ORDER BY a.status ASC, u.full_name ASC;"
-            cursor.execute(query, tuple(params))
-            applications = cursor.fetchall()
+        applications = repositories.application.for_employer(emp_id, search_applicant, search_internship_title,
+                                                             filter_status, sort_by, search_skills)
 
     except Exception as e:
         print(f"Error fetching applications for employer: {e}")
@@ -168,10 +129,123 @@ def employer_manage_applications():
                            search_applicant=search_applicant,
                            search_internship_title=search_internship_title,
                            filter_status=filter_status,
+                           sort_by=sort_by,
+                           search_skills=search_skills,
                            error_message=error_message)
 
 
-@app.route('/employer/application/<int:student_id>/<int:internship_id>/update_status', methods=['POST'])
+@cache.cached('emp_id')
+def get_emp_id(user_id):
+    """
+    Looks up the emp_id of a user, caching it since it never changes.
+
+    Args: user_id (int): The logged-in user's ID.
+
+    Returns: int: The emp_id, or None if the user has no employer profile.
+    """
+    return repositories.employer.id_for_user(user_id)
+
+@cache.cached('employer_dashboard', tags=lambda emp_id: [cache.employer_tag(emp_id)], ttl=60)
+def get_employer_dashboard(emp_id):
+    """
+    Gets the company's dashboard statistics (see `rollups.employer_dashboard`), cached until it receives an
+    application or decides one, and for at most a minute so the days roll over.
+
+    Args: emp_id (int): The employer whose statistics are shown.
+
+    Returns: dict: The dashboard.
+    """
+    return rollups.employer_dashboard(emp_id)
+
+@cache.cached('application_filters', tags=lambda emp_id: [cache.employer_tag(emp_id), cache.USERS_TAG])
+def get_application_filter_options(emp_id):
+    """
+    Gets the choices of the applicant and internship filters on the Manage Applications page, cached until the
+    company's internships or applications, or the applicants' names, change.
+
+    Args: emp_id (int): The employer whose applications are listed.
+
+    Returns: dict: 'applicants' (full names) and 'internship_titles', both sorted.
+    """
+    return {'applicants': repositories.application.applicant_names(emp_id),
+            'internship_titles': repositories.internship.titles_for(emp_id)}
+
+# Columns written by the application export, in order.
+EXPORT_COLUMNS = repositories.application.ListedApplication._fields
+
+# Rows fetched from the server at a time while exporting.
+EXPORT_FETCH_SIZE = 1000
+
+# Most applications one bulk status update may change, which bounds the size of its row-value IN lists and how
+# long it holds its row locks. Kept under Flask's MAX_FORM_PARTS (1000 form fields by default).
+MAX_BULK_APPLICATIONS = 500
+
+@bp.route('/employer/applications/export', methods=['GET'])
+def employer_export_applications():
+    """
+    Endpoint that downloads the employer's applications as CSV (default) or JSON Lines (`?format=jsonl`).
+
+    It takes the same filters as the application management page. Rows are streamed from an unbuffered
+    server-side cursor straight into the response, so the download starts immediately and memory use stays
+    the same however many applications there are.
+
+    Returns: Response: The streamed file.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'employer':
+        return render_template('access_denied.html'), 403
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'jsonl'):
+        flash("Please choose CSV or JSONL as the export format.", 'danger')
+        return redirect(url_for('employer.employer_manage_applications'))
+
+    emp_id = get_emp_id(session['user_id'])
+    if emp_id is None:
+        flash("Your employer profile is incomplete. Please update your profile before exporting applications.", "warning")
+        return redirect(url_for('user.profile'))
+
+    rows = repositories.application.stream_for_employer(emp_id,
+                                                        request.args.get('applicant_name'),
+                                                        request.args.get('internship_title'),
+                                                        request.args.get('status'),
+                                                        request.args.get('sort'),
+                                                        request.args.get('skills'),
+                                                        fetch_size=EXPORT_FETCH_SIZE)
+
+    if export_format == 'jsonl':
+        body = (json.dumps(row._asdict(), default=str) + '\n' for row in rows)
+        mimetype = 'application/x-ndjson'
+    else:
+        body = csv_lines(EXPORT_COLUMNS, rows)
+        mimetype = 'text/csv'
+
+    filename = f"applications_{datetime.now().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+def csv_lines(columns, rows):
+    """
+    Yields a CSV file one line at a time: first the header, then one line per row.
+
+    Args: columns (tuple): The column names to write.
+        rows (iterable): Sequences of values, in the order of the columns.
+
+    Yields: str: One line of CSV text.
+    """
+    line = io.StringIO()
+    writer = csv.writer(line)
+    writer.writerow(columns)
+    yield line.getvalue()
+    for row in rows:
+        line.seek(0)
+        line.truncate()
+        writer.writerow(row)
+        yield line.getvalue()
+
+
+@bp.route('/employer/application/<int:student_id>/<int:internship_id>/update_status', methods=['POST'])
 def employer_update_application_status(student_id, internship_id):
 
     """ 
@@ -184,43 +258,205 @@ def employer_update_application_status(student_id, internship_id):
     """
 
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role'] != 'employer':
         return render_template('access_denied.html'), 403
 
     new_status = request.form.get('status')
     feedback = request.form.get('feedback')
 
+    if new_status not in application_counts.STATUS_COUNT_COLUMNS:
+        flash("Please choose a valid application status.", 'danger')
+        return redirect(url_for('employer.employer_manage_applications'))
+
     user_id = session['user_id']
     try:
-        with db.get_cursor() as cursor:
+        with db.transaction() as cursor:
             cursor.execute("SELECT emp_id FROM employer WHERE user_id = %s;", (user_id,))
             employer_data = cursor.fetchone()
             if not employer_data:
                 flash("Employer profile not found.", 'danger')
-                return redirect(url_for('employer_manage_applications'))
+                return redirect(url_for('employer.employer_manage_applications'))
             emp_id = employer_data['emp_id']
 
+            # Locking the row so a concurrent update can't change the status between reading and updating it.
             cursor.execute("""
-                SELECT i.company_id FROM application a
+                SELECT i.company_id, a.status FROM application a
                 JOIN internship i ON a.internship_id = i.internship_id
-                WHERE a.student_id = %s AND a.internship_id = %s;
+                WHERE a.student_id = %s AND a.internship_id = %s
+                FOR UPDATE;
             """, (student_id, internship_id))
             application_info = cursor.fetchone()
 
             if not application_info or application_info['company_id'] != emp_id:
                 flash("You are not authorized to manage this application.", 'danger')
-                return redirect(url_for('employer_manage_applications'))
-
-            cursor.execute("""
-                UPDATE application
-                SET status = %s, feedback = %s
-                WHERE student_id = %s AND internship_id = %s;
-            """, (new_status, feedback, student_id, internship_id))
-            flash("Application status updated successfully!", 'success')
+                return redirect(url_for('employer.employer_manage_applications'))
+
+            # decided_at keeps the time of the first decision, and is cleared if the application goes back to Pending.
+            with rollups.tracking(cursor, [(student_id, internship_id)]):
+                cursor.execute("""
+                    UPDATE application
+                    SET status = %s, feedback = %s, decided_at = IF(%s = 'Pending', NULL, COALESCE(decided_at, NOW()))
+                    WHERE student_id = %s AND internship_id = %s;
+                """, (new_status, feedback, new_status, student_id, internship_id))
+            application_counts.record_status_change(cursor, internship_id, application_info['status'], new_status)
+            notifications.record_status_changes(
+                cursor, [(student_id, internship_id, application_info['status'], new_status, feedback)])
+
+        notifications.schedule_dispatch()
+        publish_status_changes(emp_id, [(student_id, internship_id)], new_status, feedback)
+        flash("Application status updated successfully!", 'success')
 
     except Exception as e:
         print(f"Error updating application status: {e}")
         flash("An error occurred while updating application status. Please try again.", 'danger')
 
-    return redirect(url_for('employer_manage_applications'))
\ No newline at end of file
+    return redirect(url_for('employer.employer_manage_applications'))
+
+@bp.route('/employer/applications/bulk_update_status', methods=['POST'])
+def employer_bulk_update_application_status():
+    """
+    Endpoint allowing employers to set the status (and optionally the feedback) of many applications at once.
+
+    The form sends one `applications` value per selected application, formatted as "student_id:internship_id"
+    (at most `MAX_BULK_APPLICATIONS`; larger selections are refused without changing anything).
+    Ownership of all of them is checked with one query, and they are all updated with one UPDATE in a single
+    transaction. Applications that don't belong to the employer's company are skipped.
+
+    Redirects: str: The application management page is accessed.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'employer':
+        return render_template('access_denied.html'), 403
+
+    new_status = request.form.get('status')
+    feedback = request.form.get('feedback') or None
+
+    if new_status not in application_counts.STATUS_COUNT_COLUMNS:
+        flash("Please choose a valid application status.", 'danger')
+        return redirect(url_for('employer.employer_manage_applications'))
+
+    selected = request.form.getlist('applications')
+    if len(selected) > MAX_BULK_APPLICATIONS:
+        flash(f"Please select at most {MAX_BULK_APPLICATIONS} applications at a time.", 'warning')
+        return redirect(url_for('employer.employer_manage_applications'))
+
+    application_keys = parse_application_keys(selected)
+    if not application_keys:
+        flash("Please select at least one application.", 'warning')
+        return redirect(url_for('employer.employer_manage_applications'))
+
+    user_id = session['user_id']
+    try:
+        with db.transaction() as cursor:
+            cursor.execute("SELECT emp_id FROM employer WHERE user_id = %s;", (user_id,))
+            employer_data = cursor.fetchone()
+            if not employer_data:
+                flash("Employer profile not found.", 'danger')
+                return redirect(url_for('employer.employer_manage_applications'))
+            emp_id = employer_data['emp_id']
+
+            keys_sql = ", ".join(["(%s, %s)"] * len(application_keys))
+            key_params = [value for key in application_keys for value in key]
+
+            cursor.execute(f"""
+                SELECT a.student_id, a.internship_id, a.status, a.feedback
+                FROM application a
+                JOIN internship i ON a.internship_id = i.internship_id
+                WHERE i.company_id = %s AND (a.student_id, a.internship_id) IN ({keys_sql})
+                FOR UPDATE;
+            """, (emp_id, *key_params))
+            owned_applications = cursor.fetchall()
+
+            if owned_applications:
+                owned_sql = ", ".join(["(%s, %s)"] * len(owned_applications))
+                owned_params = [value for row in owned_applications for value in (row['student_id'], row['internship_id'])]
+                # Blank feedback keeps whatever feedback each application already has.
+                with rollups.tracking(cursor, [(row['student_id'], row['internship_id']) for row in owned_applications]):
+                    cursor.execute(f"""
+                        UPDATE application
+                        SET status = %s, feedback = COALESCE(%s, feedback),
+                            decided_at = IF(%s = 'Pending', NULL, COALESCE(decided_at, NOW()))
+                        WHERE (student_id, internship_id) IN ({owned_sql});
+                    """, (new_status, feedback, new_status, *owned_params))
+                application_counts.record_status_changes(
+                    cursor, [(row['internship_id'], row['status'], new_status) for row in owned_applications])
+                # The events carry the feedback each application ended up with: the one it already had when the
+                # feedback was left blank (the rows are locked, so it can't have changed since they were read).
+                notifications.record_status_changes(
+                    cursor, [(row['student_id'], row['internship_id'], row['status'], new_status,
+                              row['feedback'] if feedback is None else feedback)
+                             for row in owned_applications])
+
+        if owned_applications:
+            notifications.schedule_dispatch()
+            publish_status_changes(emp_id, [(row['student_id'], row['internship_id']) for row in owned_applications],
+                                   new_status, feedback)
+        skipped = len(application_keys) - len(owned_applications)
+        flash(f"{len(owned_applications)} application(s) updated to '{new_status}'.", 'success')
+        if skipped:
+            flash(f"{skipped} selected application(s) were skipped because they don't belong to your company.", 'warning')
+
+    except Exception as e:
+        print(f"Error bulk updating application status: {e}")
+        flash("An error occurred while updating the applications. No changes were saved. Please try again.", 'danger')
+
+    return redirect(url_for('employer.employer_manage_applications'))
+
+
+def publish_status_changes(emp_id, application_keys, new_status, feedback):
+    """
+    Pushes committed status changes to the live update streams of the students and the employer, and drops the
+    cache entries built from the students' and the employer's applications.
+
+    Args: emp_id (int): The employer who made the change.
+        application_keys (list): (student_id, internship_id) tuples of the changed applications.
+        new_status (str): The new status.
+        feedback (str): The new feedback, or None if it was left unchanged.
+    """
+    cache.invalidate_tags(cache.employer_tag(emp_id),
+                          *{cache.student_tag(student_id) for student_id, _ in application_keys})
+
+    for student_id, internship_id in application_keys:
+        event = {'student_id': student_id, 'internship_id': internship_id, 'status': new_status, 'feedback': feedback}
+        live_updates.publish(live_updates.student_channel(student_id), 'status_changed',
+                             dict(event, message=f"One of your applications is now '{new_status}'."))
+        live_updates.publish(live_updates.employer_channel(emp_id), 'status_changed',
+                             dict(event, message=f"An application was changed to '{new_status}'."))
+
+
+@bp.route('/employer/live', methods=['GET'])
+def employer_live_updates():
+    """
+    Server-Sent Events endpoint pushing new applications and status changes for the employer's internships.
+
+    Returns: Response: The event stream.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'employer':
+        return render_template('access_denied.html'), 403
+
+    emp_id = get_emp_id(session['user_id'])
+    if emp_id is None:
+        return render_template('access_denied.html'), 403
+
+    return live_updates.stream(live_updates.employer_channel(emp_id),
+                               request.headers.get('Last-Event-ID'))
+
+
+def parse_application_keys(values):
+    """
+    Turns "student_id:internship_id" form values into a list of unique (student_id, internship_id) tuples.
+
+    Args: values (list): The raw form values. Malformed values are ignored.
+
+    Returns: list: The parsed application keys, in their original order.
+    """
+    application_keys = {}
+    for value in values:
+        student_id, _, internship_id = value.partition(':')
+        if student_id.isdigit() and internship_id.isdigit():
+            application_keys[(int(student_id), int(internship_id))] = None
+    return list(application_keys)
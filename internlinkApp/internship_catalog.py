@@ -0,0 +1,223 @@
+"""Keeps the open internships in memory, so browsing them and viewing their
+details need no queries.
+
+The catalogue is a columnar snapshot: one list per column, with the open
+internships sorted by deadline. For location, duration, stipend and each
+browse category there is a bitmap (a Python int, bit n = internship n) of the
+internships with that value, so any combination of filters is answered by
+ANDing a few integers, and walking the set bits yields the results already in
+deadline order.
+
+Snapshots are never modified; a refresh builds a new one and swaps it in, so
+requests never wait for each other. Refreshing works like this:
+- Every `SYNC_INTERVAL` seconds, only the internships (or companies) whose
+  `updated_at` is at or after the latest one already seen are fetched and
+  merged in. Tracking the latest `updated_at` read, rather than the time of
+  the last sync, means a lagging replica or a clock difference with the
+  database server can't make the catalogue skip a change. If nothing changed
+  and no deadline passed, the current snapshot is kept.
+- Every `FULL_RELOAD_INTERVAL` seconds everything is reloaded, which also
+  drops internships deleted from the database.
+- Calling `invalidate()` makes the next request sync straight away (use it
+  after changing internships or company details in this process).
+Internships whose deadline has passed are left out from midnight on, as the
+deadline-sorted order makes them a prefix of the snapshot.
+
+Each snapshot also keeps the full row of every internship by ID (with the
+company details and row versions shown on its details page), see `get()`.
+"""
+import bisect
+import threading
+import time
+from datetime import date, timedelta
+
+from internlinkApp import db
+
+# Seconds between incremental syncs with the database.
+SYNC_INTERVAL = 30
+
+# Seconds between full reloads.
+FULL_RELOAD_INTERVAL = 600
+
+# Seconds before the latest `updated_at` seen that incremental syncs fetch again, for rows committed after ones
+# with a later `updated_at` (the timestamp is set when a row is written, not when the transaction commits).
+SYNC_OVERLAP = 5
+
+# Categories shown on the browse page. An internship belongs to a category when its title, skills or
+# description mention it.
+CATEGORIES = ["Software", "Marketing", "Research", "Design", "Data", "Engineering", "Other"]
+
+# Columns kept for each internship, as shown on the browse page.
+COLUMNS = ('internship_id', 'title', 'description', 'location', 'duration', 'skills_required', 'deadline',
+           'stipend', 'number_of_opening', 'company_name', 'logo_path')
+
+# Columns with a value -> bitmap index.
+BITMAP_COLUMNS = ('location', 'duration', 'stipend')
+
+class Snapshot:
+    """An immutable, deadline-sorted view of the open internships."""
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row['deadline'], row['internship_id']))
+        self.columns = {column: [row[column] for row in rows] for column in COLUMNS}
+        self.details = {row['internship_id']: row for row in rows}
+        self.bitmaps = {column: {} for column in BITMAP_COLUMNS}
+        self.category_bitmaps = dict.fromkeys(CATEGORIES, 0)
+
+        for position, row in enumerate(rows):
+            bit = 1 << position
+            for column in BITMAP_COLUMNS:
+                self.bitmaps[column][row[column]] = self.bitmaps[column].get(row[column], 0) | bit
+            text = ' '.join(filter(None, (row['title'], row['skills_required'], row['description']))).lower()
+            for category in CATEGORIES:
+                if category.lower() in text:
+                    self.category_bitmaps[category] |= bit
+
+    def open_bitmap(self, today):
+        """Bitmap of the internships whose deadline is `today` or later."""
+        first_open = bisect.bisect_left(self.columns['deadline'], today)
+        return ((1 << len(self.columns['deadline'])) - 1) >> first_open << first_open
+
+    def category_bitmap(self, category):
+        """Bitmap of the internships mentioning `category` (computed on the fly
+        for values that aren't one of `CATEGORIES`)."""
+        if category in self.category_bitmaps:
+            return self.category_bitmaps[category]
+        needle = category.lower()
+        bitmap = 0
+        for position, texts in enumerate(zip(self.columns['title'], self.columns['skills_required'],
+                                             self.columns['description'])):
+            if needle in ' '.join(filter(None, texts)).lower():
+                bitmap |= 1 << position
+        return bitmap
+
+    def rows(self, bitmap):
+        """The internships in `bitmap` as dictionaries, in deadline order."""
+        rows = []
+        while bitmap:
+            lowest = bitmap & -bitmap
+            position = lowest.bit_length() - 1
+            rows.append({column: values[position] for column, values in self.columns.items()})
+            bitmap ^= lowest
+        return rows
+
+    def values(self, column, bitmap):
+        """The distinct values of `column` among the internships in `bitmap`, sorted."""
+        return sorted((value for value, value_bitmap in self.bitmaps[column].items() if value_bitmap & bitmap),
+                      key=lambda value: (value is not None, value))
+
+_snapshot = None
+_rows = {}
+_last_sync = 0
+_last_full_reload = 0
+# The latest `updated_at` (of an internship or its company) read so far.
+_high_water = None
+_invalidated = False
+_refresh_lock = threading.Lock()
+
+def invalidate():
+    """Makes the next call to `search()` sync with the database first."""
+    global _invalidated
+    _invalidated = True
+
+def refresh(force_full=False):
+    """Syncs the catalogue with the database if it is due (see the module docs)."""
+    global _snapshot, _last_sync, _last_full_reload, _invalidated, _high_water
+    now = time.time()
+    if _snapshot is not None and not force_full and not _invalidated and now - _last_sync < SYNC_INTERVAL:
+        return
+    # Only one request refreshes; the others keep using the current snapshot meanwhile.
+    if not _refresh_lock.acquire(blocking=_snapshot is None):
+        return
+    try:
+        _invalidated = False
+        full_reload = (force_full or _snapshot is None or _high_water is None
+                       or now - _last_full_reload >= FULL_RELOAD_INTERVAL)
+        query = """
+            SELECT i.internship_id, i.title, i.description, i.location, i.duration,
+                   i.skills_required, i.deadline, i.stipend, i.number_of_opening,
+                   i.company_id, i.additional_req, i.updated_at,
+                   e.company_name, e.logo_path, e.company_description, e.website,
+                   e.updated_at AS company_updated_at
+            FROM internship i
+            JOIN employer e ON i.company_id = e.emp_id
+        """
+        if full_reload:
+            query += " WHERE i.deadline >= CURRENT_DATE()"
+            params = ()
+        else:
+            # Closed internships are fetched too, so one whose deadline was moved into the past is dropped.
+            query += " WHERE i.updated_at >= %s OR e.updated_at >= %s"
+            since = _high_water - timedelta(seconds=SYNC_OVERLAP)
+            params = (since, since)
+
+        with db.get_cursor(read_only=True) as cursor:
+            cursor.execute(query + ";", params)
+            fetched = cursor.fetchall()
+
+        if full_reload:
+            _rows.clear()
+            _last_full_reload = now
+        today = date.today()
+        changed = False
+        for row in fetched:
+            _high_water = max(_high_water or row['updated_at'], row['updated_at'], row['company_updated_at'])
+            if row['deadline'] < today:
+                changed |= _rows.pop(row['internship_id'], None) is not None
+            # Rows fetched again because of the overlap are usually unchanged.
+            elif _rows.get(row['internship_id']) != row:
+                _rows[row['internship_id']] = row
+                changed = True
+        expired = [internship_id for internship_id, row in _rows.items() if row['deadline'] < today]
+        for internship_id in expired:
+            del _rows[internship_id]
+
+        if full_reload or changed or expired:
+            _snapshot = Snapshot(_rows.values())
+        _last_sync = now
+    finally:
+        _refresh_lock.release()
+
+def get(internship_id):
+    """Gets an open internship with its company details, as shown on its details page.
+
+    Returns:
+        dict: The internship row (including `updated_at` and
+        `company_updated_at`), or None if it isn't open or isn't in the
+        catalogue yet (look it up in the database then).
+    """
+    refresh()
+    internship = _snapshot.details.get(internship_id)
+    if internship is None or internship['deadline'] < date.today():
+        return None
+    return internship
+
+def search(category=None, location=None, duration=None, stipend=None):
+    """Finds the open internships matching every given filter.
+
+    Args:
+        category (str): A word the title, skills or description must mention.
+        location (str): Exact location.
+        duration (str): Exact duration.
+        stipend (str): Exact stipend.
+        Filters that are empty or 'all' are ignored.
+
+    Returns:
+        dict: 'internships' (matching rows, earliest deadline first) and the
+        filter options of all open internships: 'locations', 'durations' and
+        'stipends'.
+    """
+    refresh()
+    snapshot = _snapshot
+    open_internships = snapshot.open_bitmap(date.today())
+
+    matches = open_internships
+    if category and category != 'all':
+        matches &= snapshot.category_bitmap(category)
+    for column, value in (('location', location), ('duration', duration), ('stipend', stipend)):
+        if value and value != 'all':
+            matches &= snapshot.bitmaps[column].get(value, 0)
+
+    return {'internships': snapshot.rows(matches),
+            'locations': snapshot.values('location', open_internships),
+            'durations': snapshot.values('duration', open_internships),
+            'stipends': snapshot.values('stipend', open_internships)}
@@ -0,0 +1,365 @@
+"""Implements a small background job queue for InternLink.
+
+Route handlers use it for slow side effects that the user doesn't need to wait
+for (deleting replaced upload files, sending notifications, ...). Jobs are
+written to a SQLite journal before they run, so queued jobs survive a restart,
+and they are run by a thread pool inside the web worker process.
+
+Usage:
+------
+Register a handler once, at import time:
+```
+>>> @jobs.job('delete_upload', max_attempts=3, concurrency=2)
+>>> def delete_upload(path):
+>>>     ...
+```
+
+Then, while handling a request, queue work for it:
+```
+>>> jobs.enqueue('delete_upload', path='uploads/old.pdf')
+```
+
+A failing job is retried with an exponential backoff until it has been tried
+`max_attempts` times. `concurrency` caps how many jobs of that kind run at once
+in each process. Handlers run inside an application context, so they can use
+`db` and `current_app`. Long-running handlers can call `report_progress()`,
+and `job_status()` reads it back (e.g. for a page showing how far a job got).
+
+Several processes can share the journal. A process claiming a job takes a lease
+on it for `LEASE_SECONDS` and renews it while the job runs. Only jobs whose
+lease has expired (their process was stopped) are queued again, so a job is
+never run by two live processes at once.
+
+The worker threads start with the first request a process serves (set
+`JOB_WORKERS` to `0` to only queue jobs in that process). A dedicated worker
+can also be run with:
+
+    flask --app run run-jobs
+"""
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+# Registered job handlers: name -> {'handler', 'max_attempts', 'concurrency'}
+JOB_HANDLERS = {}
+
+# Seconds to wait before retry number n is `RETRY_BACKOFF_SECONDS * 2 ** (n - 1)`.
+RETRY_BACKOFF_SECONDS = 5
+
+# Finished jobs are kept this long (seconds) for the admin statistics.
+FINISHED_JOB_RETENTION = 24 * 60 * 60
+
+# How often (seconds) the dispatcher looks for due jobs when nothing wakes it.
+POLL_INTERVAL = 1.0
+
+# How long (seconds) a claimed job stays reserved for its process without a
+# renewal. Leases are renewed every third of that.
+LEASE_SECONDS = 60
+
+# How often (seconds) the dispatcher removes finished jobs past their retention.
+PURGE_INTERVAL = 10 * 60
+
+# Set by `init_jobs()`.
+journal_path = None
+worker_count = 0
+
+_app = None
+_executor = None
+_wakeup = threading.Event()
+_running = {}
+_running_lock = threading.Lock()
+_started = False
+_start_lock = threading.Lock()
+# Identifies this process's leases in the journal (set when the workers start, after any fork).
+_owner = None
+# The ID of the job the current worker thread is running (see `report_progress()`).
+_current = threading.local()
+
+def job(name, max_attempts=3, concurrency=None):
+    """Registers the decorated function as the handler for jobs called `name`.
+
+    Args:
+        name (str): The job name passed to `enqueue()`.
+        max_attempts (int): How many times a failing job is tried in total.
+        concurrency (int): Maximum number of these jobs running at once per
+            process (default: no limit other than the pool size).
+    """
+    def register(handler):
+        JOB_HANDLERS[name] = {'handler': handler, 'max_attempts': max_attempts, 'concurrency': concurrency}
+        return handler
+    return register
+
+def init_jobs(app: Flask):
+    """Sets up the job queue for the specified Flask app.
+
+    Args:
+        app: The `Flask` application. `JOB_JOURNAL_PATH` and `JOB_WORKERS` are
+            read from its configuration.
+    """
+    global journal_path, worker_count, _app
+    _app = app
+    journal_path = app.config.get('JOB_JOURNAL_PATH') or os.path.join(app.instance_path, 'jobs.sqlite3')
+    worker_count = app.config.get('JOB_WORKERS', 2)
+
+    os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+    with _journal() as journal:
+        journal.execute('PRAGMA journal_mode=WAL')
+        journal.execute('''
+            CREATE TABLE IF NOT EXISTS job (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_after REAL NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                last_error TEXT,
+                owner TEXT,
+                lease_until REAL,
+                progress TEXT
+            )''')
+        # Journals created before leases and progress were added.
+        columns = {row['name'] for row in journal.execute('PRAGMA table_info(job)')}
+        for column, column_type in (('owner', 'TEXT'), ('lease_until', 'REAL'), ('progress', 'TEXT')):
+            if column not in columns:
+                journal.execute(f'ALTER TABLE job ADD COLUMN {column} {column_type}')
+        journal.execute('CREATE INDEX IF NOT EXISTS job_due ON job (status, run_after)')
+
+    if worker_count > 0:
+        app.before_request(_start_workers)
+
+def _journal():
+    """Opens a connection to the SQLite journal (one per call, so it is safe to
+    use from any thread), closed when the `with` block ends."""
+    connection = sqlite3.connect(journal_path, timeout=10, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    # sqlite3's own context manager only commits.
+    return contextlib.closing(connection)
+
+def enqueue(name, delay=0, **payload):
+    """Queues a job to run in the background.
+
+    Args:
+        name (str): The name of a registered job handler.
+        delay (float): Seconds to wait before the job may run (default `0`).
+        **payload: JSON-serialisable keyword arguments for the handler.
+
+    Returns:
+        int: The ID of the queued job.
+    """
+    if name not in JOB_HANDLERS:
+        raise ValueError(f"No job handler registered for '{name}'.")
+    now = time.time()
+    with _journal() as journal:
+        job_id = journal.execute('INSERT INTO job (name, payload, run_after, created_at) VALUES (?, ?, ?, ?)',
+                                 (name, json.dumps(payload), now + delay, now)).lastrowid
+    _wakeup.set()
+    return job_id
+
+def _start_workers():
+    """Starts the dispatcher thread and worker pool the first time it is called
+    in this process."""
+    global _started, _executor, _owner
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _owner = f"{socket.gethostname()}:{os.getpid()}:{time.time():.6f}"
+        _executor = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix='internlink-job')
+        threading.Thread(target=_dispatch_forever, name='internlink-job-dispatcher', daemon=True).start()
+        _started = True
+
+def _dispatch_forever():
+    last_renewal = last_purge = 0
+    while True:
+        _wakeup.wait(POLL_INTERVAL)
+        _wakeup.clear()
+        try:
+            now = time.time()
+            if now - last_renewal >= LEASE_SECONDS / 3:
+                _renew_leases()
+                last_renewal = now
+            if now - last_purge >= PURGE_INTERVAL:
+                _purge_finished_jobs()
+                last_purge = now
+            _dispatch_due_jobs()
+        except Exception as e:
+            print(f"Error dispatching background jobs: {e}")
+
+def _renew_leases():
+    """Extends the leases of the jobs this process is running, and queues
+    again the jobs whose process stopped without finishing them (their lease
+    expired)."""
+    now = time.time()
+    with _journal() as journal:
+        journal.execute("UPDATE job SET lease_until = ? WHERE status = 'running' AND owner = ?",
+                        (now + LEASE_SECONDS, _owner))
+        journal.execute("""
+            UPDATE job SET status = 'queued', owner = NULL, lease_until = NULL
+            WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)""", (now,))
+
+def _purge_finished_jobs():
+    """Removes finished jobs older than `FINISHED_JOB_RETENTION`."""
+    with _journal() as journal:
+        journal.execute("DELETE FROM job WHERE status IN ('done', 'failed') AND finished_at < ?",
+                        (time.time() - FINISHED_JOB_RETENTION,))
+
+def _dispatch_due_jobs():
+    """Claims due jobs (within the pool size and per-job concurrency limits) and
+    submits them to the worker pool."""
+    with _running_lock:
+        free_slots = worker_count - sum(_running.values())
+    if free_slots <= 0:
+        return
+
+    with _journal() as journal:
+        due_jobs = journal.execute("""
+            SELECT job_id, name, payload, attempts FROM job
+            WHERE status = 'queued' AND run_after <= ?
+            ORDER BY run_after LIMIT ?""", (time.time(), free_slots * 4)).fetchall()
+
+        for due_job in due_jobs:
+            settings = JOB_HANDLERS.get(due_job['name'])
+            if settings is None:
+                # Jobs of a kind this process doesn't know about are left for a process that does.
+                continue
+            with _running_lock:
+                if sum(_running.values()) >= worker_count:
+                    break
+                if settings['concurrency'] and _running.get(due_job['name'], 0) >= settings['concurrency']:
+                    continue
+                # Another process sharing the journal may claim the same job first.
+                now = time.time()
+                claimed = journal.execute("""
+                    UPDATE job SET status = 'running', started_at = ?, attempts = attempts + 1,
+                                   owner = ?, lease_until = ?
+                    WHERE job_id = ? AND status = 'queued'""",
+                    (now, _owner, now + LEASE_SECONDS, due_job['job_id'])).rowcount
+                if not claimed:
+                    continue
+                _running[due_job['name']] = _running.get(due_job['name'], 0) + 1
+            _executor.submit(_run_job, due_job['job_id'], due_job['name'], json.loads(due_job['payload']),
+                             due_job['attempts'] + 1)
+
+def _run_job(job_id, name, payload, attempt):
+    settings = JOB_HANDLERS[name]
+    # The result is only recorded while this process still holds the lease (it may have lost it while stalled).
+    _current.job_id = job_id
+    try:
+        with _app.app_context():
+            settings['handler'](**payload)
+        with _journal() as journal:
+            journal.execute("""
+                UPDATE job SET status = 'done', finished_at = ?, last_error = NULL, owner = NULL, lease_until = NULL
+                WHERE job_id = ? AND owner = ?""", (time.time(), job_id, _owner))
+    except Exception as e:
+        print(f"Error running background job {name} #{job_id} (attempt {attempt}): {e}")
+        with _journal() as journal:
+            if attempt < settings['max_attempts']:
+                journal.execute("""
+                    UPDATE job SET status = 'queued', run_after = ?, last_error = ?, owner = NULL, lease_until = NULL
+                    WHERE job_id = ? AND owner = ?""",
+                    (time.time() + RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1), repr(e), job_id, _owner))
+            else:
+                journal.execute("""
+                    UPDATE job SET status = 'failed', finished_at = ?, last_error = ?, owner = NULL, lease_until = NULL
+                    WHERE job_id = ? AND owner = ?""", (time.time(), repr(e), job_id, _owner))
+    finally:
+        _current.job_id = None
+        with _running_lock:
+            _running[name] -= 1
+        _wakeup.set()
+
+def report_progress(**progress):
+    """Records how far the job running in this thread has got, replacing what
+    it reported before. Does nothing outside a job handler.
+
+    Args:
+        **progress: JSON-serialisable values, returned by `job_status()`.
+    """
+    job_id = getattr(_current, 'job_id', None)
+    if job_id is None:
+        return
+    with _journal() as journal:
+        journal.execute('UPDATE job SET progress = ? WHERE job_id = ? AND owner = ?',
+                        (json.dumps(progress), job_id, _owner))
+
+def job_status(job_id):
+    """Gets the state of a job.
+
+    Returns:
+        dict: 'job_id', 'name', 'status' ('queued', 'running', 'done' or
+        'failed'), 'attempts', 'last_error', 'created_at', 'finished_at' and
+        'progress' (what the job last passed to `report_progress()`, or an
+        empty dict), or None if there is no such job (finished jobs are kept
+        for `FINISHED_JOB_RETENTION` seconds).
+    """
+    with _journal() as journal:
+        row = journal.execute("""
+            SELECT job_id, name, status, attempts, last_error, created_at, finished_at, progress
+            FROM job WHERE job_id = ?""", (job_id,)).fetchone()
+    if row is None:
+        return None
+    status = dict(row)
+    status['progress'] = json.loads(status['progress']) if status['progress'] else {}
+    return status
+
+def queue_stats():
+    """Summarises the journal for the admin job queue page.
+
+    Returns:
+        dict: 'jobs' (one row per job name with counts by status, average
+        queue latency and run time in seconds, and the oldest queued job's age)
+        and 'recent_failures' (the last failed jobs).
+    """
+    now = time.time()
+    with _journal() as journal:
+        jobs = journal.execute("""
+            SELECT name,
+                   SUM(status = 'queued') AS queued,
+                   SUM(status = 'running') AS running,
+                   SUM(status = 'done') AS done,
+                   SUM(status = 'failed') AS failed,
+                   AVG(CASE WHEN started_at IS NOT NULL THEN started_at - created_at END) AS avg_latency,
+                   AVG(CASE WHEN status = 'done' THEN finished_at - started_at END) AS avg_run_time,
+                   MAX(CASE WHEN status = 'queued' THEN ? - created_at END) AS oldest_queued_age
+            FROM job GROUP BY name ORDER BY name""", (now,)).fetchall()
+        recent_failures = journal.execute("""
+            SELECT job_id, name, attempts, last_error, finished_at FROM job
+            WHERE status = 'failed' ORDER BY finished_at DESC LIMIT 20""").fetchall()
+    return {'jobs': [dict(row) for row in jobs], 'recent_failures': [dict(row) for row in recent_failures]}
+
+@click.command('run-jobs')
+@with_appcontext
+def run_jobs_command():
+    """Runs background jobs in the foreground until interrupted."""
+    if worker_count <= 0:
+        raise click.ClickException("Set INTERNLINK_JOB_WORKERS to a value above 0.")
+    _start_workers()
+    click.echo(f"Running background jobs with {worker_count} worker(s). Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+
+# Job handlers shared by several modules.
+
+@job('delete_upload', max_attempts=3, concurrency=2)
+def delete_upload(path):
+    """Deletes a replaced or removed upload (e.g. 'uploads/old_resume.pdf') from static/."""
+    full_path = os.path.join(current_app.root_path, 'static', path)
+    if os.path.exists(full_path):
+        os.remove(full_path)
@@ -0,0 +1,173 @@
+"""Finds database connections, cursors and files left open by a request.
+
+`db.get_cursor()` asks callers to close every cursor, and long-running worker
+processes depend on connections going back to the pool and files being closed,
+but nothing checks it. With `LEAK_DETECTION` on (for development and soak
+tests; it costs a stack capture per cursor), this module records every
+connection and cursor `db` hands out and every file opened while serving a
+request, with the stack that created it. Once the response has been sent, it
+reports anything the request left open:
+- a cursor that was never closed,
+- a connection that was neither closed nor returned to the pool,
+- a file (on Linux, where open files are listed in /proc/self/fd) that is
+  still open.
+
+Each leak is printed with its creation stack and kept in `leaks` (the most
+recent `MAX_REPORTS`). `process_stats()` gives the gauges a soak test watches
+for growth: open connections, open file descriptors and resident memory (see
+benchmarks/soak_test.py).
+"""
+import collections
+import os
+import resource
+import sys
+import threading
+import traceback
+import weakref
+
+from flask import Flask, request
+
+# Leaks kept for `leaks`.
+MAX_REPORTS = 100
+
+# Stack frames kept per tracked object.
+STACK_DEPTH = 12
+
+enabled = False
+
+# The most recent leaks: dicts with 'kind', 'description', 'endpoint' and 'stack'.
+leaks = collections.deque(maxlen=MAX_REPORTS)
+
+# Every connection created while detection is on, and the ones not yet released by `db`.
+_connections = weakref.WeakSet()
+_unreleased = weakref.WeakSet()
+
+# What the request being served by the current thread opened.
+_local = threading.local()
+_audit_hook_added = False
+
+def init_leak_detector(app: Flask):
+    """Sets up leak detection for the specified Flask app, if its
+    `LEAK_DETECTION` setting is on."""
+    global enabled, _audit_hook_added
+    enabled = app.config.get('LEAK_DETECTION', False)
+    if not enabled:
+        return
+    if not _audit_hook_added:
+        # Audit hooks can't be removed, so the hook checks `enabled` itself.
+        sys.addaudithook(_audit)
+        _audit_hook_added = True
+    app.before_request(_start_request)
+    app.after_request(_check_after_response)
+
+def _stack():
+    # Starting at the caller of the tracking function. Source lines are only read if the stack is printed, as reading
+    # them opens files too.
+    stack = traceback.StackSummary.extract(traceback.walk_stack(sys._getframe(2)), limit=STACK_DEPTH,
+                                           lookup_lines=False)
+    stack.reverse()
+    return stack
+
+def _tracked():
+    return getattr(_local, 'tracked', None)
+
+def _start_request():
+    _local.tracked = []
+
+def track_connection(connection):
+    """Records a connection `db` handed out (new or from the pool)."""
+    if not enabled:
+        return
+    _connections.add(connection)
+    _unreleased.add(connection)
+    tracked = _tracked()
+    if tracked is not None:
+        tracked.append(('connection', weakref.ref(connection), repr(connection), _stack()))
+
+def release_connection(connection):
+    """Records that `db` closed a connection or returned it to the pool."""
+    if enabled:
+        _unreleased.discard(connection)
+
+def track_cursor(cursor):
+    """Records a cursor `db` handed out."""
+    tracked = _tracked() if enabled else None
+    if tracked is not None:
+        tracked.append(('cursor', weakref.ref(cursor), repr(cursor), _stack()))
+
+def _audit(event, args):
+    if event != 'open' or not enabled:
+        return
+    tracked = _tracked()
+    path = args[0]
+    if tracked is not None and isinstance(path, (str, bytes)):
+        tracked.append(('file', None, os.path.realpath(os.fsdecode(path)), _stack()))
+
+def _check_after_response(response):
+    tracked = _tracked()
+    if tracked is not None:
+        _local.tracked = None
+        endpoint = request.endpoint
+        # The body (e.g. a file being sent) is only finished with once the response is closed.
+        response.call_on_close(lambda: _check(tracked, endpoint))
+    return response
+
+def _open_files():
+    """Paths of the files this process has open, or None where they can't be listed."""
+    try:
+        fd_names = os.listdir('/proc/self/fd')
+    except OSError:
+        return None
+    paths = collections.Counter()
+    for fd_name in fd_names:
+        try:
+            paths[os.readlink(f'/proc/self/fd/{fd_name}')] += 1
+        except OSError:
+            pass
+    return paths
+
+def _is_open(kind, obj):
+    if kind == 'cursor':
+        # Closing a MySQLdb cursor drops its connection.
+        return getattr(obj, 'connection', None) is not None
+    return obj in _unreleased and getattr(obj, 'open', True)
+
+def _check(tracked, endpoint):
+    """Reports what a finished request left open."""
+    open_files = _open_files() if any(kind == 'file' for kind, *_ in tracked) else None
+    for kind, ref, description, stack in tracked:
+        if kind == 'file':
+            # Another thread may have the same file open, so this can over-report under concurrency.
+            if open_files is None or not open_files.get(description):
+                continue
+            open_files[description] -= 1
+        else:
+            obj = ref()
+            if obj is None or not _is_open(kind, obj):
+                continue
+        stack = ''.join(stack.format())
+        leaks.append({'kind': kind, 'description': description, 'endpoint': endpoint, 'stack': stack})
+        print(f"Leak detected: {kind} {description} left open by {endpoint}, created at:\n{stack}")
+
+def process_stats():
+    """Gauges a soak test expects to stay flat.
+
+    Returns:
+        dict: 'connections' (open MySQL connections, including pooled ones,
+        created since detection was turned on), 'file_descriptors' (None where
+        they can't be counted), 'rss_mb' (resident memory) and 'leaks' (number
+        reported so far, at most `MAX_REPORTS`).
+    """
+    try:
+        file_descriptors = len(os.listdir('/proc/self/fd'))
+    except OSError:
+        file_descriptors = None
+    try:
+        with open('/proc/self/statm') as statm:
+            rss_mb = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        # Peak rather than current memory, which still shows steady growth.
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    connections = sum(1 for connection in list(_connections) if getattr(connection, 'open', True))
+    return {'connections': connections, 'file_descriptors': file_descriptors, 'rss_mb': rss_mb,
+            'leaks': len(leaks)}
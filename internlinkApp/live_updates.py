@@ -0,0 +1,148 @@
+"""Pushes live application updates to browsers with Server-Sent Events (SSE).
+
+The write paths (new applications, status and feedback changes) call
+`publish()` once their transaction has been committed, and every browser
+subscribed to that channel gets the event straight away - pages never poll
+the database for changes.
+
+Channels are named after whoever should see the event:
+- `student:<student_id>` for a student's own applications.
+- `employer:<emp_id>` for the applications to a company's internships.
+
+This is an in-process publish/subscribe: an event only reaches browsers
+connected to the worker process that published it, which is enough for the
+single-process deployments InternLink runs on.
+
+Each channel keeps its last `HISTORY_SIZE` events, so a browser that
+reconnects with a `Last-Event-ID` header gets whatever it missed. Event IDs
+are the time they were published in microseconds (kept increasing within the
+process), so an ID stays meaningful when the browser reconnects to a restarted
+or different worker process. The history of a channel is dropped once it has
+had no events for `HISTORY_SECONDS`, and only the `MAX_HISTORY_CHANNELS`
+channels with the most recent events keep theirs. A comment
+line is sent every `SSE_HEARTBEAT_SECONDS` to keep idle connections open, and
+each process accepts at most `SSE_MAX_CONNECTIONS` streams at once (long-lived
+streams each hold a worker thread).
+"""
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import Flask, Response
+
+# Events kept per channel for reconnecting browsers.
+HISTORY_SIZE = 100
+
+# Seconds a channel's history is kept after its last event, and the most channels with a history.
+HISTORY_SECONDS = 600
+MAX_HISTORY_CHANNELS = 10000
+
+# How long (milliseconds) browsers wait before reconnecting after a dropped stream.
+RECONNECT_DELAY_MS = 5000
+
+# Set by `init_live_updates()`.
+heartbeat_seconds = 15
+_connection_slots = threading.BoundedSemaphore(100)
+
+_subscribers = {}
+# channel -> its recent events, least recently published to first.
+_history = OrderedDict()
+_lock = threading.Lock()
+_last_event_id = 0
+
+def init_live_updates(app: Flask):
+    """Reads the SSE settings (`SSE_HEARTBEAT_SECONDS`, `SSE_MAX_CONNECTIONS`)
+    for the specified Flask app."""
+    global heartbeat_seconds, _connection_slots
+    heartbeat_seconds = app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+    _connection_slots = threading.BoundedSemaphore(app.config.get('SSE_MAX_CONNECTIONS', 100))
+
+def student_channel(student_id):
+    return f'student:{student_id}'
+
+def employer_channel(emp_id):
+    return f'employer:{emp_id}'
+
+def publish(channel, event_type, data):
+    """Sends an event to every browser subscribed to `channel`.
+
+    Args:
+        channel (str): The channel name (see `student_channel()` and
+            `employer_channel()`).
+        event_type (str): The SSE event name, e.g. 'status_changed'.
+        data (dict): JSON-serialisable event details.
+    """
+    global _last_event_id
+    with _lock:
+        _last_event_id = max(_last_event_id + 1, time.time_ns() // 1000)
+        event = (_last_event_id, event_type, json.dumps(data, default=str))
+        _history.setdefault(channel, deque(maxlen=HISTORY_SIZE)).append(event)
+        _history.move_to_end(channel)
+        _evict_history(_last_event_id - HISTORY_SECONDS * 1_000_000)
+        subscribers = list(_subscribers.get(channel, ()))
+    for subscriber in subscribers:
+        subscriber.put(event)
+
+def _evict_history(oldest_event_id):
+    """Drops the history of channels whose last event is older than
+    `oldest_event_id`, and of the least recently used channels beyond
+    `MAX_HISTORY_CHANNELS` (call with `_lock` held)."""
+    while _history:
+        channel, events = next(iter(_history.items()))
+        if events[-1][0] >= oldest_event_id and len(_history) <= MAX_HISTORY_CHANNELS:
+            break
+        del _history[channel]
+
+def stream(channel, last_event_id=None):
+    """Builds the streaming SSE response for one browser.
+
+    Args:
+        channel (str): The channel the browser subscribes to.
+        last_event_id (str): The browser's `Last-Event-ID` header, if it is
+            reconnecting.
+
+    Returns:
+        Response: The event stream, or a 503 response if this process already
+        serves `SSE_MAX_CONNECTIONS` streams.
+    """
+    if not _connection_slots.acquire(blocking=False):
+        return Response("Too many live connections, please try again later.", status=503,
+                        headers={'Retry-After': str(RECONNECT_DELAY_MS // 1000)})
+
+    subscriber = queue.Queue()
+    with _lock:
+        _subscribers.setdefault(channel, set()).add(subscriber)
+        missed = []
+        if last_event_id and last_event_id.isdigit():
+            missed = [event for event in _history.get(channel, ()) if event[0] > int(last_event_id)]
+
+    def unsubscribe():
+        with _lock:
+            channel_subscribers = _subscribers.get(channel)
+            if channel_subscribers is not None:
+                channel_subscribers.discard(subscriber)
+                if not channel_subscribers:
+                    del _subscribers[channel]
+        _connection_slots.release()
+
+    def generate():
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+        for event in missed:
+            yield format_event(*event)
+        while True:
+            try:
+                yield format_event(*subscriber.get(timeout=heartbeat_seconds))
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the browser disconnects, even if the stream never started.
+    response.call_on_close(unsubscribe)
+    return response
+
+def format_event(event_id, event_type, data):
+    """Formats one event in the SSE wire format."""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
@@ -0,0 +1,217 @@
+"""Limits failed login attempts per username and per client IP address.
+
+Checking a password with bcrypt is deliberately slow, so a burst of guesses
+(e.g. credential stuffing) could keep every worker busy hashing. `check()` runs
+before the user is looked up or any password is hashed, and turns the attempt
+away if, within the last `LOGIN_THROTTLE_WINDOW` seconds, there have been:
+- `LOGIN_MAX_FAILURES_PER_USER` failed logins for that username, or
+- `LOGIN_MAX_FAILURES_PER_IP` failed logins from that IP address.
+The window slides: each failure stops counting `LOGIN_THROTTLE_WINDOW` seconds
+after it happened. A successful login clears the username's failures.
+
+Failures are recorded in a small SQLite file (`LOGIN_THROTTLE_PATH`, default
+instance/login_throttle.sqlite3), so every worker process on the machine shares
+the same counts. Each process also remembers the keys it has already blocked,
+so an ongoing attack is turned away without reading the failures again.
+Attempts that are turned away are not counted as failures, so a blocked key is
+released on time however hard it keeps trying. If the file can't be read or
+written, logins are let through (and the error printed) rather than refused.
+
+The file also keeps running totals (checked, blocked, failures, successes) for
+the admin login throttling page (see `throttle_stats()`). Each process counts
+in memory and adds its counts to the file every `COUNTER_FLUSH_SECONDS`, so
+an allowed or blocked attempt doesn't write to the file.
+
+The IP address is `request.remote_addr`. Behind a reverse proxy that is the
+proxy's address, so every client would share one IP limit: set
+`TRUSTED_PROXY_COUNT` to the number of proxies in front of the app, so the
+client address is taken from their X-Forwarded-For headers (see
+`create_app()`). Don't set it when clients can reach the app directly, as they
+could then send any X-Forwarded-For they like.
+"""
+import collections
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Flask
+
+# Set by `init_login_throttle()`.
+throttle_path = None
+window_seconds = 900
+max_failures_per_user = 5
+max_failures_per_ip = 50
+
+# Seconds between writes of this process's counters to the file.
+COUNTER_FLUSH_SECONDS = 10
+
+# key -> time (epoch seconds) until which this process knows the key is blocked
+_blocked_until = {}
+_blocked_lock = threading.Lock()
+
+# Counts not yet added to the file, and when they were last added.
+_pending_counts = collections.Counter()
+_last_flush = 0
+_counts_lock = threading.Lock()
+
+def init_login_throttle(app: Flask):
+    """Sets up login throttling for the specified Flask app.
+
+    Args:
+        app: The `Flask` application. `LOGIN_THROTTLE_PATH`,
+            `LOGIN_THROTTLE_WINDOW`, `LOGIN_MAX_FAILURES_PER_USER` and
+            `LOGIN_MAX_FAILURES_PER_IP` are read from its configuration (a
+            limit of `0` turns that limit off).
+    """
+    global throttle_path, window_seconds, max_failures_per_user, max_failures_per_ip
+    throttle_path = app.config.get('LOGIN_THROTTLE_PATH') or os.path.join(app.instance_path, 'login_throttle.sqlite3')
+    window_seconds = app.config.get('LOGIN_THROTTLE_WINDOW', 900)
+    max_failures_per_user = app.config.get('LOGIN_MAX_FAILURES_PER_USER', 5)
+    max_failures_per_ip = app.config.get('LOGIN_MAX_FAILURES_PER_IP', 50)
+    _blocked_until.clear()
+    _pending_counts.clear()
+
+    os.makedirs(os.path.dirname(throttle_path), exist_ok=True)
+    with _store() as store:
+        store.execute('PRAGMA journal_mode=WAL')
+        store.execute('CREATE TABLE IF NOT EXISTS failure (key TEXT NOT NULL, failed_at REAL NOT NULL)')
+        store.execute('CREATE INDEX IF NOT EXISTS failure_key ON failure (key, failed_at)')
+        store.execute('CREATE INDEX IF NOT EXISTS failure_age ON failure (failed_at)')
+        store.execute('CREATE TABLE IF NOT EXISTS counter (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+def _store():
+    """Opens a connection to the shared SQLite file (closed when the `with`
+    block ends)."""
+    connection = sqlite3.connect(throttle_path, timeout=5, isolation_level=None)
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return contextlib.closing(connection)
+
+def _keys(username, ip_address):
+    """The throttling keys, with their limits, for a login attempt."""
+    keys = []
+    if max_failures_per_user:
+        keys.append((f'user:{username.strip().lower()}', max_failures_per_user))
+    if max_failures_per_ip and ip_address:
+        keys.append((f'ip:{ip_address}', max_failures_per_ip))
+    return keys
+
+def _count(name):
+    """Adds one to a counter, writing the counts to the file if they are due."""
+    with _counts_lock:
+        _pending_counts[name] += 1
+        due = time.time() - _last_flush >= COUNTER_FLUSH_SECONDS
+    if due:
+        flush_counters()
+
+def flush_counters():
+    """Adds the counts of this process to the file."""
+    global _last_flush
+    with _counts_lock:
+        counts = list(_pending_counts.items())
+        _pending_counts.clear()
+        _last_flush = time.time()
+    if not counts:
+        return
+    try:
+        with _store() as store:
+            store.executemany('INSERT INTO counter (name, value) VALUES (?, ?) '
+                              'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value', counts)
+    except sqlite3.Error as e:
+        # They are only statistics; keep them for the next attempt.
+        print(f"Error writing login throttling counters: {e}")
+        with _counts_lock:
+            _pending_counts.update(dict(counts))
+
+def check(username, ip_address):
+    """Decides whether a login attempt may go ahead.
+
+    Args:
+        username (str): The username being logged in to.
+        ip_address (str): The client's IP address.
+
+    Returns:
+        int: `0` if the attempt may go ahead, otherwise how many seconds to
+        wait before trying again.
+    """
+    keys = _keys(username, ip_address)
+    if not keys:
+        return 0
+    now = time.time()
+
+    with _blocked_lock:
+        known_block = max((_blocked_until.get(key, 0) for key, limit in keys), default=0)
+    if known_block > now:
+        _count('blocked')
+        return int(known_block - now) + 1
+
+    retry_after = 0
+    try:
+        with _store() as store:
+            for key, limit in keys:
+                failures = store.execute('SELECT failed_at FROM failure WHERE key = ? AND failed_at > ? '
+                                         'ORDER BY failed_at DESC LIMIT ?',
+                                         (key, now - window_seconds, limit)).fetchall()
+                if len(failures) >= limit:
+                    # Blocked until the oldest of the last `limit` failures leaves the window.
+                    until = failures[-1][0] + window_seconds
+                    with _blocked_lock:
+                        _blocked_until[key] = until
+                    retry_after = max(retry_after, int(until - now) + 1)
+    except sqlite3.Error as e:
+        # Fail open: a broken throttle file mustn't lock everyone out.
+        print(f"Error checking login throttling: {e}")
+        return 0
+    _count('blocked' if retry_after else 'checked')
+    return retry_after
+
+def record_failure(username, ip_address):
+    """Records a failed login (unknown username or wrong password)."""
+    keys = _keys(username, ip_address)
+    now = time.time()
+    try:
+        with _store() as store:
+            store.executemany('INSERT INTO failure (key, failed_at) VALUES (?, ?)',
+                              [(key, now) for key, limit in keys])
+            store.execute('DELETE FROM failure WHERE failed_at <= ?', (now - window_seconds,))
+    except sqlite3.Error as e:
+        print(f"Error recording a failed login: {e}")
+    _count('failures')
+
+def record_success(username):
+    """Records a successful login, clearing the username's failures."""
+    key = f'user:{username.strip().lower()}'
+    try:
+        with _store() as store:
+            store.execute('DELETE FROM failure WHERE key = ?', (key,))
+    except sqlite3.Error as e:
+        print(f"Error clearing failed logins: {e}")
+    _count('successes')
+    with _blocked_lock:
+        _blocked_until.pop(key, None)
+
+def throttle_stats(limit=20):
+    """Summarises the throttling state for monitoring.
+
+    Returns:
+        dict: 'counters' (checked, blocked, failures and successes since the
+        file was created, as far as the processes have written them),
+        'blocked' (the keys currently over their limit, with their failure
+        count) and 'watched' (the keys with the most recent failures).
+    """
+    flush_counters()
+    now = time.time()
+    with _store() as store:
+        counters = dict.fromkeys(('checked', 'blocked', 'failures', 'successes'), 0)
+        counters.update({row[0]: row[1] for row in store.execute('SELECT name, value FROM counter')})
+        keys = store.execute('SELECT key, COUNT(*), MAX(failed_at) FROM failure WHERE failed_at > ? '
+                             'GROUP BY key ORDER BY COUNT(*) DESC LIMIT ?', (now - window_seconds, limit)).fetchall()
+
+    limits = {'user': max_failures_per_user, 'ip': max_failures_per_ip}
+    watched = []
+    for key, failures, last_failed_at in keys:
+        limit = limits[key.split(':', 1)[0]]
+        watched.append({'key': key, 'failures': failures, 'last_failure_age': now - last_failed_at,
+                        'blocked': bool(limit) and failures >= limit})
+    return {'counters': counters, 'blocked': [row for row in watched if row['blocked']], 'watched': watched}
@@ -0,0 +1,198 @@
+"""Delivers application status changes to students.
+
+When an employer changes an application's status, an event is written to the
+`application_event` outbox table in the same transaction as the status update
+(see `record_status_changes()`), so an event exists if and only if the change
+was saved. A background job (`dispatch_notifications`) then delivers the
+pending events in batches:
+- All events for the same student are combined into one digest, and only the
+  latest change of each application is kept.
+- Each digest becomes one row in the `notification` table (shown in the app),
+  and is sent by email through the configured email sink.
+
+Email sinks are pluggable: register a function with `@email_sink('name')` and
+set `EMAIL_SINK` to that name. The built-in "file" sink writes each email to a
+text file in `EMAIL_OUTBOX_DIR` (handy for development), and "none" drops them.
+
+Pending events can also be delivered by hand with:
+
+    flask --app run dispatch-notifications
+"""
+import os
+from datetime import datetime
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from internlinkApp import cache, db, jobs
+
+# Events delivered per transaction.
+DISPATCH_BATCH_SIZE = 500
+
+# Registered email sinks: name -> function(to_address, subject, body)
+EMAIL_SINKS = {}
+
+# Set by `init_notifications()`.
+email_sink_name = 'file'
+digest_delay = 30
+
+def email_sink(name):
+    """Registers the decorated function as the email sink called `name`."""
+    def register(sink):
+        EMAIL_SINKS[name] = sink
+        return sink
+    return register
+
+def init_notifications(app: Flask):
+    """Reads the notification settings (`EMAIL_SINK`, `NOTIFICATION_DIGEST_DELAY`)
+    for the specified Flask app."""
+    global email_sink_name, digest_delay
+    email_sink_name = app.config.get('EMAIL_SINK', 'file')
+    digest_delay = app.config.get('NOTIFICATION_DIGEST_DELAY', 30)
+    if email_sink_name not in EMAIL_SINKS:
+        raise ValueError(f"Unknown EMAIL_SINK '{email_sink_name}'. Choose one of: {', '.join(EMAIL_SINKS)}.")
+
+def record_status_changes(cursor, changes):
+    """Writes status change events to the outbox.
+
+    Call this inside the transaction that updates the applications, then call
+    `schedule_dispatch()` once it has been committed.
+
+    Args:
+        cursor: A cursor belonging to the open transaction.
+        changes (list): `(student_id, internship_id, old_status, new_status,
+            feedback)` tuples.
+    """
+    if not changes:
+        return
+    cursor.executemany("""
+        INSERT INTO application_event (student_id, internship_id, old_status, new_status, feedback)
+        VALUES (%s, %s, %s, %s, %s);
+    """, changes)
+
+def schedule_dispatch():
+    """Queues a delivery run after `NOTIFICATION_DIGEST_DELAY` seconds, so
+    changes made close together end up in the same digest.
+
+    The events are already saved in the outbox, so if the job can't be queued
+    they are simply delivered by the next run instead.
+    """
+    try:
+        jobs.enqueue('dispatch_notifications', delay=digest_delay)
+    except Exception as e:
+        print(f"Error scheduling notification delivery: {e}")
+
+@jobs.job('dispatch_notifications', max_attempts=5, concurrency=1)
+def dispatch_notifications():
+    """Delivers every pending outbox event, one batch at a time."""
+    while dispatch_batch():
+        pass
+
+def dispatch_batch(batch_size=DISPATCH_BATCH_SIZE):
+    """Delivers up to `batch_size` pending events.
+
+    Returns:
+        int: The number of events delivered (0 when the outbox is empty).
+    """
+    with db.transaction() as cursor:
+        # SKIP LOCKED lets several dispatchers work on different batches at the same time.
+        cursor.execute("""
+            SELECT ev.event_id, ev.student_id, ev.internship_id, ev.new_status, ev.feedback,
+                   s.user_id, u.full_name, u.email, i.title AS internship_title, e.company_name
+            FROM application_event ev
+            JOIN student s ON ev.student_id = s.student_id
+            JOIN users u ON s.user_id = u.user_id
+            JOIN internship i ON ev.internship_id = i.internship_id
+            JOIN employer e ON i.company_id = e.emp_id
+            WHERE ev.dispatched_at IS NULL
+            ORDER BY ev.event_id
+            LIMIT %s
+            FOR UPDATE OF ev SKIP LOCKED;
+        """, (batch_size,))
+        events = cursor.fetchall()
+        if not events:
+            return 0
+
+        digests = build_digests(events)
+        cursor.executemany("""
+            INSERT INTO notification (user_id, message) VALUES (%s, %s);
+        """, [(digest['user_id'], digest['message']) for digest in digests])
+        cursor.execute("UPDATE application_event SET dispatched_at = NOW() WHERE event_id IN ("
+                       + ", ".join(["%s"] * len(events)) + ");",
+                       tuple(event['event_id'] for event in events))
+    cache.invalidate_tags(*[cache.user_tag(digest['user_id']) for digest in digests])
+
+    # Emails are sent once the notifications are committed. A failing email is logged and not retried, so a
+    # broken mail server can never make students get the same in-app notification twice.
+    sink = EMAIL_SINKS[email_sink_name]
+    for digest in digests:
+        try:
+            sink(digest['email'], digest['subject'], digest['body'])
+        except Exception as e:
+            print(f"Error sending notification email to {digest['email']}: {e}")
+
+    return len(events)
+
+def build_digests(events):
+    """Combines outbox events into one digest per student.
+
+    Args:
+        events (list): Event rows, oldest first.
+
+    Returns:
+        list: One dictionary per student with 'user_id', 'email', 'subject',
+        'message' (for the app) and 'body' (for the email).
+    """
+    # Only the latest change of each application matters.
+    latest = {}
+    for event in events:
+        latest[(event['student_id'], event['internship_id'])] = event
+
+    by_student = {}
+    for event in latest.values():
+        by_student.setdefault(event['student_id'], []).append(event)
+
+    digests = []
+    for student_events in by_student.values():
+        first = student_events[0]
+        lines = [f"{event['internship_title']} at {event['company_name']}: {event['new_status']}"
+                 + (f" - {event['feedback']}" if event['feedback'] else "")
+                 for event in student_events]
+        if len(lines) == 1:
+            subject = "Your application status has changed"
+            message = f"Application update: {lines[0]}"
+        else:
+            subject = f"{len(lines)} of your applications have been updated"
+            message = f"{len(lines)} application updates: " + "; ".join(lines)
+        body = (f"Hi {first['full_name']},\n\nThere are updates to your InternLink applications:\n\n"
+                + "\n".join(f"- {line}" for line in lines)
+                + "\n\nLog in to InternLink and open My Applications for details.\n")
+        digests.append({'user_id': first['user_id'], 'email': first['email'], 'subject': subject,
+                        'message': message, 'body': body})
+    return digests
+
+@email_sink('file')
+def file_email_sink(to_address, subject, body):
+    """Writes the email to a text file in `EMAIL_OUTBOX_DIR` instead of sending it."""
+    outbox_dir = current_app.config.get('EMAIL_OUTBOX_DIR') or os.path.join(current_app.instance_path, 'outbox')
+    os.makedirs(outbox_dir, exist_ok=True)
+    filename = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{to_address.replace('@', '_at_')}.txt"
+    with open(os.path.join(outbox_dir, filename), 'w', encoding='utf-8') as email_file:
+        email_file.write(f"To: {to_address}\nSubject: {subject}\n\n{body}")
+
+@email_sink('none')
+def no_email_sink(to_address, subject, body):
+    """Drops the email."""
+
+@click.command('dispatch-notifications')
+@with_appcontext
+def dispatch_notifications_command():
+    """Delivers all pending application status notifications now."""
+    delivered = 0
+    while True:
+        count = dispatch_batch()
+        if not count:
+            break
+        delivered += count
+    click.echo(f"Delivered {delivered} status change event(s).")
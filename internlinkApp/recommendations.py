@@ -0,0 +1,404 @@
+"""Recommends open internships to students.
+
+Every open internship is turned into a TF-IDF vector of the words in its title,
+skills and description, and stored in an in-memory inverted index (word ->
+internships containing it, with weights). A student's profile (course,
+university, and the titles and skills of internships they applied for) is
+turned into a vector the same way, and internships are ranked by cosine
+similarity.
+
+Only the index entries of the student's own words are visited, and the
+weights in the index are already divided by each internship's vector length,
+so scoring is a sparse dot product of multiplications and additions. Common
+words (skills like 'python', or 'engineer') would still have posting lists
+covering a good share of the catalogue, so for words with more than
+`CHAMPION_LIST_SIZE` internships only those with the highest weights for it
+(its "champion list") are visited. The `RESCORED_CANDIDATES` best internships
+found that way are then scored exactly over all of the student's words. The
+cost of a recommendation is therefore bounded however large the catalogue
+grows; the results match scoring every internship unless a good match is in
+none of the champion lists of the student's common words.
+
+The index is loaded in a background thread when the process serves its first
+request (students see no recommendations until it is ready), and the thread
+keeps it up to date: every `SYNC_INTERVAL` seconds the internships whose
+`updated_at` is at or after the latest one already seen are re-indexed (new
+postings included). Every `FULL_RELOAD_INTERVAL` seconds all open internships
+are fetched again, which also drops the ones deleted or archived since; only
+the rows whose `updated_at` changed are tokenized again.
+`index_internship()` can also be called directly when a posting is saved, so
+it shows up immediately in that process.
+
+Like the internship catalogue, the index is never modified in place: changes
+build a new version (copying only the entries they touch) and swap it in, so
+scoring needs no lock and is never held up by a sync. The idf values are kept
+with the version they were computed for, and every weight is recomputed in the
+sync thread once the number of internships has drifted by more than
+`IDF_REFRESH_DRIFT` since.
+"""
+import heapq
+import math
+import operator
+import re
+import threading
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+
+from internlinkApp import db
+
+# Seconds between incremental syncs with the database.
+SYNC_INTERVAL = 60
+
+# Seconds between full reloads.
+FULL_RELOAD_INTERVAL = 600
+
+# Seconds before the latest `updated_at` seen that incremental syncs fetch again, for rows committed out of order.
+SYNC_OVERLAP = 5
+
+# Internships visited per word when scoring (see the module docs), and how many of the best ones found are scored
+# exactly.
+CHAMPION_LIST_SIZE = 1000
+RESCORED_CANDIDATES = 200
+
+# The idf values and weights are recomputed once the number of indexed internships has drifted this much (as a
+# fraction), since adding or removing postings shifts every idf value a little.
+IDF_REFRESH_DRIFT = 0.1
+
+# Words that carry no meaning for matching.
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'into', 'is', 'it', 'of', 'on', 'or',
+    'our', 'the', 'to', 'with', 'we', 'you', 'your', 'will', 'this', 'that', 'their', 'using', 'intern',
+    'internship', 'university', 'bachelor', 'master', 'degree',
+}
+
+# How much each internship field counts towards its vector.
+FIELD_WEIGHTS = {'title': 3, 'skills_required': 3, 'description': 1}
+
+class Index:
+    """One version of the index. It is never modified once built.
+
+    Attributes:
+        documents (dict): internship_id -> {'terms': {term: tf weight},
+            'deadline': date, 'updated_at': datetime}
+        postings (dict): term -> {internship_id: tf-idf weight divided by the
+            internship's vector length}
+        idfs (dict): term -> the idf value used for its weights.
+        champions (dict): term -> {internship_id: weight} of the
+            `CHAMPION_LIST_SIZE` highest weights, for the terms with longer
+            posting lists.
+        idf_document_count (int): Number of internships when the idf values
+            were last all recomputed.
+    """
+    def __init__(self, documents=None, postings=None, idfs=None, champions=None, idf_document_count=0):
+        self.documents = documents if documents is not None else {}
+        self.postings = postings if postings is not None else {}
+        self.idfs = idfs if idfs is not None else {}
+        self.champions = champions if champions is not None else {}
+        self.idf_document_count = idf_document_count
+
+# The current version of the index, and the lock held while making a new one.
+_index = Index()
+_lock = threading.Lock()
+_last_sync = None
+_last_full_reload = None
+# The latest `updated_at` indexed so far.
+_high_water = None
+_loaded = False
+# Held by the thread syncing the index (see `sync_index()`).
+_sync_lock = threading.Lock()
+# Set by `init_recommendations()`; the background sync thread starts with the first request.
+_app = None
+_started = False
+_start_lock = threading.Lock()
+
+def init_recommendations(app: Flask):
+    """Loads and syncs the recommendation index in a background thread,
+    started by the first request the specified Flask app serves."""
+    global _app
+    _app = app
+    app.before_request(_start_sync)
+
+def _start_sync():
+    global _started
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        threading.Thread(target=_sync_forever, name='internlink-recommendations', daemon=True).start()
+        _started = True
+
+def _sync_forever():
+    while True:
+        try:
+            with _app.app_context():
+                sync_index(force=True)
+        except Exception as e:
+            print(f"Error syncing the recommendation index: {e}")
+        time.sleep(SYNC_INTERVAL)
+
+def tokenize(text):
+    """Splits text into lower-case words, dropping stop words and single
+    characters. Keeps terms like 'c++', 'c#' and 'node.js' together."""
+    if not text:
+        return []
+    return [word for word in re.findall(r'[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]', text.lower())
+            if len(word) > 1 and word not in STOP_WORDS]
+
+def term_frequencies(fields):
+    """Builds the weighted term frequencies of a document.
+
+    Args:
+        fields (dict): field name -> text.
+
+    Returns:
+        dict: term -> log-scaled weighted frequency.
+    """
+    counts = {}
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS.get(field, 1)
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + weight
+    return {term: 1 + math.log(count) for term, count in counts.items()}
+
+def _idf(document_count, document_frequency):
+    """Smoothed inverse document frequency."""
+    return math.log((1 + document_count) / (1 + document_frequency)) + 1
+
+def _document(internship):
+    return {'terms': term_frequencies({field: internship.get(field) for field in FIELD_WEIGHTS}),
+            'deadline': internship['deadline'], 'updated_at': internship.get('updated_at')}
+
+def _add_postings(postings, idfs, internship_id, terms):
+    norm = math.sqrt(sum((weight * idfs[term]) ** 2 for term, weight in terms.items())) or 1.0
+    for term, weight in terms.items():
+        postings[term][internship_id] = weight * idfs[term] / norm
+
+def _updated(index, changed, removed):
+    """Makes a new version of `index` with the `changed` documents (re)indexed
+    and the `removed` internship IDs dropped, copying only the posting lists
+    they touch. New words get their idf value from the current counts. Once
+    the number of documents has drifted by `IDF_REFRESH_DRIFT`, everything is
+    reweighted instead."""
+    documents = dict(index.documents)
+    for internship_id in removed | changed.keys():
+        documents.pop(internship_id, None)
+    documents.update(changed)
+    if abs(len(documents) - index.idf_document_count) > IDF_REFRESH_DRIFT * index.idf_document_count:
+        return _reweighted(documents)
+
+    postings = dict(index.postings)
+    idfs = dict(index.idfs)
+    champions = dict(index.champions)
+    # term -> IDs of the internships whose weight for it was removed, and of those it was (re)added for.
+    dropped = {}
+    added = {}
+    for internship_id in removed | changed.keys():
+        document = index.documents.get(internship_id)
+        if document is not None:
+            for term in document['terms']:
+                dropped.setdefault(term, set()).add(internship_id)
+    for internship_id, document in changed.items():
+        for term in document['terms']:
+            added.setdefault(term, set()).add(internship_id)
+
+    for term in dropped.keys() | added.keys():
+        postings[term] = dict(postings.get(term, ()))
+    for term, internship_ids in dropped.items():
+        for internship_id in internship_ids:
+            del postings[term][internship_id]
+    for internship_id, document in changed.items():
+        for term in document['terms']:
+            if term not in idfs:
+                idfs[term] = _idf(len(documents), len(postings[term]) + 1)
+        _add_postings(postings, idfs, internship_id, document['terms'])
+
+    for term in dropped.keys() | added.keys():
+        term_postings = postings[term]
+        old_champions = champions.pop(term, None)
+        if len(term_postings) > CHAMPION_LIST_SIZE:
+            if old_champions is None or not old_champions.keys().isdisjoint(dropped.get(term, ())):
+                champions[term] = _champions(term_postings)
+            else:
+                # Only additions: those weighing more than the lowest champion push it out.
+                lowest = min(old_champions.values())
+                promoted = {internship_id: term_postings[internship_id] for internship_id in added.get(term, ())
+                            if term_postings[internship_id] > lowest}
+                champions[term] = _champions({**old_champions, **promoted}) if promoted else old_champions
+        elif not term_postings:
+            del postings[term]
+            idfs.pop(term, None)
+    return Index(documents, postings, idfs, champions, index.idf_document_count)
+
+def _reweighted(documents):
+    """Builds the index of `documents` from scratch, with fresh idf values."""
+    document_frequencies = {}
+    for document in documents.values():
+        for term in document['terms']:
+            document_frequencies[term] = document_frequencies.get(term, 0) + 1
+    idfs = {term: _idf(len(documents), count) for term, count in document_frequencies.items()}
+    postings = {term: {} for term in idfs}
+    for internship_id, document in documents.items():
+        _add_postings(postings, idfs, internship_id, document['terms'])
+    champions = {term: _champions(term_postings) for term, term_postings in postings.items()
+                 if len(term_postings) > CHAMPION_LIST_SIZE}
+    return Index(documents, postings, idfs, champions, len(documents))
+
+def _champions(term_postings):
+    return dict(heapq.nlargest(CHAMPION_LIST_SIZE, term_postings.items(), key=operator.itemgetter(1)))
+
+def index_internship(internship):
+    """Adds an internship to the index, or re-indexes it if it is already there.
+
+    Args:
+        internship (dict): A row with internship_id, title, skills_required,
+            description, deadline and (optionally) updated_at.
+    """
+    global _index
+    document = _document(internship)
+    with _lock:
+        _index = _updated(_index, {internship['internship_id']: document}, set())
+
+def remove_internship(internship_id):
+    """Removes an internship from the index (does nothing if it isn't there)."""
+    global _index
+    with _lock:
+        if internship_id in _index.documents:
+            _index = _updated(_index, {}, {internship_id})
+
+def sync_index(force=False):
+    """Brings the index up to date with the database.
+
+    The first call loads every open internship, and so does the first call
+    every `FULL_RELOAD_INTERVAL` seconds, dropping internships that are no
+    longer in the database. Other calls (at most once per `SYNC_INTERVAL`
+    unless `force` is set) only fetch internships whose row changed since the
+    previous sync. Internships past their deadline are dropped.
+
+    Only one thread syncs at a time; others keep using the current index
+    meanwhile (or wait for the first load).
+    """
+    global _index, _last_sync, _last_full_reload, _high_water, _loaded
+    now = time.time()
+    if _loaded and not force and now - _last_sync < SYNC_INTERVAL:
+        return
+    if not _sync_lock.acquire(blocking=not _loaded):
+        return
+    try:
+        if _loaded and not force and time.time() - _last_sync < SYNC_INTERVAL:
+            # Synced by another thread while this one waited.
+            return
+        full_reload = not _loaded or _high_water is None or now - _last_full_reload >= FULL_RELOAD_INTERVAL
+        query = """
+            SELECT internship_id, title, skills_required, description, deadline, updated_at
+            FROM internship
+        """
+        if full_reload:
+            query += " WHERE deadline >= CURRENT_DATE()"
+            params = ()
+        else:
+            # Closed internships are fetched too, so one whose deadline was moved into the past is dropped.
+            query += " WHERE updated_at >= %s"
+            params = (_high_water - timedelta(seconds=SYNC_OVERLAP),)
+
+        with db.get_cursor(read_only=True) as cursor:
+            cursor.execute(query + ";", params)
+            rows = cursor.fetchall()
+        if rows:
+            _high_water = max([row['updated_at'] for row in rows] + ([_high_water] if _high_water else []))
+
+        # Rows that haven't changed since they were indexed (re-read by the overlap or a full reload) are skipped.
+        today = date.today()
+        documents = _index.documents
+        changed = {row['internship_id']: _document(row) for row in rows
+                   if row['deadline'] >= today
+                   and documents.get(row['internship_id'], {}).get('updated_at') != row['updated_at']}
+        removed = {row['internship_id'] for row in rows if row['deadline'] < today}
+        if full_reload:
+            removed |= documents.keys() - {row['internship_id'] for row in rows}
+
+        with _lock:
+            removed |= {internship_id for internship_id, document in _index.documents.items()
+                        if document['deadline'] < today}
+            removed &= _index.documents.keys()
+            if changed or removed:
+                _index = _updated(_index, changed, removed)
+
+        _last_sync = now
+        if full_reload:
+            _last_full_reload = now
+        _loaded = True
+    finally:
+        _sync_lock.release()
+
+def recommend_for_student(student_id, limit=5):
+    """Finds the open internships that best match a student.
+
+    Args:
+        student_id (int): The student to recommend internships to.
+        limit (int): How many internships to return.
+
+    Returns:
+        list: (internship_id, score) tuples, best match first. Internships the
+        student already applied for are left out. Empty until the index has
+        been loaded.
+    """
+    if _app is None:
+        # Without the background thread (e.g. in a command), the index is synced here.
+        sync_index()
+    if not _loaded:
+        return []
+
+    with db.get_cursor(read_only=True) as cursor:
+        cursor.execute("SELECT course, university FROM student WHERE student_id = %s;", (student_id,))
+        student = cursor.fetchone() or {}
+        cursor.execute("""
+            SELECT i.internship_id, i.title, i.skills_required
+            FROM application a
+            JOIN internship i ON a.internship_id = i.internship_id
+            WHERE a.student_id = %s;
+        """, (student_id,))
+        applied = cursor.fetchall()
+
+    profile_text = {'title': ' '.join(filter(None, [student.get('course')] + [row['title'] for row in applied])),
+                    'skills_required': ' '.join(filter(None, [row['skills_required'] for row in applied])),
+                    'description': student.get('university')}
+    return top_matches(term_frequencies(profile_text), exclude={row['internship_id'] for row in applied}, limit=limit)
+
+def top_matches(query_terms, exclude=(), limit=5):
+    """Ranks indexed internships by cosine similarity to a query vector
+    (visiting only the champion lists of common words, see the module docs).
+
+    Args:
+        query_terms (dict): term -> tf weight of the query.
+        exclude (set): Internship IDs to leave out.
+        limit (int): How many results to return.
+
+    Returns:
+        list: (internship_id, score) tuples, best match first.
+    """
+    index = _index
+    query_weights = {term: weight * index.idfs[term] for term, weight in query_terms.items() if term in index.postings}
+    if not query_weights:
+        return []
+    query_norm = math.sqrt(sum(weight ** 2 for weight in query_weights.values()))
+    query_weights = {term: weight / query_norm for term, weight in query_weights.items()}
+
+    scores = {}
+    get = scores.get
+    for term, query_weight in query_weights.items():
+        for internship_id, weight in (index.champions.get(term) or index.postings[term]).items():
+            scores[internship_id] = get(internship_id, 0.0) + query_weight * weight
+
+    today = date.today()
+    documents = index.documents
+    candidates = [internship_id for _, internship_id in
+                  heapq.nlargest(RESCORED_CANDIDATES + len(exclude), ((score, internship_id)
+                                                                      for internship_id, score in scores.items()))
+                  if internship_id not in exclude and documents[internship_id]['deadline'] >= today]
+    exact_scores = ((sum(query_weight * index.postings[term].get(internship_id, 0.0)
+                         for term, query_weight in query_weights.items()), internship_id)
+                    for internship_id in candidates[:RESCORED_CANDIDATES])
+    return [(internship_id, score) for score, internship_id in heapq.nlargest(limit, exact_scores)]
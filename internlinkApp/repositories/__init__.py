@@ -0,0 +1,15 @@
+"""The data-access layer: one module per table, holding the SQL of its queries.
+
+Each query returns compact row objects (see rows.py) rather than dictionaries,
+which matters for large result sets like an employer's application list.
+
+Usage:
+------
+```
+>>> from internlinkApp import repositories
+>>> applications = repositories.application.for_employer(emp_id)
+>>> applications[0].student_full_name
+```
+Queries that run inside a transaction take its cursor as their first argument.
+"""
+from internlinkApp.repositories import application, employer, internship, student, users
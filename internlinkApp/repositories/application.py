@@ -0,0 +1,105 @@
+"""Queries on the `application` table."""
+from internlinkApp import resume_index
+from internlinkApp.repositories.rows import fetch_all, fetch_values, row_type, stream
+
+# The applications on an employer's "Manage Applications" page, in the order of the columns of its export.
+ListedApplication = row_type(__name__, 'ListedApplication', (
+    'a.student_id', 'a.internship_id', 'i.title AS internship_title', 'i.location AS internship_location',
+    'u.full_name AS student_full_name', 'u.email AS student_email', 's.university', 's.course', 's.resume_path',
+    'a.status', 'a.feedback', 'a.cover_letter', 'a.relevance_score',
+))
+
+# A student's applications on "My Applications" and the student homepage.
+StudentApplication = row_type(__name__, 'StudentApplication', (
+    'a.status', 'a.feedback', 'i.title AS internship_title', 'i.location AS internship_location',
+    'e.company_name AS company_name', 'i.internship_id',
+))
+
+def employer_applications_query(emp_id, search_applicant=None, search_internship_title=None, filter_status=None,
+                                sort_by=None, search_skills=None):
+    """Builds the query listing the applications for a company's internships, with the optional filters applied.
+
+    Args:
+        emp_id (int): The employer whose applications are listed.
+        search_applicant (str): Applicant full name to keep, or 'all'.
+        search_internship_title (str): Internship title to keep, or 'all'.
+        filter_status (str): Application status to keep, or 'all'.
+        sort_by (str): 'relevance' to list the best matching applicants first (see candidate_ranking.py);
+            otherwise applications are ordered by status and name.
+        search_skills (str): Only keep applicants whose indexed resume mentions all of these skills.
+
+    Returns:
+        tuple: The SQL query, selecting `ListedApplication.columns`, and the tuple of its parameters.
+    """
+    query = f"""
+        SELECT {ListedApplication.columns}
+        FROM application a
+        JOIN student s ON a.student_id = s.student_id
+        JOIN users u ON s.user_id = u.user_id
+        JOIN internship i ON a.internship_id = i.internship_id
+        WHERE i.company_id = %s
+    """
+    params = [emp_id]
+
+    if search_applicant and search_applicant != 'all':
+        query += " AND u.full_name = %s"
+        params.append(search_applicant)
+    if search_internship_title and search_internship_title != 'all':
+        query += " AND i.title = %s"
+        params.append(search_internship_title)
+    if filter_status and filter_status != 'all':
+        query += " AND a.status = %s"
+        params.append(filter_status)
+    if search_skills:
+        skills_condition, skills_params = resume_index.resume_filter_sql(search_skills)
+        if skills_condition:
+            query += " AND " + skills_condition
+            params.extend(skills_params)
+
+    if sort_by == 'relevance':
+        query += " ORDER BY a.relevance_score DESC, u.full_name ASC;"
+    else:
+        query += " ORDER BY a.status ASC, u.full_name ASC;"
+    return query, tuple(params)
+
+def for_employer(emp_id, *filters):
+    """Lists the applications for a company's internships (see `employer_applications_query()` for the filters).
+
+    Returns:
+        list: `ListedApplication` rows.
+    """
+    return fetch_all(ListedApplication, *employer_applications_query(emp_id, *filters))
+
+def stream_for_employer(emp_id, *filters, fetch_size=1000):
+    """Like `for_employer()`, but yields the rows as they are fetched from the server, `fetch_size` at a time."""
+    return stream(ListedApplication, *employer_applications_query(emp_id, *filters), fetch_size=fetch_size)
+
+def applicant_names(emp_id):
+    """Lists the distinct full names of the students who applied to a company's internships, alphabetically."""
+    return fetch_values("""
+        SELECT DISTINCT u.full_name AS applicant
+        FROM application a
+        JOIN student s ON a.student_id = s.student_id
+        JOIN users u ON s.user_id = u.user_id
+        JOIN internship i ON a.internship_id = i.internship_id
+        WHERE i.company_id = %s
+        ORDER BY applicant;
+    """, (emp_id,))
+
+# A student's applications, most recent first (`StudentApplication` rows).
+STUDENT_APPLICATIONS_QUERY = f"""
+    SELECT {StudentApplication.columns}
+    FROM application a
+    JOIN internship i ON a.internship_id = i.internship_id
+    JOIN employer e ON i.company_id = e.emp_id
+    WHERE a.student_id = %s
+    ORDER BY a.created_at DESC, a.internship_id DESC;
+"""
+
+def for_student(student_id):
+    """Lists a student's applications, most recently submitted first.
+
+    Returns:
+        list: `StudentApplication` rows.
+    """
+    return fetch_all(StudentApplication, STUDENT_APPLICATIONS_QUERY, (student_id,))
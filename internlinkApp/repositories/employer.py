@@ -0,0 +1,13 @@
+"""Queries on the `employer` table."""
+from internlinkApp.repositories.rows import fetch_one, fetch_value, row_type
+
+# The company shown above an employer's own pages.
+Company = row_type(__name__, 'Company', ('emp_id', 'company_name'))
+
+def id_for_user(user_id):
+    """Gets the emp_id of a user, or None if the user has no employer profile."""
+    return fetch_value("SELECT emp_id FROM employer WHERE user_id = %s;", (user_id,))
+
+def company_for_user(user_id):
+    """Gets the emp_id and company_name of a user's company, or None if the user has no employer profile."""
+    return fetch_one(Company, f"SELECT {Company.columns} FROM employer WHERE user_id = %s;", (user_id,))
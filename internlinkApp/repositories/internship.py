@@ -0,0 +1,65 @@
+"""Queries on the `internship` table."""
+from internlinkApp.repositories.rows import fetch_all, fetch_values, row_type
+
+# The internships on an employer's "Posted Internships" page. The counts are maintained on the internship row (see
+# application_counts.py), so no join is needed.
+PostedInternship = row_type(__name__, 'PostedInternship', (
+    'i.internship_id', 'i.title', 'i.location', 'i.duration', 'i.deadline', 'i.stipend', 'i.number_of_opening',
+    'i.pending_count', 'i.accepted_count', 'i.rejected_count',
+    'i.pending_count + i.accepted_count + i.rejected_count AS application_count',
+))
+
+# The open internships on the browse page.
+OpenInternship = row_type(__name__, 'OpenInternship', (
+    'i.internship_id', 'i.title', 'i.description', 'i.location', 'i.duration', 'i.skills_required', 'i.deadline',
+    'i.stipend', 'i.number_of_opening', 'e.company_name', 'e.logo_path',
+))
+
+# The location, duration and stipend of every open internship, for the browse page's filter options.
+OPEN_FILTER_VALUES_QUERY = """
+    SELECT DISTINCT i.location, i.duration, i.stipend
+    FROM internship i
+    WHERE i.deadline >= CURRENT_DATE();
+"""
+
+def open_internships_query(category=None, location=None, duration=None, stipend=None):
+    """Builds the query finding the open internships that match every given filter, earliest deadline first.
+
+    The filters are those of `internship_catalog.search()`, which answers the same question from memory.
+
+    Returns:
+        tuple: The SQL query, selecting `OpenInternship.columns`, and the tuple of its parameters.
+    """
+    query = f"""
+        SELECT {OpenInternship.columns}
+        FROM internship i
+        JOIN employer e ON i.company_id = e.emp_id
+        WHERE i.deadline >= CURRENT_DATE()
+    """
+    params = []
+    if category and category != 'all':
+        query += " AND (i.title LIKE %s OR i.skills_required LIKE %s OR i.description LIKE %s)"
+        params.extend([f"%{category}%"] * 3)
+    for column, value in (('location', location), ('duration', duration), ('stipend', stipend)):
+        if value and value != 'all':
+            query += f" AND i.{column} = %s"
+            params.append(value)
+    return query + " ORDER BY i.deadline, i.internship_id;", tuple(params)
+
+def posted_by(emp_id):
+    """Lists a company's internships, latest deadline first."""
+    return fetch_all(PostedInternship, f"""
+        SELECT {PostedInternship.columns}
+        FROM internship i
+        WHERE i.company_id = %s
+        ORDER BY i.deadline DESC;
+    """, (emp_id,))
+
+def titles_for(emp_id):
+    """Lists the distinct titles of a company's internships, alphabetically."""
+    return fetch_values("""
+        SELECT DISTINCT i.title
+        FROM internship i
+        WHERE i.company_id = %s
+        ORDER BY i.title;
+    """, (emp_id,))
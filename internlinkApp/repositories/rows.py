@@ -0,0 +1,79 @@
+"""Maps query results to compact row objects.
+
+`DictCursor` turns every row into a dictionary, which keeps its own hash table
+of column names: a 13-column application row takes about 470 bytes before
+counting the values. The repositories instead read plain tuples from the
+server and wrap each one in a named tuple made for that query, with a field
+per column. A named tuple stores only the values (its field names live on the
+class, and it has no `__dict__`), so the same row takes about 160 bytes (see
+benchmarks/row_memory.py).
+
+Rows work like before in templates, where `row.column` and `row['column']`
+both read the field. In Python code, read fields as attributes and use
+`row._asdict()` where a real dictionary is needed (e.g. for JSON).
+"""
+from collections import namedtuple
+
+from internlinkApp import db
+
+def row_type(module, name, columns):
+    """Creates the row class of a query from the list of its columns.
+
+    Args:
+        module (str): The `__name__` of the module defining the class, so rows
+            can be pickled (e.g. by the shared cache).
+        name (str): The class name.
+        columns (tuple): SQL expressions of the SELECT list, in order. The
+            field name is the alias after ' AS ', or else the column name (e.g.
+            'a.status' -> 'status').
+
+    Returns:
+        type: A named tuple class whose `columns` attribute is the SELECT list.
+    """
+    fields = [column.rsplit(' AS ', 1)[-1].rsplit('.', 1)[-1] for column in columns]
+    row_class = namedtuple(name, fields, module=module)
+    row_class.columns = ", ".join(columns)
+    return row_class
+
+def fetch_all(row_class, query, params=(), read_only=True):
+    """Runs `query` and returns all of its rows as `row_class` instances."""
+    with db.get_cursor(read_only=read_only, as_dict=False) as cursor:
+        cursor.execute(query, params)
+        return list(map(row_class._make, cursor.fetchall()))
+
+def fetch_one(row_class, query, params=(), read_only=True):
+    """Runs `query` and returns its first row as a `row_class` instance, or
+    `None` if it has no rows."""
+    with db.get_cursor(read_only=read_only, as_dict=False) as cursor:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+    return None if row is None else row_class._make(row)
+
+def fetch_values(query, params=(), read_only=True):
+    """Runs a query selecting a single column, and returns its values."""
+    with db.get_cursor(read_only=read_only, as_dict=False) as cursor:
+        cursor.execute(query, params)
+        return [row[0] for row in cursor.fetchall()]
+
+def fetch_value(query, params=(), read_only=True):
+    """Runs a query selecting a single column, and returns the value in its
+    first row, or `None` if it has no rows."""
+    with db.get_cursor(read_only=read_only, as_dict=False) as cursor:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+    return None if row is None else row[0]
+
+def stream(row_class, query, params=(), fetch_size=1000):
+    """Yields the rows of `query` as `row_class` instances, fetching
+    `fetch_size` rows from the server at a time (see
+    `db.get_streaming_cursor()`)."""
+    cursor = db.get_streaming_cursor(as_dict=False)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from map(row_class._make, rows)
+    finally:
+        cursor.close()
@@ -0,0 +1,8 @@
+"""Queries on the `student` table."""
+from internlinkApp.repositories.rows import fetch_value
+
+ID_FOR_USER_QUERY = "SELECT student_id FROM student WHERE user_id = %s;"
+
+def id_for_user(user_id):
+    """Gets the student_id of a user, or None if the user has no student profile."""
+    return fetch_value(ID_FOR_USER_QUERY, (user_id,))
@@ -0,0 +1,78 @@
+"""Queries on the `users` table."""
+from internlinkApp.repositories.rows import fetch_all, fetch_value, fetch_values, row_type, stream
+
+# Accounts on the admin user management page.
+ListedUser = row_type(__name__, 'ListedUser', ('user_id', 'username', 'full_name', 'email', 'role', 'status'))
+
+# Usernames loaded into the username filter (see username_filter.py).
+Username = row_type(__name__, 'Username', ('user_id', 'username'))
+
+def filter_sql(search_name, filter_role, filter_status):
+    """Builds the WHERE clause shared by the user list and the bulk status change.
+
+    Args:
+        search_name (str): Part of the full name to search for.
+        filter_role (str): Role to keep, or 'all'.
+        filter_status (str): Account status to keep, or 'all'.
+
+    Returns:
+        tuple: The SQL condition and the list of its parameters.
+    """
+    where_sql = "1=1"
+    params = []
+
+    if search_name:
+        where_sql += " AND full_name LIKE %s"
+        params.append(f"%{search_name}%")
+    if filter_role and filter_role != 'all':
+        where_sql += " AND role = %s"
+        params.append(filter_role)
+    if filter_status and filter_status != 'all':
+        where_sql += " AND status = %s"
+        params.append(filter_status)
+
+    return where_sql, params
+
+def search(search_name=None, filter_role=None, filter_status=None):
+    """Lists the accounts matching the filters (see `filter_sql()`), by role and full name."""
+    where_sql, params = filter_sql(search_name, filter_role, filter_status)
+    return fetch_all(ListedUser, f"SELECT {ListedUser.columns} FROM users WHERE {where_sql} "
+                                 "ORDER BY role ASC, full_name ASC;", tuple(params))
+
+def matching_ids(search_name=None, filter_role=None, filter_status=None):
+    """Gets the IDs of the accounts matching the filters (see `filter_sql()`), in order."""
+    where_sql, params = filter_sql(search_name, filter_role, filter_status)
+    # Read from the primary, since the accounts are about to be changed.
+    return fetch_values(f"SELECT user_id FROM users WHERE {where_sql} ORDER BY user_id;", tuple(params),
+                        read_only=False)
+
+def id_for_username(username):
+    """Gets the user_id of the account with `username`, or None if there is none."""
+    return fetch_value("SELECT user_id FROM users WHERE username = %s;", (username,), read_only=False)
+
+def latest_user_id():
+    """Gets the highest user_id, or None if there are no accounts."""
+    return fetch_value("SELECT MAX(user_id) FROM users;")
+
+def stream_usernames(after_user_id=0, fetch_size=10000):
+    """Yields the `Username` of every account created after `after_user_id`, in user_id order."""
+    return stream(Username, f"SELECT {Username.columns} FROM users WHERE user_id > %s ORDER BY user_id;",
+                  (after_user_id,), fetch_size=fetch_size)
+
+def set_status(cursor, new_status, user_ids):
+    """Sets the status of the specified accounts.
+
+    Args:
+        cursor: A cursor belonging to the open transaction.
+        new_status (str): 'active' or 'inactive'.
+        user_ids (list): The accounts to change.
+
+    Returns:
+        int: The number of accounts whose status actually changed.
+    """
+    if not user_ids:
+        return 0
+    cursor.execute("UPDATE users SET status = %s WHERE status <> %s AND user_id IN ("
+                   + ", ".join(["%s"] * len(user_ids)) + ");",
+                   (new_status, new_status, *user_ids))
+    return cursor.rowcount
@@ -0,0 +1,184 @@
+"""Extracts the text of uploaded resumes and indexes it by skill.
+
+Whenever a student uploads a resume (at signup, on their profile or while
+applying), the `index_resume` background job:
+1. Hashes the PDF (SHA-256). A file whose hash is already in `resume_text` is
+   not read again - the student is simply linked to the existing entry.
+2. Otherwise extracts and normalises its text, and stores it in `resume_text`
+   along with one `resume_term` row per term (an inverted index: term ->
+   resumes containing it, with its weight).
+3. Sets `student.resume_hash`, and rescores the student's applications so the
+   applicant ranking (candidate_ranking.py) takes the resume into account.
+
+Employers can then find applicants by skill (`resume_filter_sql()`) without
+opening any PDF.
+
+Text is extracted with pypdf when it is installed. Otherwise a small built-in
+reader pulls the text out of the PDF content streams, which works for resumes
+exported by common word processors but not for every PDF (e.g. scanned ones).
+
+Resumes uploaded before this existed can be indexed with:
+
+    flask --app run index-resumes
+"""
+import hashlib
+import os
+import re
+import zlib
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from internlinkApp import candidate_ranking, db, jobs
+from internlinkApp.recommendations import term_frequencies, tokenize
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Longest text (characters) kept per resume.
+MAX_TEXT_LENGTH = 100000
+
+# Terms longer than this (e.g. URLs) are left out of the index.
+MAX_TERM_LENGTH = 64
+
+def file_hash(path):
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as resume_file:
+        for chunk in iter(lambda: resume_file.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def extract_pdf_text(path):
+    """Extracts the text of a PDF file.
+
+    Args:
+        path (str): Path to the PDF.
+
+    Returns:
+        str: The text, as found in the file (not normalised).
+    """
+    if PdfReader is not None:
+        return '\n'.join(page.extract_text() or '' for page in PdfReader(path).pages)
+
+    with open(path, 'rb') as pdf_file:
+        data = pdf_file.read()
+
+    pieces = []
+    for stream in re.finditer(rb'stream\r?\n(.*?)\r?\nendstream', data, re.S):
+        content = stream.group(1)
+        try:
+            content = zlib.decompress(content)
+        except zlib.error:
+            pass
+        for block in re.findall(rb'BT(.*?)ET', content, re.S):
+            # "[(Py) -20 (thon)] TJ" shows one string with kerning in between; "(text) Tj" shows a single string.
+            for array, string in re.findall(rb'\[((?:\\.|[^\]\\])*)\]\s*TJ|\(((?:\\.|[^\\)])*)\)\s*(?:Tj|\'|")',
+                                            block, re.S):
+                if array:
+                    pieces.append(''.join(_pdf_string(part) for part in re.findall(rb'\(((?:\\.|[^\\)])*)\)', array)))
+                else:
+                    pieces.append(_pdf_string(string))
+            pieces.append('\n')
+    return ' '.join(pieces)
+
+_PDF_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'f': '\f'}
+
+def _pdf_string(raw):
+    """Decodes the bytes of a PDF literal string (without its parentheses)."""
+    def unescape(match):
+        escaped = match.group(1)
+        if escaped.isdigit():
+            return chr(int(escaped, 8))
+        return _PDF_ESCAPES.get(escaped, escaped)
+    return re.sub(r'\\([0-7]{1,3}|.)', unescape, raw.decode('latin-1'), flags=re.S)
+
+def normalise_text(text):
+    """Lower-cases the text and collapses whitespace, capped at `MAX_TEXT_LENGTH`."""
+    return ' '.join(text.lower().split())[:MAX_TEXT_LENGTH]
+
+@jobs.job('index_resume', max_attempts=3, concurrency=1)
+def index_resume(student_id, path):
+    """Indexes the resume at `path` (relative to static/) for a student.
+
+    Does nothing if the student has uploaded another resume in the meantime.
+    """
+    full_path = os.path.join(current_app.root_path, 'static', path)
+    if not os.path.exists(full_path):
+        return
+    resume_hash = file_hash(full_path)
+
+    with db.get_cursor(read_only=True) as cursor:
+        cursor.execute("SELECT file_hash FROM resume_text WHERE file_hash = %s;", (resume_hash,))
+        already_indexed = cursor.fetchone() is not None
+
+    # The slow part (reading the PDF) runs outside the transaction.
+    if not already_indexed:
+        content = normalise_text(extract_pdf_text(full_path))
+        terms = {term: weight for term, weight in term_frequencies({'resume': content}).items()
+                 if len(term) <= MAX_TERM_LENGTH}
+
+    with db.transaction() as cursor:
+        if not already_indexed:
+            cursor.execute("INSERT IGNORE INTO resume_text (file_hash, content) VALUES (%s, %s);",
+                           (resume_hash, content))
+            if cursor.rowcount:
+                cursor.executemany("INSERT INTO resume_term (term, file_hash, weight) VALUES (%s, %s, %s);",
+                                   [(term, resume_hash, weight) for term, weight in terms.items()])
+        cursor.execute("UPDATE student SET resume_hash = %s WHERE student_id = %s AND resume_path = %s;",
+                       (resume_hash, student_id, path))
+        linked = cursor.rowcount
+
+    if linked:
+        candidate_ranking.score_student_applications(student_id)
+
+def schedule_indexing(student_id, path):
+    """Queues the indexing of a newly uploaded resume.
+
+    A resume that can't be queued is simply left unindexed until
+    `index-resumes` is run, so errors are logged rather than raised.
+    """
+    if not path:
+        return
+    try:
+        jobs.enqueue('index_resume', student_id=student_id, path=path)
+    except Exception as e:
+        print(f"Error scheduling resume indexing: {e}")
+
+def resume_filter_sql(skills):
+    """Builds a filter keeping the students whose resume mentions every skill.
+
+    Args:
+        skills (str): Free text, e.g. "python, sql".
+
+    Returns:
+        tuple: An SQL condition on `s.resume_hash` (for a query where `s` is the
+        student table) and its parameters, or `(None, ())` if `skills` has no
+        searchable terms.
+    """
+    terms = list(dict.fromkeys(tokenize(skills)))
+    if not terms:
+        return None, ()
+    condition = ("s.resume_hash IN (SELECT file_hash FROM resume_term WHERE term IN ("
+                 + ", ".join(["%s"] * len(terms)) + ") GROUP BY file_hash HAVING COUNT(*) = %s)")
+    return condition, tuple(terms) + (len(terms),)
+
+@click.command('index-resumes')
+@with_appcontext
+def index_resumes_command():
+    """Indexes every uploaded resume that hasn't been indexed yet."""
+    with db.get_cursor(read_only=True) as cursor:
+        cursor.execute("SELECT student_id, resume_path FROM student WHERE resume_path IS NOT NULL AND resume_hash IS NULL;")
+        students = cursor.fetchall()
+
+    indexed = 0
+    for student in students:
+        try:
+            index_resume(student['student_id'], student['resume_path'])
+            indexed += 1
+        except Exception as e:
+            click.echo(f"Could not index {student['resume_path']}: {e}", err=True)
+    click.echo(f"Indexed {indexed} of {len(students)} resume(s).")
@@ -0,0 +1,279 @@
+"""Maintains daily aggregate tables for the employer and admin dashboards.
+
+Counting applications, decisions and users for a chart would mean scanning the
+`application` and `users` tables on every dashboard view. Instead, two small
+tables hold one row per day, updated in the same transaction as the writes
+that change them:
+- `application_daily` (per company and day): applications received, and
+  applications accepted or rejected with the total time they took to decide
+  (from `application.created_at` to `application.decided_at`).
+- `user_daily` (per role and day): sign-ups, and distinct users who logged in.
+
+Application writes are wrapped in `tracking()`, which reads what the affected
+applications contribute to the rollups before and after the write and applies
+the difference. The "before" read locks the applications, so it sees their
+latest committed state even in a transaction that already read older data, and
+a concurrent write to them waits until this transaction commits. Because
+decisions are counted on the day they were made, a decision that is changed or
+taken back (status set to Pending again) is corrected on that day, so the
+rollups always equal what an aggregate query over the current rows would
+return.
+
+The dashboards only read the rows of the last `DASHBOARD_DAYS` days, so they
+take the same time however much history there is. If the rollups ever drift
+(e.g. after rows are edited by hand), rebuild them with:
+
+    flask --app run rebuild-rollups
+"""
+import contextlib
+from datetime import date, timedelta
+
+import click
+from flask.cli import with_appcontext
+
+from internlinkApp import db
+
+# Days shown on the dashboards.
+DASHBOARD_DAYS = 30
+
+# Application statuses counted as decisions, and their `application_daily` column.
+DECISION_COLUMNS = {'Accepted': 'accepted', 'Rejected': 'rejected'}
+
+# User roles, in the order shown on the admin dashboard.
+ROLES = ('student', 'employer', 'admin')
+
+def _application_contributions(cursor, application_keys, lock=False):
+    """What the specified applications currently add to `application_daily`.
+
+    Args:
+        cursor: A cursor belonging to the open transaction.
+        application_keys (list): (student_id, internship_id) tuples.
+        lock (bool): Read the applications with a locking read. Under
+            REPEATABLE READ a plain read returns them as of the transaction's
+            first read, which may predate a concurrent commit.
+
+    Returns:
+        dict: (emp_id, day) -> [applications, accepted, rejected, decision_seconds]
+    """
+    contributions = {}
+    if not application_keys:
+        return contributions
+    keys_sql = ", ".join(["(%s, %s)"] * len(application_keys))
+    cursor.execute(f"""
+        SELECT i.company_id, DATE(a.created_at) AS created_day, a.status, DATE(a.decided_at) AS decided_day,
+               TIMESTAMPDIFF(SECOND, a.created_at, a.decided_at) AS decision_seconds
+        FROM application a
+        JOIN internship i ON a.internship_id = i.internship_id
+        WHERE (a.student_id, a.internship_id) IN ({keys_sql})
+        {"FOR UPDATE OF a" if lock else ""};
+    """, tuple(value for key in application_keys for value in key))
+    for row in cursor.fetchall():
+        contributions.setdefault((row['company_id'], row['created_day']), [0, 0, 0, 0])[0] += 1
+        if row['decided_day'] is not None and row['status'] in DECISION_COLUMNS:
+            totals = contributions.setdefault((row['company_id'], row['decided_day']), [0, 0, 0, 0])
+            totals[1 if row['status'] == 'Accepted' else 2] += 1
+            totals[3] += max(row['decision_seconds'] or 0, 0)
+    return contributions
+
+def _deltas(before, after):
+    """The `application_daily` changes turning the `before` contributions into
+    the `after` ones.
+
+    Returns:
+        list: (emp_id, day, applications, accepted, rejected, decision_seconds)
+        tuples, for the (emp_id, day) pairs that changed.
+    """
+    changes = []
+    for key in before.keys() | after.keys():
+        old = before.get(key, [0, 0, 0, 0])
+        new = after.get(key, [0, 0, 0, 0])
+        delta = [new_value - old_value for old_value, new_value in zip(old, new)]
+        if any(delta):
+            changes.append((*key, *delta))
+    return changes
+
+@contextlib.contextmanager
+def tracking(cursor, application_keys, inserting=False):
+    """Keeps `application_daily` up to date with the writes made in the block.
+
+    Use it around the statements that insert or update the specified
+    applications, inside their transaction:
+    ```
+    >>> with rollups.tracking(cursor, [(student_id, internship_id)]):
+    >>>     cursor.execute("UPDATE application SET status = ...")
+    ```
+
+    Args:
+        cursor: A cursor belonging to the open transaction.
+        application_keys (list): (student_id, internship_id) tuples of the
+            applications written in the block.
+        inserting (bool): The block inserts these applications, so they
+            contribute nothing before it (and aren't read, which would only
+            take gap locks).
+    """
+    before = {} if inserting else _application_contributions(cursor, application_keys, lock=True)
+    yield
+    # The block's own writes are visible to a plain read in the same transaction.
+    after = _application_contributions(cursor, application_keys)
+
+    changes = _deltas(before, after)
+    if changes:
+        cursor.executemany("""
+            INSERT INTO application_daily (emp_id, day, applications, accepted, rejected, decision_seconds)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE applications = applications + VALUES(applications),
+                                    accepted = accepted + VALUES(accepted),
+                                    rejected = rejected + VALUES(rejected),
+                                    decision_seconds = decision_seconds + VALUES(decision_seconds);
+        """, changes)
+
+def record_signups(cursor, role, count=1):
+    """Counts new accounts in today's `user_daily` row for `role`."""
+    cursor.execute("""
+        INSERT INTO user_daily (day, role, signups) VALUES (CURRENT_DATE(), %s, %s)
+        ON DUPLICATE KEY UPDATE signups = signups + VALUES(signups);
+    """, (role, count))
+
+def record_login(cursor, user_id, role):
+    """Counts a user as active today, unless they already logged in today."""
+    cursor.execute("""
+        UPDATE users SET last_login_at = NOW()
+        WHERE user_id = %s AND (last_login_at IS NULL OR last_login_at < CURRENT_DATE());
+    """, (user_id,))
+    if cursor.rowcount:
+        cursor.execute("""
+            INSERT INTO user_daily (day, role, active_users) VALUES (CURRENT_DATE(), %s, 1)
+            ON DUPLICATE KEY UPDATE active_users = active_users + 1;
+        """, (role,))
+
+def _last_days(days):
+    today = date.today()
+    return [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+
+def _application_series(rows, days):
+    """Fills in the days without a row, and adds the totals over all days."""
+    by_day = {row['day']: row for row in rows}
+    series = []
+    for day in _last_days(days):
+        row = by_day.get(day, {})
+        series.append({'day': day, 'applications': int(row.get('applications') or 0),
+                       'accepted': int(row.get('accepted') or 0), 'rejected': int(row.get('rejected') or 0),
+                       'decision_seconds': int(row.get('decision_seconds') or 0)})
+
+    totals = {column: sum(entry[column] for entry in series)
+              for column in ('applications', 'accepted', 'rejected', 'decision_seconds')}
+    decisions = totals['accepted'] + totals['rejected']
+    totals['acceptance_rate'] = totals['accepted'] / decisions if decisions else None
+    totals['avg_decision_days'] = totals['decision_seconds'] / decisions / 86400 if decisions else None
+    totals['peak_applications'] = max(entry['applications'] for entry in series)
+    return {'days': series, 'totals': totals}
+
+def employer_dashboard(emp_id, days=DASHBOARD_DAYS):
+    """Gets a company's application statistics for the last `days` days.
+
+    Returns:
+        dict: 'days' (one dict per day, oldest first, with 'applications',
+        'accepted', 'rejected' and 'decision_seconds') and 'totals' (the same
+        summed, plus 'acceptance_rate', 'avg_decision_days' and
+        'peak_applications').
+    """
+    with db.get_cursor(read_only=True) as cursor:
+        cursor.execute("""
+            SELECT day, applications, accepted, rejected, decision_seconds
+            FROM application_daily
+            WHERE emp_id = %s AND day > CURRENT_DATE() - INTERVAL %s DAY;
+        """, (emp_id, days))
+        return _application_series(cursor.fetchall(), days)
+
+def admin_dashboard(days=DASHBOARD_DAYS):
+    """Gets site-wide application and user statistics for the last `days` days.
+
+    Returns:
+        dict: Like `employer_dashboard()` for all companies, plus 'users': one
+        dict per day with 'signups' and 'active' (role -> count), and
+        'user_totals' with the same per role over all days ('active' is the
+        sum of the daily active users).
+    """
+    with db.get_cursor(read_only=True) as cursor:
+        cursor.execute("""
+            SELECT day, SUM(applications) AS applications, SUM(accepted) AS accepted, SUM(rejected) AS rejected,
+                   SUM(decision_seconds) AS decision_seconds
+            FROM application_daily
+            WHERE day > CURRENT_DATE() - INTERVAL %s DAY
+            GROUP BY day;
+        """, (days,))
+        dashboard = _application_series(cursor.fetchall(), days)
+
+        cursor.execute("""
+            SELECT day, role, signups, active_users FROM user_daily
+            WHERE day > CURRENT_DATE() - INTERVAL %s DAY;
+        """, (days,))
+        user_rows = cursor.fetchall()
+
+    users = {day: {'day': day, 'signups': dict.fromkeys(ROLES, 0), 'active': dict.fromkeys(ROLES, 0)}
+             for day in _last_days(days)}
+    for row in user_rows:
+        if row['day'] in users:
+            users[row['day']]['signups'][row['role']] = row['signups']
+            users[row['day']]['active'][row['role']] = row['active_users']
+    dashboard['users'] = list(users.values())
+    dashboard['user_totals'] = {
+        'signups': {role: sum(day['signups'][role] for day in dashboard['users']) for role in ROLES},
+        'active': {role: sum(day['active'][role] for day in dashboard['users']) for role in ROLES},
+    }
+    dashboard['peak_active_users'] = max(sum(day['active'].values()) for day in dashboard['users'])
+    return dashboard
+
+def rebuild_rollups(cursor):
+    """Recomputes `application_daily` from the live and archived applications,
+    and the sign-ups in `user_daily` from `users.created_at`. Daily active users
+    can't be recomputed, so they are kept.
+
+    Args:
+        cursor: A cursor belonging to an open transaction.
+
+    Returns:
+        int: Number of `application_daily` rows written.
+    """
+    cursor.execute("DELETE FROM application_daily;")
+    cursor.execute("""
+        INSERT INTO application_daily (emp_id, day, applications, accepted, rejected, decision_seconds)
+        SELECT emp_id, day, SUM(applications), SUM(accepted), SUM(rejected), SUM(decision_seconds)
+        FROM (
+            SELECT i.company_id AS emp_id, DATE(a.created_at) AS day, 1 AS applications, 0 AS accepted,
+                   0 AS rejected, 0 AS decision_seconds
+            FROM application a JOIN internship i ON a.internship_id = i.internship_id
+            UNION ALL
+            SELECT i.company_id, DATE(a.decided_at), 0, a.status = 'Accepted', a.status = 'Rejected',
+                   GREATEST(TIMESTAMPDIFF(SECOND, a.created_at, a.decided_at), 0)
+            FROM application a JOIN internship i ON a.internship_id = i.internship_id
+            WHERE a.decided_at IS NOT NULL AND a.status <> 'Pending'
+            UNION ALL
+            SELECT i.company_id, DATE(a.created_at), 1, 0, 0, 0
+            FROM application_archive a JOIN internship_archive i ON a.internship_id = i.internship_id
+            WHERE a.created_at IS NOT NULL
+            UNION ALL
+            SELECT i.company_id, DATE(a.decided_at), 0, a.status = 'Accepted', a.status = 'Rejected',
+                   GREATEST(TIMESTAMPDIFF(SECOND, a.created_at, a.decided_at), 0)
+            FROM application_archive a JOIN internship_archive i ON a.internship_id = i.internship_id
+            WHERE a.decided_at IS NOT NULL AND a.status <> 'Pending'
+        ) contributions
+        GROUP BY emp_id, day;
+    """)
+    written = cursor.rowcount
+
+    cursor.execute("UPDATE user_daily SET signups = 0;")
+    cursor.execute("""
+        INSERT INTO user_daily (day, role, signups)
+        SELECT DATE(created_at), role, COUNT(*) FROM users GROUP BY DATE(created_at), role
+        ON DUPLICATE KEY UPDATE signups = VALUES(signups);
+    """)
+    return written
+
+@click.command('rebuild-rollups')
+@with_appcontext
+def rebuild_rollups_command():
+    """Rebuilds the daily dashboard statistics from the application and user tables."""
+    with db.transaction() as cursor:
+        written = rebuild_rollups(cursor)
+    click.echo(f"Rebuilt {written} daily application statistics row(s).")
@@ -8,16 +8,41 @@ Filling up internship applications.
 Monitoring the progress of applications that have been filed. 
 """
 
+import contextlib
+import hashlib
 import os
-from flask import redirect, render_template, session, url_for, request, flash
+from flask import Blueprint, current_app, make_response, redirect, render_template, session, url_for, request, flash
 from datetime import datetime
 from werkzeug.utils import secure_filename
 
-from internlinkApp import app, db
+from internlinkApp import (application_counts, archive, cache, candidate_ranking, db, internship_catalog, jobs,
+                           live_updates, recommendations, repositories, resume_index, rollups)
 from internlinkApp.user import ALLOWED_RESUME_EXTENSIONS, allowed_file
 
+bp = Blueprint('student', __name__)
+
+# Seconds a user's unread notifications are cached. Notifications delivered by another process show up within this time.
+UNREAD_NOTIFICATIONS_TTL = 30
+
+# An internship with its company details, as shown on its details page (the internship catalogue keeps the same
+# columns for open internships).
+INTERNSHIP_DETAILS_QUERY = """
+    SELECT i.*, e.company_name, e.company_description, e.website, e.logo_path,
+           e.updated_at AS company_updated_at
+    FROM internship i
+    JOIN employer e ON i.company_id = e.emp_id
+    WHERE i.internship_id = %s;
+"""
+
+# A user's 20 latest unread notifications.
+UNREAD_NOTIFICATIONS_QUERY = """
+    SELECT notification_id, message, created_at FROM notification
+    WHERE user_id = %s AND read_at IS NULL
+    ORDER BY notification_id DESC LIMIT 20;
+"""
+
 # Student Home Route
-@app.route('/student/home')
+@bp.route('/student/home')
 def student_home():
     
     """
@@ -30,14 +55,30 @@ def student_home():
     """
 
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role']!='student':
         return render_template('access_denied.html'), 403
 
-    return render_template('student_home.html')
+    summary = None
+    student_id = None
+    try:
+        student_id = get_student_id(session['user_id'])
+        if student_id:
+            summary = get_application_summary(student_id)
+    except Exception as e:
+        print(f"Error fetching application summary: {e}")
+
+    recommended = []
+    if student_id:
+        try:
+            recommended = get_recommended_internships(student_id)
+        except Exception as e:
+            print(f"Error fetching internship recommendations: {e}")
+
+    return render_template('student_home.html', summary=summary, recommended=recommended)
 
 #Internship Route
-@app.route('/internships', methods=['GET'])
+@bp.route('/internships', methods=['GET'])
 def browse_internships():
     """
      Endpoint for searching and sorting internships.
@@ -45,75 +86,36 @@ def browse_internships():
     enables students to browse and filter a list of available internships based on a number of parameters, including category, location, duration, and pay
     """
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role'] != 'student':
         return render_template('access_denied.html'), 403
 
-    internships = []
     category_filter = request.args.get('category')
     location_filter = request.args.get('location')
     duration_filter = request.args.get('duration')
     stipend_filter = request.args.get('stipend')
 
-    categories = ["Software", "Marketing", "Research", "Design", "Data", "Engineering", "Other"]
-
     try:
-        with db.get_cursor() as cursor:
-            cursor.execute("SELECT DISTINCT location FROM internship ORDER BY location;")
-            locations = [loc['location'] for loc in cursor.fetchall()]
-
-            cursor.execute("SELECT DISTINCT duration FROM internship ORDER by duration;")
-            durations = [dur['duration'] for dur in cursor.fetchall()]
-
-            cursor.execute("SELECT DISTINCT stipend FROM internship ORDER by stipend;")
-            stipends = [stip['stipend'] for stip in cursor.fetchall()]
-
-            query = """
-                SELECT i.internship_id, i.title, i.description, i.location, i.duration,
-                       i.skills_required, i.deadline, i.stipend, i.number_of_opening,
-                       e.company_name, e.logo_path
-                FROM internship i
-                JOIN employer e ON i.company_id = e.emp_id
-                WHERE i.deadline >= CURRENT_DATE()
-            """
-            params = []
-
-            if category_filter and category_filter != 'all': 
-                query += " AND (i.title LIKE %s OR i.skills_required LIKE %s OR i.description LIKE %s)"
-                params.extend([f"%{category_filter}%", f"%{category_filter}%", f"%{category_filter}%"])
-            if location_filter and location_filter != 'all':
-                query += " AND i.location = %s"
-                params.append(location_filter)
-            if duration_filter and duration_filter != 'all':
-                query += " AND i.duration = %s"
-                params.append(duration_filter)
-            if stipend_filter and stipend_filter != 'all':
-                query += " AND i.stipend = %s"
-                params.append(stipend_filter)
-
-            query += " ORDER BY i.deadline ASC;"
-            cursor.execute(query, tuple(params))
-            internships = cursor.fetchall()
-
+        # Answered from the in-memory catalogue of open internships (see internship_catalog.py).
+        catalog = internship_catalog.search(category_filter, location_filter, duration_filter, stipend_filter)
     except Exception as e:
         print(f"Error fetching internships or filter options: {e}")
         flash("An error occurred while loading the internships. Please try again later.", "danger")
-        return redirect(url_for('student_home'))
-
+        return redirect(url_for('student.student_home'))
 
     return render_template('browse_internships.html',
-                           internships=internships,
-                           categories=categories,
-                           locations=locations,
-                           durations=durations,
-                           stipends=stipends,
+                           internships=catalog['internships'],
+                           categories=internship_catalog.CATEGORIES,
+                           locations=catalog['locations'],
+                           durations=catalog['durations'],
+                           stipends=catalog['stipends'],
                            selected_category=category_filter,
                            selected_location=location_filter,
                            selected_duration=duration_filter,
                            selected_stipend=stipend_filter)
 
 # Fetching Internship Route
-@app.route('/internship/<int:internship_id>')
+@bp.route('/internship/<int:internship_id>')
 def view_internship_details(internship_id):
     """
     Endpoint to view the information of a certain internship.
@@ -123,33 +125,104 @@ def view_internship_details(internship_id):
     Returns: "" or a redirect to the rendered internship details page.
     """
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role'] != 'student': 
         return render_template('access_denied.html'), 403
 
-    internship_details = None
-    try:
-        with db.get_cursor() as cursor:
-            query = """
-                SELECT i.*, e.company_name, e.company_description, e.website, e.logo_path
-                FROM internship i
-                JOIN employer e ON i.company_id = e.emp_id
-                WHERE i.internship_id = %s;
-            """
-            cursor.execute(query, (internship_id,))
-            internship_details = cursor.fetchone()
+    # A page rendered while flash messages are waiting would show them to every later visitor, so skip the cache.
+    use_cache = '_flashes' not in session
+    cache_key = cache.internship_page_key(internship_id)
+    cached_page = cache.get(cache_key) if use_cache else None
+
+    if cached_page is not None:
+        etag, page = cached_page
+    else:
+        since = cache.generation()
+        internship_details = None
+        changed = False
+        try:
+            # Open internships come from the in-memory catalogue, so a page cache miss doesn't tie this worker up
+            # waiting for MySQL. Closed internships (and ones added since the last catalogue sync) are queried.
+            if current_app.config.get('CATALOG_DETAILS', True):
+                internship_details = internship_catalog.get(internship_id)
+                # The catalogue of this process may not have synced the change that invalidated the page yet.
+                if internship_details is not None and details_changed_recently(internship_details,
+                                                                               internship_catalog.SYNC_INTERVAL):
+                    internship_details, changed = None, True
+            if internship_details is None:
+                with db.primary_reads() if changed else contextlib.nullcontext():
+                    with db.get_cursor(read_only=True) as cursor:
+                        cursor.execute(INTERNSHIP_DETAILS_QUERY, (internship_id,))
+                        internship_details = cursor.fetchone()
 
-        if not internship_details:
-            return render_template('error.html', error_message="Internship not found."), 404
+            if not internship_details:
+                return render_template('error.html', error_message="Internship not found."), 404
 
-    except Exception as e:
-        print(f"Error fetching internship details: {e}")
-        return render_template('error.html', error_message="Could not load internship details."), 500
+        except Exception as e:
+            print(f"Error fetching internship details: {e}")
+            return render_template('error.html', error_message="Could not load internship details."), 500
+
+        etag, page = render_internship_details(internship_details, since if use_cache else None)
+
+    return internship_details_response(etag, page)
+
+def details_changed_recently(internship_details, within=None):
+    """
+    Checks whether an internship or its company details were invalidated in the last `within` seconds (default: the
+    replica lag allowance, see `cache.recently_invalidated()`).
+
+    Args: internship_details (dict): The internship row, including `company_id`.
+
+    Returns: bool: True if data read from a replica or the catalogue may predate the change.
+    """
+    return cache.recently_invalidated([cache.internship_tag(internship_details['internship_id']),
+                                       cache.company_tag(internship_details['company_id'])], within=within)
+
+def render_internship_details(internship_details, since=None):
+    """
+    Renders an internship details page and caches it.
+
+    Args: internship_details (dict): The internship row with its company details (see `INTERNSHIP_DETAILS_QUERY`).
+          since: The `cache.generation()` taken before reading the row, or None to skip caching the page.
+
+    Returns: tuple: The page's ETag and HTML.
+    """
+    etag = internship_details_etag(internship_details)
+    page = render_template('internship_details.html', internship=internship_details)
+    if since is not None:
+        # Applications don't change the page, so it is tagged with the company's details rather than the employer.
+        cache.put(cache.internship_page_key(internship_details['internship_id']), (etag, page),
+                  tags=[cache.internship_tag(internship_details['internship_id']),
+                        cache.company_tag(internship_details['company_id'])],
+                  since=since)
+    return etag, page
+
+def internship_details_response(etag, page):
+    """
+    Builds the response for an internship details page, answering 304 Not Modified if the browser has it already.
 
-    return render_template('internship_details.html', internship=internship_details)
+    Returns: Response: The response.
+    """
+    response = make_response(page)
+    response.set_etag(etag)
+    # Browsers may keep the page, but must check with us (If-None-Match) before reusing it.
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def internship_details_etag(internship_details):
+    """
+    Builds the ETag of an internship details page from the row versions of the internship and its company.
+
+    Args: internship_details (dict): The internship row, including `updated_at` and `company_updated_at`.
+
+    Returns: str: The ETag value.
+    """
+    version = f"{internship_details['internship_id']}:{internship_details['updated_at']}:{internship_details['company_updated_at']}"
+    return hashlib.sha1(version.encode()).hexdigest()
 
 #Applying Internship Route
-@app.route('/internship/<int:internship_id>/apply', methods=['GET', 'POST'])
+@bp.route('/internship/<int:internship_id>/apply', methods=['GET', 'POST'])
 def apply_for_internship(internship_id):
     """
     endpoint where students can submit internship applications.
@@ -161,7 +234,7 @@ def apply_for_internship(internship_id):
     Returns: str: A redirect or the rendered application page.
     """
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role'] != 'student':
         return render_template('access_denied.html'), 403
 
@@ -172,12 +245,12 @@ def apply_for_internship(internship_id):
     form_errors = {}
     
     try:
-        with db.get_cursor() as cursor:
+        with db.get_cursor(read_only=True) as cursor:
             cursor.execute("SELECT student_id FROM student WHERE user_id = %s;", (user_id,))
             student_data = cursor.fetchone()
             if not student_data:
                 flash("Your student profile is incomplete. Please update your profile before applying for internships.", "warning")
-                return redirect(url_for('profile'))
+                return redirect(url_for('user.profile'))
             
             student_id = student_data['student_id']
 
@@ -188,7 +261,7 @@ def apply_for_internship(internship_id):
                 flash("You have already applied for this internship.", "info")
 
             cursor.execute("""
-                SELECT i.internship_id, i.title, i.description, i.location, i.duration, i.deadline, i.stipend,
+                SELECT i.internship_id, i.company_id, i.title, i.description, i.location, i.duration, i.deadline, i.stipend,
                        e.company_name
                 FROM internship i
                 JOIN employer e ON i.company_id = e.emp_id
@@ -208,7 +281,7 @@ def apply_for_internship(internship_id):
             student_profile = cursor.fetchone()
             if not student_profile:
                  flash("Your student profile details could not be loaded. Please ensure your profile is complete.", "warning")
-                 return redirect(url_for('profile'))
+                 return redirect(url_for('user.profile'))
 
     except Exception as e:
         print(f"Error loading application page: {e}")
@@ -221,25 +294,24 @@ def apply_for_internship(internship_id):
 
         current_resume_path = student_profile['resume_path']
         new_resume_path = current_resume_path
+        # A new upload is deleted again if the application isn't saved, so it doesn't pile up unreferenced.
+        saved_resume_path = None
 
         if resume_file and resume_file.filename != '':
             if not allowed_file(resume_file.filename, ALLOWED_RESUME_EXTENSIONS):
                 form_errors['resume'] = 'Resume must be a PDF file.'
             else:
-                upload_folder = os.path.join(app.root_path, 'static', 'uploads')
+                upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
                 if not os.path.exists(upload_folder):
                     os.makedirs(upload_folder)
                 
-                if current_resume_path and os.path.exists(os.path.join(app.root_path, 'static', current_resume_path)):
-                    os.remove(os.path.join(app.root_path, 'static', current_resume_path))
 
                 filename = secure_filename(f"resume_{user_id}_{internship_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf")
                 resume_file.save(os.path.join(upload_folder, filename))
                 new_resume_path = 'uploads/' + filename
+                saved_resume_path = new_resume_path
         elif replace_resume and not resume_file:
              new_resume_path = None
-             if current_resume_path and os.path.exists(os.path.join(app.root_path, 'static', current_resume_path)):
-                 os.remove(os.path.join(app.root_path, 'static', current_resume_path))
         elif not current_resume_path and not resume_file:
             form_errors['resume'] = 'A resume is required to apply for an internship.'
 
@@ -253,20 +325,42 @@ def apply_for_internship(internship_id):
                                 form_errors=form_errors)
         else:
             try:
-                with db.get_cursor() as cursor:
+                with db.transaction() as cursor:
                     if new_resume_path != current_resume_path:
-                        cursor.execute("UPDATE student SET resume_path = %s WHERE user_id = %s;",
+                        cursor.execute("UPDATE student SET resume_path = %s, resume_hash = NULL WHERE user_id = %s;",
                                     (new_resume_path, user_id))
 
-                    cursor.execute('''
-                        INSERT INTO application (student_id, internship_id, status, cover_letter, feedback)
-                        VALUES (%s, %s, %s, %s, %s);
-                    ''', (student_id, internship_id, 'Pending', cover_letter, None))
+                    with rollups.tracking(cursor, [(student_id, internship_id)], inserting=True):
+                        cursor.execute('''
+                            INSERT INTO application (student_id, internship_id, status, cover_letter, feedback)
+                            VALUES (%s, %s, %s, %s, %s);
+                        ''', (student_id, internship_id, 'Pending', cover_letter, None))
+                    application_counts.record_new_application(cursor, internship_id)
+                    candidate_ranking.score_applications(cursor, internship_id, student_ids=[student_id])
+                # The student's profile points at the new resume from here on.
+                saved_resume_path = None
+
+                cache.invalidate_tags(cache.student_tag(student_id), cache.employer_tag(internship_details['company_id']))
+
+                # The old resume is only deleted (in the background) once the database no longer points at it.
+                if current_resume_path and new_resume_path != current_resume_path:
+                    jobs.enqueue('delete_upload', path=current_resume_path)
+                if new_resume_path != current_resume_path:
+                    resume_index.schedule_indexing(student_id, new_resume_path)
+
+                event = {'student_id': student_id, 'internship_id': internship_id, 'status': 'Pending',
+                         'internship_title': internship_details['title']}
+                live_updates.publish(live_updates.employer_channel(internship_details['company_id']), 'application_created',
+                                     dict(event, message=f"New application from {student_profile['full_name']} for {internship_details['title']}."))
+                live_updates.publish(live_updates.student_channel(student_id), 'application_created',
+                                     dict(event, message=f"Your application for {internship_details['title']} was submitted."))
                 
                 flash("Application submitted successfully! You can track its status in 'My Applications'.", 'success')
-                return redirect(url_for('my_applications'))
+                return redirect(url_for('student.my_applications'))
             except Exception as e:
                 print(f"Error submitting application: {e}")
+                if saved_resume_path:
+                    jobs.enqueue('delete_upload', path=saved_resume_path)
                 flash("An error occurred while submitting your application. Please try again.", 'danger')
                 return render_template('apply_internship.html',
                                     internship=internship_details,
@@ -281,52 +375,178 @@ def apply_for_internship(internship_id):
                         form_errors=form_errors)
 
 # My application route
-@app.route('/my_applications', methods=['GET'])
+@bp.route('/my_applications', methods=['GET'])
 def my_applications():
     """
     endpoint where students can monitor the applications they have submitted.
 
     searches the database for every application linked to the student who is currently logged in, including information from the employer and internship tables.
+    With `?history=1`, the student's archived applications (see archive.py) are listed as well.
 
     Returns: str: The page that was displayed and showed the apps list. 
     """
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
     elif session['role'] != 'student':
         return render_template('access_denied.html'), 403
 
     user_id = session['user_id']
+    show_history = request.args.get('history') == '1'
     applications = []
+    archived_applications = []
+    unread_notifications = []
 
     try:
-        with db.get_cursor() as cursor:
-            cursor.execute("SELECT student_id FROM student WHERE user_id = %s;",
-                        (user_id,))
-            student_data = cursor.fetchone()
-            if not student_data:
-                flash("Student profile not found. Please ensure your student details are complete.", "warning")
-                return redirect(url_for('profile'))
+        student_id = get_student_id(user_id)
+        if not student_id:
+            flash("Student profile not found. Please ensure your student details are complete.", "warning")
+            return redirect(url_for('user.profile'))
 
-            student_id = student_data['student_id']
-
-            query = """
-                SELECT a.status, a.feedback,
-                       i.title AS internship_title, i.location AS internship_location,
-                       e.company_name AS company_name,
-                       i.internship_id
-                FROM application a
-                JOIN internship i ON a.internship_id = i.internship_id
-                JOIN student s ON a.student_id = s.student_id
-                JOIN employer e ON i.company_id = e.emp_id
-                WHERE s.student_id = %s
-                ORDER BY i.deadline DESC;
-            """
-            cursor.execute(query, (student_id,))
-            applications = cursor.fetchall()
+        applications = get_application_summary(student_id)['applications']
+        unread_notifications = get_unread_notifications(user_id)
+        if show_history:
+            archived_applications = archive.get_archived_applications(student_id)
 
     except Exception as e:
         print(f"Error fetching applications: {e}")
         flash("Could not load your applications. Please try again.", "danger")
         applications = []
 
-    return render_template('my_applications.html', applications=applications)
\ No newline at end of file
+    return render_template('my_applications.html', applications=applications, notifications=unread_notifications,
+                           show_history=show_history, archived_applications=archived_applications)
+
+@cache.cached('unread_notifications', tags=lambda user_id: [cache.user_tag(user_id)], ttl=UNREAD_NOTIFICATIONS_TTL)
+def get_unread_notifications(user_id):
+    """
+    Gets a user's 20 latest unread notifications.
+
+    They are cached for `UNREAD_NOTIFICATIONS_TTL` seconds, or until the user marks them read or new ones are
+    delivered (both invalidate the user's tag).
+
+    Arguments: user_id (int): The logged-in user's ID.
+
+    Returns: list: Notification rows, newest first.
+    """
+    with db.get_cursor(read_only=True) as cursor:
+        cursor.execute(UNREAD_NOTIFICATIONS_QUERY, (user_id,))
+        return cursor.fetchall()
+
+@cache.cached('student_id')
+def get_student_id(user_id):
+    """
+    Looks up the student_id of a user, caching it since it never changes.
+
+    Arguments: user_id (int): The logged-in user's ID.
+
+    Returns: int: The student_id, or None if the user has no student profile.
+    """
+    return repositories.student.id_for_user(user_id)
+
+@cache.cached('application_summary', tags=lambda student_id: [cache.student_tag(student_id)])
+def get_application_summary(student_id):
+    """
+    Gets a student's applications along with their counts by status.
+
+    The summary is built with one query and then kept in the cache until the student applies for something or
+    an employer changes the status of one of their applications (both invalidate the student's tag). It is only
+    computed after a miss, which usually follows one of those changes, so it is read from the primary: a lagging
+    replica could still give the old applications, which would then stay cached.
+
+    Arguments: student_id (int): The student whose applications are summarised.
+
+    Returns: dict: 'applications' (most recent first), 'counts' (status -> number) and 'total'.
+    """
+    with db.primary_reads():
+        return summarise_applications(repositories.application.for_student(student_id))
+
+def summarise_applications(applications):
+    """
+    Counts a student's applications by status.
+
+    Arguments: applications (list): `StudentApplication` rows.
+
+    Returns: dict: The summary cached by `get_application_summary()`.
+    """
+    counts = dict.fromkeys(application_counts.STATUS_COUNT_COLUMNS, 0)
+    for application in applications:
+        counts[application.status] += 1
+    return {'applications': applications, 'counts': counts, 'total': len(applications)}
+
+def get_recommended_internships(student_id, limit=5):
+    """
+    Gets the open internships that best match a student's course and past applications.
+
+    Arguments: student_id (int): The student to recommend internships to.
+               limit (int): How many internships to return.
+
+    Returns: list: Internship rows (with company_name), best match first.
+    """
+    matches = recommendations.recommend_for_student(student_id, limit=limit)
+    if not matches:
+        return []
+
+    internship_ids = [internship_id for internship_id, score in matches]
+    with db.get_cursor(read_only=True) as cursor:
+        cursor.execute("""
+            SELECT i.internship_id, i.title, i.location, i.deadline, e.company_name
+            FROM internship i
+            JOIN employer e ON i.company_id = e.emp_id
+            WHERE i.internship_id IN (""" + ", ".join(["%s"] * len(internship_ids)) + ");",
+            tuple(internship_ids))
+        rows = {row['internship_id']: row for row in cursor.fetchall()}
+    return [rows[internship_id] for internship_id in internship_ids if internship_id in rows]
+
+# Notifications route
+@bp.route('/notifications/mark_read', methods=['POST'])
+def mark_notifications_read():
+    """
+    endpoint where students dismiss their unread application notifications.
+
+    The form sends `up_to`, the newest notification_id on the page, so notifications delivered after the page was
+    shown stay unread.
+
+    Returns: str: A redirect to the My Applications page.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'student':
+        return render_template('access_denied.html'), 403
+
+    up_to = request.form.get('up_to', type=int)
+    if up_to is None:
+        return redirect(url_for('student.my_applications'))
+
+    try:
+        with db.get_cursor() as cursor:
+            cursor.execute("""
+                UPDATE notification SET read_at = NOW()
+                WHERE user_id = %s AND read_at IS NULL AND notification_id <= %s;
+            """, (session['user_id'], up_to))
+        cache.invalidate_tags(cache.user_tag(session['user_id']))
+    except Exception as e:
+        print(f"Error marking notifications as read: {e}")
+        flash("Could not update your notifications. Please try again.", "danger")
+
+    return redirect(url_for('student.my_applications'))
+
+# Live updates route
+@bp.route('/student/live', methods=['GET'])
+def student_live_updates():
+    """
+    Server-Sent Events endpoint pushing changes to the logged-in student's applications as they happen.
+
+    Returns: Response: The event stream.
+    """
+    if 'loggedin' not in session:
+        return redirect(url_for('user.login'))
+    elif session['role'] != 'student':
+        return render_template('access_denied.html'), 403
+
+    with db.get_cursor(read_only=True) as cursor:
+        cursor.execute("SELECT student_id FROM student WHERE user_id = %s;", (session['user_id'],))
+        student_data = cursor.fetchone()
+    if not student_data:
+        return render_template('access_denied.html'), 403
+
+    return live_updates.stream(live_updates.student_channel(student_data['student_id']),
+                               request.headers.get('Last-Event-ID'))
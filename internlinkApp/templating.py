@@ -0,0 +1,160 @@
+"""Speeds up and measures template rendering.
+
+Bytecode cache
+--------------
+Jinja compiles every template to Python code the first time a worker process
+uses it. With `TEMPLATE_BYTECODE_CACHE` on (the default), the compiled code is
+stored in `TEMPLATE_CACHE_DIR` (default: instance/jinja_cache), so other worker
+processes and restarts load it from disk instead of compiling again. Jinja
+checks each entry against the template source, so edited templates are
+recompiled.
+
+With `TEMPLATE_WARMUP` on, every template is loaded (from the bytecode cache, or
+compiled) while the app is created, so no request pays for it.
+
+Render profiling
+----------------
+With `TEMPLATE_PROFILING` on, the time spent rendering is measured per
+template, per block and per endpoint:
+- Every response gets a `Server-Timing` header with the total time spent in
+  the request, the part spent rendering templates, and the rest (queries and
+  view code), which browser developer tools display.
+- `render_stats()` returns the totals since the process started, shown on the
+  admin Render Profile page.
+Block times include the blocks nested inside them. Profiling adds a little
+overhead, so it is off by default.
+"""
+import os
+import threading
+import time
+
+from flask import Flask, g, has_request_context, request, template_rendered, before_render_template
+from flask.templating import Environment
+from jinja2 import FileSystemBytecodeCache
+
+# Set by `init_templating()`.
+profiling = False
+
+_stats_lock = threading.Lock()
+# name -> [renders, total seconds, slowest seconds]
+_template_stats = {}
+# (template name, block name) -> [renders, total seconds, slowest seconds]
+_block_stats = {}
+# endpoint -> [requests, total seconds, rendering seconds]
+_endpoint_stats = {}
+
+def init_templating(app: Flask):
+    """Sets up the bytecode cache and profiling for the specified Flask app (see
+    the module docs for the settings read from its configuration).
+
+    Must be called before anything renders a template or touches `app.jinja_env`.
+    """
+    global profiling
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+        cache_dir = app.config.get('TEMPLATE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(cache_dir)}
+
+    profiling = app.config.get('TEMPLATE_PROFILING', False)
+    if profiling:
+        app.jinja_environment = ProfilingEnvironment
+        app.before_request(_start_request_timer)
+        app.after_request(_record_request_time)
+        before_render_template.connect(_start_render_timer, app)
+        template_rendered.connect(_record_render_time, app)
+
+def warm_up(app: Flask):
+    """Loads every template of the specified Flask app if `TEMPLATE_WARMUP` is on.
+
+    Returns:
+        int: The number of templates loaded.
+    """
+    if not app.config.get('TEMPLATE_WARMUP', False):
+        return 0
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+class ProfilingEnvironment(Environment):
+    """Jinja environment whose templates record how long each block takes."""
+    def get_template(self, name, parent=None, globals=None):
+        template = super().get_template(name, parent, globals)
+        # Loaded templates are cached, so each one is only instrumented once.
+        if not getattr(template, '_internlink_profiled', False):
+            template.blocks = {block: _timed_block(template.name, block, render)
+                               for block, render in template.blocks.items()}
+            template._internlink_profiled = True
+        return template
+
+def _timed_block(template_name, block_name, render):
+    def timed_render(context):
+        start = time.perf_counter()
+        try:
+            yield from render(context)
+        finally:
+            _add(_block_stats, (template_name, block_name), time.perf_counter() - start)
+    return timed_render
+
+def _add(stats, key, seconds):
+    with _stats_lock:
+        entry = stats.setdefault(key, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    g.render_seconds = 0.0
+    g.render_starts = []
+
+def _start_render_timer(sender, template, context, **extra):
+    # Templates are also rendered outside requests (e.g. by jobs), where the request timer never started.
+    g.setdefault('render_starts', []).append(time.perf_counter())
+
+def _record_render_time(sender, template, context, **extra):
+    render_starts = g.get('render_starts')
+    if not render_starts:
+        return
+    seconds = time.perf_counter() - render_starts.pop()
+    # Only the outermost render counts towards the request, so templates rendered inside others aren't counted twice.
+    if not render_starts and has_request_context() and 'render_seconds' in g:
+        g.render_seconds += seconds
+    _add(_template_stats, template.name, seconds)
+
+def _record_request_time(response):
+    if 'request_started' not in g:
+        return response
+    total = time.perf_counter() - g.request_started
+    render = g.render_seconds
+    response.headers['Server-Timing'] = (f'total;dur={total * 1000:.1f}, render;dur={render * 1000:.1f}, '
+                                         f'app;desc="Queries and view code";dur={(total - render) * 1000:.1f}')
+    with _stats_lock:
+        entry = _endpoint_stats.setdefault(request.endpoint or request.path, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += total
+        entry[2] += render
+    return response
+
+def render_stats():
+    """Summarises the render profile of this process.
+
+    Returns:
+        dict: 'endpoints' (requests, average total and render time in ms, and
+        the share spent rendering), 'templates' and 'blocks' (renders, average
+        and slowest time in ms), each sorted by total time, highest first.
+    """
+    with _stats_lock:
+        endpoints = [{'endpoint': endpoint, 'requests': count, 'avg_total_ms': total / count * 1000,
+                      'avg_render_ms': render / count * 1000, 'render_share': render / total if total else 0.0}
+                     for endpoint, (count, total, render) in _endpoint_stats.items()]
+        templates = [{'template': name, 'renders': count, 'avg_ms': total / count * 1000, 'max_ms': slowest * 1000,
+                      'total_ms': total * 1000}
+                     for name, (count, total, slowest) in _template_stats.items()]
+        blocks = [{'template': name, 'block': block, 'renders': count, 'avg_ms': total / count * 1000,
+                   'max_ms': slowest * 1000, 'total_ms': total * 1000}
+                  for (name, block), (count, total, slowest) in _block_stats.items()]
+    endpoints.sort(key=lambda row: row['avg_total_ms'] * row['requests'], reverse=True)
+    templates.sort(key=lambda row: row['total_ms'], reverse=True)
+    blocks.sort(key=lambda row: row['total_ms'], reverse=True)
+    return {'endpoints': endpoints, 'templates': templates, 'blocks': blocks}
@@ -12,14 +12,18 @@ import os
 import re
 from datetime import datetime
 
-from flask import redirect, render_template, request, session, url_for, flash
+from flask import Blueprint, current_app, jsonify, redirect, render_template, request, session, url_for, flash
 from flask_bcrypt import Bcrypt
 from markupsafe import Markup
 from werkzeug.utils import secure_filename
 
-from internlinkApp import app, db
+from internlinkApp import (cache, db, internship_catalog, jobs, login_throttle, repositories, resume_index, rollups,
+                           username_filter)
 
-flask_bcrypt = Bcrypt(app)
+bp = Blueprint('user', __name__)
+
+# Bound to the app (and its BCRYPT_LOG_ROUNDS setting) by `create_app()`.
+flask_bcrypt = Bcrypt()
 
 # While registration, this is the default role for user
 DEFAULT_USER_ROLE = 'student'
@@ -28,6 +32,8 @@ DEFAULT_USER_ROLE = 'student'
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 ALLOWED_RESUME_EXTENSIONS = {'pdf'}
 
+USERNAME_TAKEN_ERROR = 'An account already exists with this username.'
+
 def allowed_file(filename, allowed_extensions):
    
     """
@@ -44,6 +50,61 @@ def allowed_file(filename, allowed_extensions):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def validate_username(username):
+    """
+    Checks a new username against InternLink's username rules (not whether it is taken).
+
+    Args:
+        username (str): The username to check.
+
+    Returns:
+        str: An error message, or None if the username is valid.
+    """
+    if not username: return 'Username is required.'
+    elif len(username) < 3: return 'Your username must be at least 3 characters long.'
+    elif len(username) > 50: return 'Your username cannot exceed 50 characters.'
+    elif not re.match(r'^[A-Za-z0-9]+$', username):
+        return 'Your username can only contain letters and numbers.'
+    return None
+
+def validate_email(email):
+    """
+    Checks an email address is present, short enough and well formed.
+
+    Args:
+        email (str): The email address to check.
+
+    Returns:
+        str: An error message, or None if the email address is valid.
+    """
+    if not email: return 'Email address is required.'
+    elif len(email) > 100: return 'Your email address cannot exceed 100 characters.'
+    elif not re.match(r'[^@]+@[^@]+\.[^@]+', email):
+        return 'Invalid email address.'
+    return None
+
+def validate_password(password):
+    """
+    Checks a new password against InternLink's password strength rules.
+
+    Args:
+        password (str): The password to check.
+
+    Returns:
+        str: An error message, or None if the password is strong enough.
+    """
+    if not password: return 'Password is required.'
+    elif len(password) < 8: return 'Password must be at least 8 characters long.'
+    elif not re.search(r'[A-Z]', password):
+        return 'Password must contain at least one uppercase letter.'
+    elif not re.search(r'[a-z]', password):
+        return 'Password must contain at least one lowercase letter.'
+    elif not re.search(r'[0-9]', password):
+        return 'Password must contain at least one digit.'
+    elif not re.search(r'[^A-Za-z0-9]', password):
+        return 'Password must contain at least one special character.'
+    return None
+
 def user_home_url():
 
     """
@@ -58,20 +119,20 @@ def user_home_url():
 
     if 'loggedin' in session:
         role = session.get('role', None)
-        if role=='student': home_endpoint='student_home'
-        elif role=='employer': home_endpoint='employer_home'
-        elif role=='admin': home_endpoint='admin_home'
-        else: home_endpoint = 'logout'
+        if role=='student': home_endpoint='student.student_home'
+        elif role=='employer': home_endpoint='employer.employer_home'
+        elif role=='admin': home_endpoint='admin.admin_home'
+        else: home_endpoint = 'user.logout'
     else:
-        home_endpoint = 'login'
+        home_endpoint = 'user.login'
     return url_for(home_endpoint)
 
-@app.route('/')
+@bp.route('/')
 def root():
 
     return redirect(user_home_url())
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """
     Endpoint for the login page.
@@ -94,6 +155,13 @@ def login():
             error_message="Please enter both username and password."
             return render_template('login.html', username=username, error_message=error_message)
 
+        # Refused before the account is looked up or any password is hashed (see login_throttle.py).
+        retry_after = login_throttle.check(username, request.remote_addr)
+        if retry_after:
+            error_message = f"Too many failed login attempts. Please try again in {(retry_after + 59) // 60} minute(s)."
+            return (render_template('login.html', username=username, error_message=error_message), 429,
+                    {'Retry-After': str(retry_after)})
+
         with db.get_cursor() as cursor:
             cursor.execute('''
                        SELECT user_id, username, password_hash, role, status
@@ -110,21 +178,25 @@ def login():
                 password_hash = account['password_hash']
 
                 if flask_bcrypt.check_password_hash(password_hash, password):
+                    login_throttle.record_success(username)
+                    rollups.record_login(cursor, account['user_id'], account['role'])
                     session['loggedin'] = True
                     session['user_id'] = account['user_id']
                     session['username'] = account['username']
                     session['role'] = account['role']
                     return redirect(user_home_url())
                 else:
+                    login_throttle.record_failure(username, request.remote_addr)
                     password_invalid = True
                     return render_template('login.html', username=username, password_invalid=password_invalid)
             else:
+                login_throttle.record_failure(username, request.remote_addr)
                 username_invalid = True
                 return render_template('login.html', username=username, username_invalid=username_invalid)
 
     return render_template('login.html')
 
-@app.route('/signup', methods=['GET','POST'])
+@bp.route('/signup', methods=['GET','POST'])
 def signup():
     """
     Endpoint for the signup page.
@@ -158,31 +230,13 @@ def signup():
 
     if request.method == 'POST':
         with db.get_cursor() as cursor:
-            cursor.execute('SELECT user_id FROM users WHERE username = %s;', (username,))
-            account_already_exists = cursor.fetchone() is not None
-        
-            if not username: username_error = 'Username is required.'
-            elif account_already_exists: username_error = 'An account already exists with this username.'
-            elif len(username) < 3: username_error = 'Your username must be at least 3 characters long.'
-            elif len(username) > 50: username_error = 'Your username cannot exceed 50 characters.'
-            elif not re.match(r'^[A-Za-z0-9]+$', username):
-                username_error = 'Your username can only contain letters and numbers.'            
-
-            if not email: email_error = 'Email address is required.'
-            elif len(email) > 100: email_error = 'Your email address cannot exceed 100 characters.'
-            elif not re.match(r'[^@]+@[^@]+\.[^@]+', email):
-                email_error = 'Invalid email address.'
-                    
-            if not password: password_error = 'Password is required.'
-            elif len(password) < 8: password_error = 'Password must be at least 8 characters long.'
-            elif not re.search(r'[A-Z]', password):
-                password_error = 'Password must contain at least one uppercase letter.'
-            elif not re.search(r'[a-z]', password):
-                password_error = 'Password must contain at least one lowercase letter.'
-            elif not re.search(r'[0-9]', password):
-                password_error = 'Password must contain at least one digit.'
-            elif not re.search(r'[^A-Za-z0-9]', password):
-                password_error = 'Password must contain at least one special character.'
+            # Only a valid username is looked up, and usually only in the username filter (see username_filter.py).
+            username_error = validate_username(username)
+            if not username_error and username_filter.is_taken(username):
+                username_error = USERNAME_TAKEN_ERROR
+
+            email_error = validate_email(email)
+            password_error = validate_password(password)
             
             if password != confirm_password:
                 confirm_password_error = 'Passwords do not match.'
@@ -227,7 +281,7 @@ def signup():
                 
                 profile_image_path = None
                 if profile_image_file and profile_image_file.filename != '':
-                    upload_folder = os.path.join(app.root_path, 'static', 'uploads')
+                    upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
                     if not os.path.exists(upload_folder): os.makedirs(upload_folder)
                     filename = secure_filename(f"profile_{username}_{datetime.now().strftime('%Y%m%d%H%M%S')}{os.path.splitext(profile_image_file.filename)[1]}")
                     profile_image_file.save(os.path.join(upload_folder, filename))
@@ -235,7 +289,7 @@ def signup():
 
                 resume_path = None
                 if resume_file and resume_file.filename != '':
-                    upload_folder = os.path.join(app.root_path, 'static', 'uploads')
+                    upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
                     if not os.path.exists(upload_folder): os.makedirs(upload_folder)
                     filename = secure_filename(f"resume_{username}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf")
                     resume_file.save(os.path.join(upload_folder, filename))
@@ -248,30 +302,53 @@ def signup():
                                 ''',
                                 (username, full_name, email, password_hash, profile_image_path, DEFAULT_USER_ROLE, 'active'))
                     user_id = cursor.lastrowid
+                    rollups.record_signups(cursor, DEFAULT_USER_ROLE)
 
                     cursor.execute('''
                                 INSERT INTO student (user_id, university, course, resume_path)
                                 VALUES (%s, %s, %s, %s);
                                 ''',
                                 (user_id, university, course, resume_path))
+                    resume_index.schedule_indexing(cursor.lastrowid, resume_path)
+                    cache.invalidate_tags(cache.USERS_TAG)
+                    username_filter.add(username)
                     signup_successful = True
                     return render_template('signup.html', signup_successful=signup_successful)
                 except Exception as e:
                     print(f"Error during signup: {e}")
+                    # Someone else may have taken the username since it was checked (the UNIQUE key refused it).
+                    if repositories.users.id_for_username(username) is not None:
+                        return render_template('signup.html', username=username, email=email, full_name=full_name,
+                                               university=university, course=course, username_error=USERNAME_TAKEN_ERROR)
                     error_message = "An error occurred during registration. Please try again."
                     return render_template('signup.html', username=username, email=email, error_message=error_message)
 
     return render_template('signup.html')
 
-@app.route('/profile', defaults={'user_id': None}, methods=['GET', 'POST'])
-@app.route('/profile/<int:user_id>', methods=['GET', 'POST'])
+@bp.route('/signup/username_available', methods=['GET'])
+def username_available():
+    """
+    Endpoint the signup form calls while a username is being typed, to say straight away whether it can be used.
+
+    Free usernames are usually recognised by the username filter without a database query (see username_filter.py).
+
+    Returns: Response: JSON with 'available' (bool) and a 'message' to show under the field.
+    """
+    username = request.args.get('username', '')
+    error = validate_username(username)
+    if not error and username_filter.is_taken(username):
+        error = USERNAME_TAKEN_ERROR
+    return jsonify(available=error is None, message=error or 'This username is available.')
+
+@bp.route('/profile', defaults={'user_id': None}, methods=['GET', 'POST'])
+@bp.route('/profile/<int:user_id>', methods=['GET', 'POST'])
 def profile(user_id):
     """
     endpoint for the User Profile page.
     manages file management in addition to viewing and modifying user profiles.
     """
     if 'loggedin' not in session:
-         return redirect(url_for('login'))
+         return redirect(url_for('user.login'))
 
     if user_id is None:
         user_id = session['user_id']
@@ -280,21 +357,21 @@ def profile(user_id):
         is_own_profile = (user_id == session['user_id'])
         if session['role'] != 'admin' and not is_own_profile:
             flash("You are not authorized to view this profile.", 'danger')
-            return redirect(url_for('profile'))
+            return redirect(url_for('user.profile'))
 
     role = session['role']
     profile_data = {}
     form_errors = {}
 
     def get_user_profile(user_id, role):
-        with db.get_cursor() as cursor:
+        with db.get_cursor(read_only=True) as cursor:
             cursor.execute("SELECT role FROM users WHERE user_id = %s;", (user_id,))
             user_role_from_db = cursor.fetchone()['role']
 
             if user_role_from_db == 'student' or (user_role_from_db == 'admin' and not is_own_profile):
                 cursor.execute('''
                                 SELECT u.username, u.user_id, u.email, u.full_name, u.profile_image, u.role, u.status,
-                                       s.university, s.course, s.resume_path
+                                       s.student_id, s.university, s.course, s.resume_path
                                 FROM users u
                                 LEFT JOIN student s ON u.user_id = s.user_id
                                 WHERE u.user_id = %s;
@@ -315,7 +392,7 @@ def profile(user_id):
     if request.method == 'POST':
         if not is_own_profile:
             flash("You are not authorized to edit this profile.", 'danger')
-            return redirect(url_for('profile', user_id=user_id))
+            return redirect(url_for('user.profile', user_id=user_id))
 
         full_name = request.form.get('full_name')
         email = request.form.get('email')
@@ -368,25 +445,33 @@ def profile(user_id):
             profile_data = {**current_profile_data, **request.form.to_dict()}
             return render_template('profile.html', profile=profile_data, form_errors=form_errors, is_own_profile=is_own_profile)
 
+        # Old uploads are only deleted (in the background) once the database no longer points at them.
+        replaced_files = []
+        # New uploads are deleted again if the update fails, so they don't pile up unreferenced.
+        saved_files = []
+        new_resume_path = None
+        # The name is shown in the admin user list and the employers' applicant filters.
+        changed_tags = [cache.USERS_TAG]
         try:
-            with db.get_cursor() as cursor:
+            with db.transaction() as cursor:
                 if role == 'employer':
                     new_employer_image_path = None
                     uploaded_file = profile_image_file if profile_image_file and profile_image_file.filename != '' else logo_file
 
                     if uploaded_file and uploaded_file.filename != '':
-                        upload_folder = os.path.join(app.root_path, 'static', 'uploads')
+                        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
                         if not os.path.exists(upload_folder): os.makedirs(upload_folder)
 
-                        if current_profile_image: os.remove(os.path.join(app.root_path, 'static', current_profile_image))
-                        if current_logo_path and current_logo_path != current_profile_image: os.remove(os.path.join(app.root_path, 'static', current_logo_path))
+                        if current_profile_image: replaced_files.append(current_profile_image)
+                        if current_logo_path and current_logo_path != current_profile_image: replaced_files.append(current_logo_path)
 
                         filename = secure_filename(f"employer_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}{os.path.splitext(uploaded_file.filename)[1]}")
                         uploaded_file.save(os.path.join(upload_folder, filename))
                         new_employer_image_path = 'uploads/' + filename
+                        saved_files.append(new_employer_image_path)
                     elif remove_profile_image or remove_logo:
-                        if current_profile_image: os.remove(os.path.join(app.root_path, 'static', current_profile_image))
-                        if current_logo_path and current_logo_path != current_profile_image: os.remove(os.path.join(app.root_path, 'static', current_logo_path))
+                        if current_profile_image: replaced_files.append(current_profile_image)
+                        if current_logo_path and current_logo_path != current_profile_image: replaced_files.append(current_logo_path)
                         new_employer_image_path = None
                     else:
                         new_employer_image_path = current_profile_image if current_profile_image else current_logo_path
@@ -395,6 +480,11 @@ def profile(user_id):
                                    (full_name, new_employer_image_path, user_id))
                     cursor.execute("UPDATE employer SET company_name = %s, company_description = %s, website = %s, logo_path = %s WHERE user_id = %s;",
                                    (company_name, company_description, website, new_employer_image_path, user_id))
+
+                    # The company details are shown on every one of its internship pages.
+                    emp_id = repositories.employer.id_for_user(user_id)
+                    if emp_id is not None:
+                        changed_tags.append(cache.company_tag(emp_id))
                 else:
                     update_user_sql = "UPDATE users SET full_name = %s"
                     user_params = [full_name]
@@ -406,17 +496,18 @@ def profile(user_id):
                     if remove_profile_image:
                         update_user_sql += ", profile_image = NULL"
                         if current_profile_image:
-                            os.remove(os.path.join(app.root_path, 'static', current_profile_image))
+                            replaced_files.append(current_profile_image)
                     elif profile_image_file and profile_image_file.filename != '':
-                        upload_folder = os.path.join(app.root_path, 'static', 'uploads')
+                        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
                         if not os.path.exists(upload_folder): os.makedirs(upload_folder)
                         if current_profile_image:
-                            os.remove(os.path.join(app.root_path, 'static', current_profile_image))
+                            replaced_files.append(current_profile_image)
 
                         filename = secure_filename(f"profile_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}{os.path.splitext(profile_image_file.filename)[1]}")
                         profile_image_file.save(os.path.join(upload_folder, filename))
                         update_user_sql += ", profile_image = %s"
                         user_params.append('uploads/' + filename)
+                        saved_files.append('uploads/' + filename)
 
                     update_user_sql += " WHERE user_id = %s;"
                     user_params.append(user_id)
@@ -426,41 +517,62 @@ def profile(user_id):
                         if remove_resume:
                             resume_path_to_db = None
                             if current_resume_path:
-                                os.remove(os.path.join(app.root_path, 'static', current_resume_path))
+                                replaced_files.append(current_resume_path)
                         elif resume_file and resume_file.filename != '':
-                            upload_folder = os.path.join(app.root_path, 'static', 'uploads')
+                            upload_folder = os.path.join(current_app.root_path, 'static', 'uploads')
                             if not os.path.exists(upload_folder): os.makedirs(upload_folder)
                             if current_resume_path:
-                                os.remove(os.path.join(app.root_path, 'static', current_resume_path))
+                                replaced_files.append(current_resume_path)
 
                             filename = secure_filename(f"resume_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf")
                             resume_file.save(os.path.join(upload_folder, filename))
                             resume_path_to_db = 'uploads/' + filename
+                            saved_files.append(resume_path_to_db)
                         else:
                             resume_path_to_db = current_resume_path
 
+                        if resume_path_to_db != current_resume_path:
+                            # The new resume is linked to its index entry by the `index_resume` job.
+                            cursor.execute("UPDATE student SET resume_hash = NULL WHERE user_id = %s;", (user_id,))
+                            new_resume_path = resume_path_to_db
                         cursor.execute("UPDATE student SET university = %s, course = %s, resume_path = %s WHERE user_id = %s;",
                                        (university, course, resume_path_to_db, user_id))
+            # The database points at the new uploads from here on.
+            saved_files = []
+
+            cache.invalidate_tags(*changed_tags)
+            if role == 'employer':
+                internship_catalog.invalidate()
+            for replaced_file in replaced_files:
+                jobs.enqueue('delete_upload', path=replaced_file)
+            if new_resume_path:
+                resume_index.schedule_indexing(current_profile_data['student_id'], new_resume_path)
+            if (role == 'student' and current_profile_data.get('student_id')
+                    and (university, course) != (current_profile_data['university'], current_profile_data['course'])):
+                # The course and university feed the applicant ranking employers see.
+                jobs.enqueue('score_student_applications', student_id=current_profile_data['student_id'])
 
             flash("Profile updated successfully!", 'success')
-            return redirect(url_for('profile', user_id=user_id))
+            return redirect(url_for('user.profile', user_id=user_id))
 
         except Exception as e:
             print(f"Error updating profile: {e}")
+            for saved_file in saved_files:
+                jobs.enqueue('delete_upload', path=saved_file)
             flash("An unexpected error occurred while updating your profile. Please try again.", 'danger')
-            return redirect(url_for('profile', user_id=user_id))
+            return redirect(url_for('user.profile', user_id=user_id))
 
     profile_data = get_user_profile(user_id, role)
     return render_template('profile.html', profile=profile_data, form_errors={}, is_own_profile=is_own_profile)
 
 
-@app.route('/change_password', methods=['GET', 'POST'])
+@bp.route('/change_password', methods=['GET', 'POST'])
 def change_password():
     """
     This is the end point for changing user password
     """
     if 'loggedin' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('user.login'))
 
     user_id = session['user_id']
     form_errors = {}
@@ -509,7 +621,7 @@ def change_password():
                     cursor.execute('UPDATE users SET password_hash = %s WHERE user_id = %s;',
                                (new_password_hash, user_id))
                 flash("Password changed successfully!", 'success')
-                return redirect(url_for('profile'))
+                return redirect(url_for('user.profile'))
             except Exception as e:
                 print(f"Error changing password: {e}")
                 flash("An error occurred while changing your password. Please try again.", 'danger')
@@ -518,7 +630,7 @@ def change_password():
     return render_template('change_password.html', form_errors={})
 
 # Log out Route
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """Endpoint for logout functionality."""
     session.pop('loggedin', None)
@@ -526,4 +638,4 @@ def logout():
     session.pop('username', None)
     session.pop('role', None)
     flash("You have been logged out.", 'info')
-    return redirect(url_for('login'))
\ No newline at end of file
+    return redirect(url_for('user.login'))
\ No newline at end of file
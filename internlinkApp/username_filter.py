@@ -0,0 +1,188 @@
+"""Answers "is this username taken?" mostly without querying the database.
+
+The signup form checks the username as it is typed (see the
+`user.username_available` endpoint), which would otherwise be one query per
+keystroke. Each process keeps a Bloom filter of every username: a bit array
+in which each name sets a few bits chosen by hashing it. If any of those bits
+is clear the name is definitely not taken, and no query is needed. If they are
+all set the name is probably taken, which is confirmed with a query (about
+`FALSE_POSITIVE_RATE` of free names land here too).
+
+The filter takes about 1.2MB per million usernames. It is built in a
+background thread when the process serves its first request. Until it is
+ready, every check queries the database. Signups in this process are added to
+it straight away, and every `REFRESH_INTERVAL` seconds it loads the accounts
+created since (by other processes, or imported), re-reading the last
+`REFRESH_OVERLAP` accounts in case their user_ids were committed out of order.
+Usernames can't be changed or removed, so nothing else can make it stale.
+
+Because the filter can briefly miss an account created by another process, the
+UNIQUE key on `users.username` stays the final check at signup.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from flask import Flask
+
+from internlinkApp import repositories
+
+# Share of free usernames the filter reports as probably taken.
+FALSE_POSITIVE_RATE = 0.01
+
+# Seconds between loads of the accounts created since the last one.
+REFRESH_INTERVAL = 5
+
+# Accounts before the last one loaded that each refresh reads again.
+REFRESH_OVERLAP = 100
+
+class BloomFilter:
+    """A set of strings that can't list its members, only say that a string is
+    definitely not in it or probably is.
+
+    Args:
+        capacity (int): Number of strings it is sized for. Adding more raises
+            the false positive rate above `false_positive_rate`.
+        false_positive_rate (float): Share of strings not in the set reported
+            as probably in it, at `capacity`.
+    """
+    def __init__(self, capacity, false_positive_rate=FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        # The optimal number of bits and of hash functions for the capacity and error rate.
+        self.size = max(64, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: two 64-bit hashes from one digest give all `hash_count` positions.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + number * second) % self.size for number in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+# Set by `init_username_filter()`.
+enabled = True
+capacity = 1000000
+_app = None
+
+# The filter once built, and the highest user_id loaded into it.
+_filter = None
+_last_user_id = 0
+_last_refresh = 0.0
+# Whether the first build was started, and whether a build is running.
+_started = False
+_building = False
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+def init_username_filter(app: Flask):
+    """Sets up the username filter for the specified Flask app.
+
+    Args:
+        app: The `Flask` application. `USERNAME_FILTER` and
+            `USERNAME_FILTER_CAPACITY` are read from its configuration.
+    """
+    global enabled, capacity, _app, _filter, _last_user_id, _started
+    enabled = app.config.get('USERNAME_FILTER', True)
+    capacity = app.config.get('USERNAME_FILTER_CAPACITY', 1000000)
+    _app = app
+    _filter = None
+    _last_user_id = 0
+    _started = False
+    if enabled:
+        app.before_request(_start_build)
+
+def _normalise(username):
+    # Usernames are compared case-insensitively by the database's collation.
+    return username.lower()
+
+def _start_build():
+    """Starts building the filter in the background, the first time it is
+    called in this process."""
+    global _started
+    if _started:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    _spawn_build()
+
+def _spawn_build():
+    """Starts a thread (re)building the filter, unless one is running."""
+    global _building
+    with _lock:
+        if _building:
+            return
+        _building = True
+    threading.Thread(target=_build, name='internlink-username-filter', daemon=True).start()
+
+def _build():
+    """Loads every username into a new filter with room for at least as many
+    accounts again as there are now (user_ids are used as the count)."""
+    global _filter, _last_user_id, _last_refresh, _started, _building
+    try:
+        with _app.app_context():
+            bloom_filter = BloomFilter(max(capacity, 2 * (repositories.users.latest_user_id() or 0)))
+            last_user_id = 0
+            for row in repositories.users.stream_usernames():
+                bloom_filter.add(_normalise(row.username))
+                last_user_id = row.user_id
+        with _lock:
+            _filter, _last_user_id, _last_refresh = bloom_filter, last_user_id, time.time()
+    except Exception as e:
+        print(f"Error building the username filter: {e}")
+        # Tried again on the next request.
+        _started = _filter is not None
+    finally:
+        with _lock:
+            _building = False
+
+def _refresh():
+    """Loads the accounts created since the last refresh (at most every
+    `REFRESH_INTERVAL` seconds), and rebuilds the filter once it holds more
+    accounts than it was sized for."""
+    global _last_user_id, _last_refresh
+    if time.time() - _last_refresh < REFRESH_INTERVAL or not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        _last_refresh = time.time()
+        for row in repositories.users.stream_usernames(max(_last_user_id - REFRESH_OVERLAP, 0)):
+            _filter.add(_normalise(row.username))
+            _last_user_id = max(_last_user_id, row.user_id)
+        if _last_user_id > _filter.capacity:
+            _spawn_build()
+    except Exception as e:
+        print(f"Error refreshing the username filter: {e}")
+    finally:
+        _refresh_lock.release()
+
+def add(*usernames):
+    """Adds new accounts' usernames to this process's filter."""
+    if _filter is not None:
+        for username in usernames:
+            _filter.add(_normalise(username))
+
+def is_taken(username):
+    """Checks whether an account already uses `username`, querying the database
+    only if the filter can't rule it out.
+
+    Args:
+        username (str): A valid username (see `user.validate_username()`).
+
+    Returns:
+        bool: True if an account with this username exists.
+    """
+    if enabled and _filter is not None:
+        _refresh()
+        if _normalise(username) not in _filter:
+            return False
+    return repositories.users.id_for_username(username) is not None
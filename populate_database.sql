@@ -122,4 +122,10 @@ INSERT INTO `application` (`student_id`, `internship_id`, `status`, `feedback`)
 ((SELECT student_id FROM student WHERE user_id = (SELECT user_id FROM users WHERE username = 'stu_benjamin')), (SELECT internship_id FROM internship WHERE title = 'Bioinformatics Intern' AND company_id = (SELECT emp_id FROM employer WHERE company_name = 'Delta Pharma') LIMIT 1), 'Accepted', 'Your analytical skills are perfect for this role.'),
 ((SELECT student_id FROM student WHERE user_id = (SELECT user_id FROM users WHERE username = 'stu_amelia')), (SELECT internship_id FROM internship WHERE title = 'Content Marketing Intern' AND company_id = (SELECT emp_id FROM employer WHERE company_name = 'Epsilon Marketers') LIMIT 1), 'Pending', NULL),
 ((SELECT student_id FROM student WHERE user_id = (SELECT user_id FROM users WHERE username = 'stu_alexander')), (SELECT internship_id FROM internship WHERE title = 'Campaign Management Intern' AND company_id = (SELECT emp_id FROM employer WHERE company_name = 'Epsilon Marketers') LIMIT 1), 'Pending', NULL),
-((SELECT student_id FROM student WHERE user_id = (SELECT user_id FROM users WHERE username = 'stu_liam')), (SELECT internship_id FROM internship WHERE title = 'Cloud Operations Intern' AND company_id = (SELECT emp_id FROM employer WHERE company_name = 'AlphaCorp Tech') LIMIT 1), 'Pending', NULL);
\ No newline at end of file
+((SELECT student_id FROM student WHERE user_id = (SELECT user_id FROM users WHERE username = 'stu_liam')), (SELECT internship_id FROM internship WHERE title = 'Cloud Operations Intern' AND company_id = (SELECT emp_id FROM employer WHERE company_name = 'AlphaCorp Tech') LIMIT 1), 'Pending', NULL);
+
+-- 6. Initialising the application counters stored on each internship (see internlinkApp/application_counts.py)
+UPDATE `internship` i
+SET i.`pending_count` = (SELECT COUNT(*) FROM `application` a WHERE a.`internship_id` = i.`internship_id` AND a.`status` = 'Pending'),
+    i.`accepted_count` = (SELECT COUNT(*) FROM `application` a WHERE a.`internship_id` = i.`internship_id` AND a.`status` = 'Accepted'),
+    i.`rejected_count` = (SELECT COUNT(*) FROM `application` a WHERE a.`internship_id` = i.`internship_id` AND a.`status` = 'Rejected');
@@ -1,8 +1,9 @@
+from internlinkApp import create_app
 
-from internlinkApp import app
+app = create_app()
 
 # If run.py was actually executed (run), not just imported into another script,
 # then start our Flask app on a local development server. To learn more about
 # how we check for this, refer to https://realpython.com/if-name-main-python/.
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,6 @@
+from internlinkApp import create_app
+from internlinkApp.asgi import create_asgi_app
+
+# The app behind an ASGI server, with the student read pages served by async views (see internlinkApp/asgi.py).
+# Start it with e.g. `uvicorn run_asgi:app --workers 4`.
+app = create_asgi_app(create_app())
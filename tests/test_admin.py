@@ -0,0 +1,74 @@
+"""Tests for the student CSV import in internlinkApp/admin.py."""
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from internlinkApp import admin
+
+class FakeDatabase:
+    """Stands in for `db`, holding the `users` table as a list of usernames."""
+
+    def __init__(self, *usernames):
+        self.usernames = list(usernames)
+        self.inserted = []
+        self.results = []
+
+    @contextlib.contextmanager
+    def get_cursor(self, read_only=False):
+        yield self
+
+    transaction = get_cursor
+
+    def execute(self, query, params=()):
+        if query.lstrip().startswith('SELECT'):
+            # Like MySQL's case-insensitive collation: the stored spelling of matching usernames.
+            wanted = {username.lower() for username in params}
+            self.results = [{'username': username, 'user_id': user_id}
+                            for user_id, username in enumerate(self.usernames, start=1)
+                            if username.lower() in wanted]
+
+    def executemany(self, query, rows):
+        if 'INSERT INTO users' in query:
+            for row in rows:
+                if row[0].lower() in {username.lower() for username in self.usernames}:
+                    raise AssertionError(f"Duplicate entry '{row[0]}' for key 'username'")
+                self.usernames.append(row[0])
+                self.inserted.append(row[0])
+
+    def fetchall(self):
+        return self.results
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase('Alice')
+    monkeypatch.setattr(admin, 'db', database)
+    monkeypatch.setattr(admin.flask_bcrypt, 'generate_password_hash', lambda password: 'hash')
+    monkeypatch.setattr(admin.rollups, 'record_signups', lambda cursor, role, count: None)
+    monkeypatch.setattr(admin.cache, 'invalidate_tags', lambda *tags: None)
+    monkeypatch.setattr(admin.username_filter, 'add', lambda *usernames: None)
+    return database
+
+def student(username):
+    return {'username': username, 'full_name': 'Student', 'email': f'{username}@example.com',
+            'password': 'Password1!', 'university': 'Lincoln University', 'course': 'Computing'}
+
+def insert(batch):
+    errors = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        created = admin.insert_student_batch(list(enumerate(batch, start=2)), executor, errors)
+    return created, errors
+
+def test_existing_username_in_another_case_is_skipped(database):
+    created, errors = insert([student('alice'), student('bob')])
+
+    assert created == 1
+    assert database.inserted == ['bob']
+    assert errors == ["line 2: an account already exists with username 'Alice'."]
+
+def test_username_repeated_in_another_case_in_the_batch_is_skipped(database):
+    created, errors = insert([student('Carol'), student('carol'), student('dave')])
+
+    assert created == 2
+    assert database.inserted == ['Carol', 'dave']
+    assert errors == ["line 3: username 'carol' appears more than once."]
@@ -0,0 +1,209 @@
+"""Tests for internlinkApp/cache.py: the in-process tier (LRU eviction, TTLs,
+tags, generations and stampede coalescing) and the shared SQLite tier."""
+import contextlib
+import sqlite3
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from internlinkApp import cache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Makes `time.time()` return `clock[0]`, so tests can move time on."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    return now
+
+def init(tmp_path, **config):
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config.update({'CACHE_BACKEND': 'memory', 'CACHE_DEFAULT_TTL': 60, 'CACHE_MAX_ENTRIES': 100}, **config)
+    cache.init_cache(app)
+    return app
+
+@pytest.fixture
+def shared_cache(tmp_path, monkeypatch):
+    """The cache with a shared tier in a temporary SQLite file, replayed on every lookup."""
+    monkeypatch.setattr(cache, 'SYNC_INTERVAL', 0)
+    init(tmp_path, CACHE_BACKEND='sqlite', CACHE_SHARED_PATH=str(tmp_path / 'cache.sqlite3'))
+    return tmp_path / 'cache.sqlite3'
+
+def invalidate_elsewhere(path, tag):
+    """Invalidates `tag` the way another process would: in the shared file only."""
+    with contextlib.closing(sqlite3.connect(path, isolation_level=None)) as shared:
+        keys = [key for key, in shared.execute('SELECT key FROM entry_tag WHERE tag = ?', (tag,))]
+        shared.executemany('DELETE FROM entry WHERE key = ?', [(key,) for key in keys])
+        shared.executemany('DELETE FROM entry_tag WHERE key = ?', [(key,) for key in keys])
+        shared.execute('INSERT INTO invalidation (kind, name, invalidated_at) VALUES (?, ?, ?)',
+                       ('tag', tag, time.time()))
+
+def test_get_returns_what_was_put(tmp_path):
+    init(tmp_path)
+    cache.put('summary:1', {'total': 3})
+    assert cache.get('summary:1') == {'total': 3}
+    assert cache.get('summary:2') is None
+    assert cache.cache_stats()['names']['summary'] == {'hits': 1, 'shared_hits': 0, 'misses': 1, 'coalesced': 0,
+                                                       'hit_rate': 0.5}
+
+def test_none_is_not_cached(tmp_path):
+    init(tmp_path)
+    cache.put('summary:1', None)
+    assert cache.cache_stats()['entries'] == 0
+
+def test_disabled_cache_always_misses(tmp_path):
+    init(tmp_path, CACHE_BACKEND='none')
+    cache.put('summary:1', 1)
+    assert cache.get('summary:1') is None
+    assert cache.get_or_compute('summary:1', lambda: 2) == 2
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    init(tmp_path, CACHE_MAX_ENTRIES=3)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key)
+    cache.get('a')
+    cache.put('d', 'd')
+
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in ('a', 'c', 'd')] == ['a', 'c', 'd']
+    assert cache.cache_stats()['events']['evictions'] == 1
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    init(tmp_path)
+    cache.put('short', 1, ttl=10)
+    cache.put('default', 2)
+
+    clock[0] += 10
+    assert cache.get('short') == 1
+    clock[0] += 1
+    assert cache.get('short') is None
+    assert cache.get('default') == 2
+    clock[0] += 50
+    assert cache.get('default') is None
+    assert cache.cache_stats()['events']['expirations'] == 2
+
+def test_invalidating_a_tag_drops_only_its_entries(tmp_path):
+    init(tmp_path)
+    cache.put('page:1', 'one', tags=[cache.internship_tag(1), cache.company_tag(7)])
+    cache.put('page:2', 'two', tags=[cache.internship_tag(2), cache.company_tag(7)])
+    cache.put('page:3', 'three', tags=[cache.internship_tag(3), cache.company_tag(8)])
+
+    cache.invalidate_tags(cache.internship_tag(1))
+    assert [cache.get(f'page:{number}') for number in (1, 2, 3)] == [None, 'two', 'three']
+
+    cache.invalidate_tags(cache.company_tag(7))
+    assert [cache.get(f'page:{number}') for number in (1, 2, 3)] == [None, None, 'three']
+
+def test_delete_drops_keys(tmp_path):
+    init(tmp_path)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.delete('a', 'missing')
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+
+def test_put_is_dropped_if_invalidated_since_the_generation(tmp_path):
+    init(tmp_path)
+    since = cache.generation()
+    cache.invalidate_tags(cache.student_tag(1))
+    cache.put('summary:1', 'stale', tags=[cache.student_tag(1)], since=since)
+    cache.put('summary:2', 'fresh', tags=[cache.student_tag(2)], since=since)
+
+    assert cache.get('summary:1') is None
+    assert cache.get('summary:2') == 'fresh'
+
+def test_get_or_compute_drops_a_result_invalidated_while_computing(tmp_path):
+    init(tmp_path)
+
+    def compute():
+        cache.invalidate_tags(cache.student_tag(1))
+        return 'stale'
+
+    assert cache.get_or_compute('summary:1', compute, tags=[cache.student_tag(1)]) == 'stale'
+    assert cache.get('summary:1') is None
+
+def test_cached_decorator_uses_name_and_arguments_as_key(tmp_path):
+    init(tmp_path)
+    calls = []
+
+    @cache.cached('square', tags=lambda number: [f'number:{number}'])
+    def square(number):
+        calls.append(number)
+        return number * number
+
+    assert [square(3), square(3), square(4)] == [9, 9, 16]
+    assert calls == [3, 4]
+    assert square.cache_key(3) == 'square:3'
+    assert square.cache_tags(3) == ['number:3']
+    cache.invalidate_tags('number:3')
+    assert square(3) == 9
+    assert calls == [3, 4, 3]
+
+def test_concurrent_misses_compute_once(tmp_path):
+    init(tmp_path)
+    threads_count = 8
+    computing = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        computing.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(cache.get_or_compute('slow:1', compute)))
+    first.start()
+    assert computing.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_compute('slow:1', compute)))
+               for _ in range(threads_count - 1)]
+    for thread in waiters:
+        thread.start()
+    # Wait until every thread has joined the computation before letting it finish.
+    deadline = time.monotonic() + 5
+    while cache._computing['slow:1'][1] < threads_count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in [first] + waiters:
+        thread.join(5)
+
+    assert results == ['value'] * threads_count
+    assert len(calls) == 1
+    assert cache.cache_stats()['names']['slow']['coalesced'] == threads_count - 1
+    assert 'slow:1' not in cache._computing
+
+def test_shared_tier_serves_values_put_by_another_process(shared_cache):
+    cache.put('summary:1', {'total': 3}, tags=[cache.student_tag(1)])
+    # This process's own tier starts empty in another process.
+    cache.clear()
+
+    assert cache.get('summary:1') == {'total': 3}
+    assert cache.cache_stats()['names']['summary']['shared_hits'] == 1
+    assert cache.cache_stats()['shared_entries'] == 1
+
+def test_invalidations_from_another_process_are_replayed(shared_cache):
+    cache.put('summary:1', 'one', tags=[cache.student_tag(1)])
+    cache.put('summary:2', 'two', tags=[cache.student_tag(2)])
+
+    invalidate_elsewhere(shared_cache, cache.student_tag(1))
+    assert cache.get('summary:1') is None
+    assert cache.get('summary:2') == 'two'
+
+def test_put_is_dropped_if_another_process_invalidated_since_the_generation(shared_cache):
+    since = cache.generation()
+    invalidate_elsewhere(shared_cache, cache.student_tag(1))
+    cache.put('summary:1', 'stale', tags=[cache.student_tag(1)], since=since)
+
+    assert cache.get('summary:1') is None
+    with contextlib.closing(sqlite3.connect(shared_cache)) as shared:
+        assert shared.execute('SELECT COUNT(*) FROM entry').fetchone()[0] == 0
+
+def test_invalidations_are_logged_for_other_processes(shared_cache):
+    cache.put('summary:1', 'one', tags=[cache.student_tag(1)])
+    cache.invalidate_tags(cache.student_tag(1))
+
+    with contextlib.closing(sqlite3.connect(shared_cache)) as shared:
+        assert shared.execute('SELECT COUNT(*) FROM entry').fetchone()[0] == 0
+        assert shared.execute('SELECT kind, name FROM invalidation').fetchall() == [('tag', 'student:1')]
@@ -0,0 +1,80 @@
+"""Tests for internlinkApp/compression.py: picking the encoding and compressing
+streamed responses."""
+import zlib
+
+import pytest
+
+from internlinkApp import compression
+
+LEVELS = compression.COMPRESSION_LEVELS['text/csv']
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+
+def gunzip(data):
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip, deflate', 'gzip'),
+    ('GZIP', 'gzip'),
+    ('deflate', None),
+    ('', None),
+    ('gzip;q=0', None),
+    ('gzip;q=0.5', 'gzip'),
+    ('gzip;q=abc', None),
+    ('*', 'gzip'),
+    ('*;q=0', None),
+    ('*, gzip;q=0', None),
+    ('identity', None),
+])
+def test_choose_encoding_without_brotli(without_brotli, accept_encoding, expected):
+    assert compression.choose_encoding(accept_encoding) == expected
+
+def test_choose_encoding_prefers_brotli(monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', object())
+    assert compression.choose_encoding('gzip, deflate, br') == 'br'
+    assert compression.choose_encoding('gzip, br;q=0') == 'gzip'
+
+def test_compress_stream_round_trips():
+    chunks = ['id,status\n'] + [f'{number},Pending\n' for number in range(1000)] + [b'last,line\n']
+    compressed = b''.join(compression._compress_stream(iter(chunks), 'gzip', LEVELS))
+    expected = ''.join(chunk if isinstance(chunk, str) else chunk.decode() for chunk in chunks)
+    assert gunzip(compressed).decode() == expected
+
+def test_compress_stream_flushes_every_flush_size(monkeypatch):
+    monkeypatch.setattr(compression, 'STREAM_FLUSH_SIZE', 1000)
+    chunks = [f'{number:09},Pending\n'.encode() * 10 for number in range(10)]
+    consumed = []
+
+    def source():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    received = b''
+    for data in compression._compress_stream(source(), 'gzip', LEVELS):
+        received += decompressor.decompress(data)
+        # Everything fed in is readable once at least `STREAM_FLUSH_SIZE` bytes were, without waiting for the end.
+        if len(b''.join(consumed)) >= 1000 and len(consumed) < len(chunks):
+            assert received == b''.join(consumed)
+            break
+    else:
+        pytest.fail('nothing was flushed before the end of the stream')
+
+def test_compress_stream_closes_the_source():
+    class Source:
+        closed = False
+
+        def __iter__(self):
+            yield b'data'
+
+        def close(self):
+            self.closed = True
+
+    source = Source()
+    stream = compression._compress_stream(source, 'gzip', LEVELS)
+    next(stream)
+    stream.close()
+    assert source.closed
@@ -0,0 +1,157 @@
+"""Tests for the background job queue in internlinkApp/jobs.py, with the journal
+in a temporary SQLite file. Jobs are dispatched by calling the dispatcher's
+steps directly rather than from its thread."""
+import time
+
+import pytest
+from flask import Flask
+
+from internlinkApp import jobs
+
+class InlineExecutor:
+    """Runs submitted jobs straight away, in the dispatching thread."""
+
+    def submit(self, function, *args):
+        function(*args)
+
+class IdleExecutor:
+    """Accepts submitted jobs without running them, like a process stalled mid-job."""
+
+    def submit(self, function, *args):
+        pass
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Makes `time.time()` return `clock[0]`, so tests can move time on."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    return now
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch, clock):
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config.update(JOB_JOURNAL_PATH=str(tmp_path / 'jobs.sqlite3'), JOB_WORKERS=2)
+    jobs.init_jobs(app)
+    monkeypatch.setattr(jobs, 'JOB_HANDLERS', dict(jobs.JOB_HANDLERS))
+    monkeypatch.setattr(jobs, '_running', {})
+    monkeypatch.setattr(jobs, '_owner', 'web-1:100:1.0')
+    monkeypatch.setattr(jobs, '_executor', InlineExecutor())
+    return app
+
+def test_enqueued_job_runs_with_its_payload(queue):
+    calls = []
+    jobs.job('greet')(lambda student: calls.append(student))
+
+    job_id = jobs.enqueue('greet', student='Ada')
+    jobs._dispatch_due_jobs()
+
+    assert calls == ['Ada']
+    status = jobs.job_status(job_id)
+    assert (status['status'], status['attempts'], status['last_error']) == ('done', 1, None)
+    assert jobs.queue_stats()['jobs'][0]['done'] == 1
+
+def test_unknown_job_name_is_refused(queue):
+    with pytest.raises(ValueError):
+        jobs.enqueue('missing')
+
+def test_delayed_job_waits_until_due(queue, clock):
+    calls = []
+    jobs.job('later')(lambda: calls.append(1))
+
+    jobs.enqueue('later', delay=30)
+    jobs._dispatch_due_jobs()
+    assert calls == []
+
+    clock[0] += 30
+    jobs._dispatch_due_jobs()
+    assert calls == [1]
+
+def test_failing_job_is_retried_with_backoff_then_fails(queue, clock):
+    attempts = []
+
+    @jobs.job('flaky', max_attempts=2)
+    def flaky():
+        attempts.append(1)
+        raise RuntimeError('mail server down')
+
+    job_id = jobs.enqueue('flaky')
+    jobs._dispatch_due_jobs()
+    status = jobs.job_status(job_id)
+    assert (status['status'], status['attempts']) == ('queued', 1)
+    assert 'mail server down' in status['last_error']
+
+    # Not retried before the backoff has passed.
+    clock[0] += jobs.RETRY_BACKOFF_SECONDS - 1
+    jobs._dispatch_due_jobs()
+    assert len(attempts) == 1
+
+    clock[0] += 1
+    jobs._dispatch_due_jobs()
+    status = jobs.job_status(job_id)
+    assert (status['status'], status['attempts'], len(attempts)) == ('failed', 2, 2)
+    assert [failure['job_id'] for failure in jobs.queue_stats()['recent_failures']] == [job_id]
+
+def test_concurrency_limit_caps_running_jobs(queue, monkeypatch):
+    monkeypatch.setattr(jobs, '_executor', IdleExecutor())
+    jobs.job('index', concurrency=1)(lambda: None)
+
+    first = jobs.enqueue('index')
+    second = jobs.enqueue('index')
+    jobs._dispatch_due_jobs()
+
+    assert jobs.job_status(first)['status'] == 'running'
+    assert jobs.job_status(second)['status'] == 'queued'
+
+def test_expired_lease_is_claimed_again(queue, monkeypatch, clock):
+    calls = []
+    jobs.job('export')(lambda: calls.append(jobs._owner))
+    job_id = jobs.enqueue('export')
+
+    # Another process claims the job, then stops without finishing it.
+    monkeypatch.setattr(jobs, '_owner', 'web-2:200:1.0')
+    monkeypatch.setattr(jobs, '_executor', IdleExecutor())
+    jobs._dispatch_due_jobs()
+    monkeypatch.setattr(jobs, '_owner', 'web-1:100:1.0')
+    monkeypatch.setattr(jobs, '_executor', InlineExecutor())
+    monkeypatch.setattr(jobs, '_running', {})
+
+    # While its lease lasts, the job is left to it.
+    clock[0] += jobs.LEASE_SECONDS - 1
+    jobs._renew_leases()
+    jobs._dispatch_due_jobs()
+    assert jobs.job_status(job_id)['status'] == 'running'
+    assert calls == []
+
+    clock[0] += 2
+    jobs._renew_leases()
+    jobs._dispatch_due_jobs()
+    status = jobs.job_status(job_id)
+    assert calls == ['web-1:100:1.0']
+    assert (status['status'], status['attempts']) == ('done', 2)
+
+def test_running_job_keeps_its_lease_while_renewed(queue, monkeypatch, clock):
+    monkeypatch.setattr(jobs, '_executor', IdleExecutor())
+    jobs.job('slow')(lambda: None)
+    job_id = jobs.enqueue('slow')
+    jobs._dispatch_due_jobs()
+
+    for _ in range(5):
+        clock[0] += jobs.LEASE_SECONDS / 3
+        jobs._renew_leases()
+    assert jobs.job_status(job_id)['status'] == 'running'
+
+def test_progress_is_reported_while_running(queue):
+    seen = []
+
+    @jobs.job('import')
+    def import_rows():
+        jobs.report_progress(rows_read=10)
+        seen.append(jobs.job_status(job_id)['progress'])
+        jobs.report_progress(rows_read=20, created=18)
+
+    job_id = jobs.enqueue('import')
+    jobs._dispatch_due_jobs()
+
+    assert seen == [{'rows_read': 10}]
+    assert jobs.job_status(job_id)['progress'] == {'rows_read': 20, 'created': 18}
+    assert jobs.job_status(job_id + 1) is None
@@ -0,0 +1,95 @@
+"""Tests for the failed login limits in internlinkApp/login_throttle.py, with the
+shared file in a temporary SQLite database."""
+import time
+
+import pytest
+from flask import Flask
+
+from internlinkApp import login_throttle
+
+WINDOW = 900
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Makes `time.time()` return `clock[0]`, so tests can move time on."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    return now
+
+@pytest.fixture
+def throttle(tmp_path, clock):
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.config.update(LOGIN_THROTTLE_PATH=str(tmp_path / 'login_throttle.sqlite3'), LOGIN_THROTTLE_WINDOW=WINDOW,
+                      LOGIN_MAX_FAILURES_PER_USER=3, LOGIN_MAX_FAILURES_PER_IP=5)
+    login_throttle.init_login_throttle(app)
+    return app
+
+def fail(username, ip_address, times=1):
+    for _ in range(times):
+        assert login_throttle.check(username, ip_address) == 0
+        login_throttle.record_failure(username, ip_address)
+
+def test_username_is_blocked_at_its_limit(throttle):
+    fail('alice', '203.0.113.1', times=2)
+    assert login_throttle.check('alice', '203.0.113.1') == 0
+
+    login_throttle.record_failure('alice', '203.0.113.1')
+    assert login_throttle.check('alice', '203.0.113.2') == WINDOW + 1
+    # The username is compared case-insensitively.
+    assert login_throttle.check(' Alice ', '203.0.113.3') > 0
+    assert login_throttle.check('bob', '203.0.113.1') == 0
+
+def test_ip_address_is_blocked_at_its_limit(throttle):
+    for number in range(5):
+        fail(f'user{number}', '198.51.100.7')
+
+    assert login_throttle.check('someone', '198.51.100.7') > 0
+    assert login_throttle.check('someone', '198.51.100.8') == 0
+
+def test_block_lifts_as_failures_leave_the_window(throttle, clock):
+    fail('alice', '203.0.113.1')
+    clock[0] += 100
+    fail('alice', '203.0.113.1', times=2)
+    assert login_throttle.check('alice', '203.0.113.1') == WINDOW - 100 + 1
+
+    # Attempts while blocked aren't failures, so they don't keep the block going.
+    clock[0] += WINDOW - 101
+    assert login_throttle.check('alice', '203.0.113.1') > 0
+    clock[0] += 1
+    assert login_throttle.check('alice', '203.0.113.1') == 0
+    # Only the first failure left the window, so one more failure blocks again.
+    login_throttle.record_failure('alice', '203.0.113.1')
+    assert login_throttle.check('alice', '203.0.113.1') == 100 + 1
+
+def test_successful_login_clears_the_username(throttle):
+    fail('alice', '203.0.113.1', times=3)
+    assert login_throttle.check('alice', '203.0.113.1') > 0
+
+    login_throttle.record_success('alice')
+    assert login_throttle.check('alice', '203.0.113.1') == 0
+
+def test_limit_of_zero_turns_it_off(throttle):
+    login_throttle.max_failures_per_user = 0
+    fail('alice', '203.0.113.1', times=4)
+    assert login_throttle.check('alice', '203.0.113.2') == 0
+
+def test_fails_open_when_the_file_is_unavailable(throttle, tmp_path, capsys):
+    fail('alice', '203.0.113.1', times=3)
+    login_throttle._blocked_until.clear()
+    # A directory can't be opened as a database.
+    login_throttle.throttle_path = str(tmp_path)
+
+    assert login_throttle.check('alice', '203.0.113.1') == 0
+    login_throttle.record_failure('alice', '203.0.113.1')
+    login_throttle.record_success('alice')
+    assert 'Error checking login throttling' in capsys.readouterr().out
+
+def test_counters_are_kept_for_the_admin_page(throttle):
+    fail('alice', '203.0.113.1', times=3)
+    login_throttle.check('alice', '203.0.113.1')
+    login_throttle.check('alice', '203.0.113.1')
+
+    stats = login_throttle.throttle_stats()
+    assert stats['counters'] == {'checked': 3, 'blocked': 2, 'failures': 3, 'successes': 0}
+    assert [row['key'] for row in stats['blocked']] == ['user:alice']
+    assert {row['key']: row['failures'] for row in stats['watched']} == {'user:alice': 3, 'ip:203.0.113.1': 3}
@@ -0,0 +1,93 @@
+"""Tests for the `application_daily` bookkeeping in internlinkApp/rollups.py."""
+from datetime import date
+
+from internlinkApp import rollups
+
+MONDAY = date(2025, 3, 3)
+TUESDAY = date(2025, 3, 4)
+WEDNESDAY = date(2025, 3, 5)
+
+class FakeCursor:
+    """Returns the queued result sets in turn, and records every statement."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.executed = []
+        self.executed_many = []
+
+    def execute(self, query, params=()):
+        self.executed.append((query, params))
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def executemany(self, query, rows):
+        self.executed_many.append((query, rows))
+
+def application(status='Pending', decided_day=None, decision_seconds=None, company_id=7, created_day=MONDAY):
+    return {'company_id': company_id, 'created_day': created_day, 'status': status, 'decided_day': decided_day,
+            'decision_seconds': decision_seconds}
+
+def test_deltas_cover_added_removed_and_changed_keys():
+    before = {(7, MONDAY): [1, 0, 0, 0], (7, TUESDAY): [0, 1, 0, 60], (8, MONDAY): [2, 0, 0, 0]}
+    after = {(7, MONDAY): [1, 0, 0, 0], (7, WEDNESDAY): [0, 0, 1, 90], (8, MONDAY): [3, 0, 0, 0]}
+
+    assert sorted(rollups._deltas(before, after)) == [
+        (7, TUESDAY, 0, -1, 0, -60),
+        (7, WEDNESDAY, 0, 0, 1, 90),
+        (8, MONDAY, 1, 0, 0, 0),
+    ]
+
+def test_deltas_of_unchanged_contributions_are_empty():
+    contributions = {(7, MONDAY): [1, 1, 0, 60]}
+    assert rollups._deltas(contributions, dict(contributions)) == []
+
+def test_tracking_counts_a_decision_on_its_day():
+    cursor = FakeCursor([application()], [application('Accepted', TUESDAY, 86400)])
+    with rollups.tracking(cursor, [(1, 2)]):
+        cursor.execute("UPDATE application SET status = 'Accepted';")
+
+    before_query, before_params = cursor.executed[0]
+    assert 'FOR UPDATE OF a' in before_query
+    assert before_params == (1, 2)
+    assert 'FOR UPDATE' not in cursor.executed[2][0]
+    [(_, rows)] = cursor.executed_many
+    assert rows == [(7, TUESDAY, 0, 1, 0, 86400)]
+
+def test_tracking_moves_a_changed_decision():
+    cursor = FakeCursor([application('Accepted', TUESDAY, 86400)], [application('Rejected', WEDNESDAY, 172800)])
+    with rollups.tracking(cursor, [(1, 2)]):
+        pass
+
+    [(_, rows)] = cursor.executed_many
+    assert sorted(rows) == [(7, TUESDAY, 0, -1, 0, -86400), (7, WEDNESDAY, 0, 0, 1, 172800)]
+
+def test_tracking_takes_back_a_decision_set_to_pending():
+    cursor = FakeCursor([application('Rejected', TUESDAY, 3600)], [application('Pending', TUESDAY, 3600)])
+    with rollups.tracking(cursor, [(1, 2)]):
+        pass
+
+    [(_, rows)] = cursor.executed_many
+    assert rows == [(7, TUESDAY, 0, 0, -1, -3600)]
+
+def test_tracking_inserts_without_reading_first():
+    cursor = FakeCursor([application(), application(company_id=8)])
+    with rollups.tracking(cursor, [(1, 2), (3, 4)], inserting=True):
+        cursor.execute("INSERT INTO application ...;")
+
+    assert len(cursor.executed) == 2
+    assert cursor.executed[1][1] == (1, 2, 3, 4)
+    [(_, rows)] = cursor.executed_many
+    assert sorted(rows) == [(7, MONDAY, 1, 0, 0, 0), (8, MONDAY, 1, 0, 0, 0)]
+
+def test_tracking_writes_nothing_when_nothing_changed():
+    cursor = FakeCursor([application()], [application()])
+    with rollups.tracking(cursor, [(1, 2)]):
+        pass
+    assert cursor.executed_many == []
+
+def test_tracking_without_applications_runs_no_queries():
+    cursor = FakeCursor()
+    with rollups.tracking(cursor, []):
+        pass
+    assert cursor.executed == [] and cursor.executed_many == []
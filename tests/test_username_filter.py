@@ -0,0 +1,36 @@
+"""Tests for the Bloom filter in internlinkApp/username_filter.py."""
+import math
+
+from internlinkApp.username_filter import BloomFilter
+
+def test_added_items_are_always_found():
+    bloom_filter = BloomFilter(1000)
+    usernames = [f'user{number}' for number in range(1000)]
+    for username in usernames:
+        bloom_filter.add(username)
+    assert all(username in bloom_filter for username in usernames)
+
+def test_empty_filter_contains_nothing():
+    bloom_filter = BloomFilter(1000)
+    assert not any(f'user{number}' in bloom_filter for number in range(1000))
+
+def test_false_positive_rate_at_capacity():
+    bloom_filter = BloomFilter(10000, false_positive_rate=0.01)
+    for number in range(10000):
+        bloom_filter.add(f'taken{number}')
+    false_positives = sum(f'free{number}' in bloom_filter for number in range(20000))
+    # 1% expected; allow for the randomness of 20,000 samples.
+    assert false_positives / 20000 < 0.02
+
+def test_sized_for_capacity_and_error_rate():
+    bloom_filter = BloomFilter(1000000, false_positive_rate=0.01)
+    # About 9.6 bits and 7 hash functions per item for 1%.
+    assert bloom_filter.size == int(-1000000 * math.log(0.01) / math.log(2) ** 2)
+    assert bloom_filter.hash_count == 7
+    assert len(bloom_filter.bits) == (bloom_filter.size + 7) // 8
+
+def test_tiny_filter_still_works():
+    bloom_filter = BloomFilter(1)
+    bloom_filter.add('only')
+    assert bloom_filter.size >= 64
+    assert 'only' in bloom_filter